@@ -4,9 +4,11 @@ from stormpiper.api.endpoints import (
     bg_worker,
     globals,
     npv,
+    pipeline,
     prom,
     reference,
     results,
+    scenario,
     spatial,
     subbasin,
     table,
@@ -45,9 +47,11 @@ api_router.include_router(
 
 api_router.include_router(bg_worker.router, prefix="/tasks", tags=["bg"])
 api_router.include_router(globals.router, prefix="/global_setting", tags=["globals"])
+api_router.include_router(pipeline.router, prefix="/pipeline_run", tags=["pipeline"])
 
 
 rpc_router = APIRouter(prefix="/api/rpc")
 rpc_router.include_router(bg_worker.rpc_router, tags=["bg"])
 rpc_router.include_router(prom.rpc_router, tags=["subbasin", "promethee"])
 rpc_router.include_router(npv.rpc_router, tags=["costs", "npv"])
+rpc_router.include_router(scenario.rpc_router, tags=["scenario"])
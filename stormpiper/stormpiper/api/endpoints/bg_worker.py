@@ -1,6 +1,6 @@
 from enum import Enum
 from inspect import getmembers, isfunction
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
@@ -101,6 +101,46 @@ async def solve_watershed() -> Dict[str, Any]:
     return response
 
 
+@rpc_router.get(
+    "/solve_watershed_downstream", response_class=JSONResponse, tags=["rpc"]
+)
+async def solve_watershed_downstream(
+    node_id: List[str] = Query(..., example=["SWFA-100002"]),
+    timeout: float = Query(0.5, le=120),
+) -> Dict[str, Any]:
+    """Re-solve only the results downstream of the given node_ids, e.g., after
+    editing the attributes of a structural facility.
+    """
+
+    task = bg.refresh_result_table_for_nodes.apply_async(args=(node_id,))
+    _ = await utils.wait_a_sec_and_see_if_we_can_return_some_data(task, timeout=timeout)
+    response = dict(task_id=task.task_id, status=task.status)
+    if task.successful():
+        response["data"] = task.result
+
+    return response
+
+
+@rpc_router.get(
+    "/solve_src_ctrls_for_subbasins", response_class=JSONResponse, tags=["rpc"]
+)
+async def solve_src_ctrls_for_subbasins(
+    subbasin: List[str] = Query(..., example=["WS_03"]),
+    timeout: float = Query(0.5, le=120),
+) -> Dict[str, Any]:
+    """Recompute the source control tables for only the given subbasins, e.g., after
+    creating, editing or deleting one of their source controls.
+    """
+
+    task = bg.refresh_src_ctrl_tables_for_subbasins.apply_async(args=(subbasin,))
+    _ = await utils.wait_a_sec_and_see_if_we_can_return_some_data(task, timeout=timeout)
+    response = dict(task_id=task.task_id, status=task.status)
+    if task.successful():
+        response["data"] = task.result
+
+    return response
+
+
 @rpc_router.get("/_test_upstream_loading", response_class=JSONResponse)
 async def us_loading() -> None:
 
@@ -0,0 +1,59 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from stormpiper.apps.supersafe.users import check_admin
+from stormpiper.database.connection import get_async_session
+from stormpiper.database.schemas import pipeline
+from stormpiper.database.utils import orm_to_dict
+from stormpiper.models.pipeline import PipelineRun
+
+router = APIRouter(dependencies=[Depends(check_admin)])
+
+
+async def _runs_with_stages(db: AsyncSession, runs) -> List[PipelineRun]:
+    q = (
+        select(pipeline.PipelineRunStage)
+        .where(pipeline.PipelineRunStage.run_id.in_([r.id for r in runs]))
+        .order_by(pipeline.PipelineRunStage.id)
+    )
+    stages = (await db.execute(q)).scalars().all()
+
+    return [
+        PipelineRun(
+            **orm_to_dict(run),
+            stages=[orm_to_dict(s) for s in stages if s.run_id == run.id],
+        )
+        for run in runs
+    ]
+
+
+@router.get("/", response_model=List[PipelineRun], name="pipeline:get_all_runs")
+async def get_all_runs(
+    task: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Returns the most recent pipeline runs with the timing of each stage."""
+
+    q = select(pipeline.PipelineRun).order_by(pipeline.PipelineRun.id.desc())
+    if task is not None:
+        q = q.where(pipeline.PipelineRun.task == task)
+    runs = (await db.execute(q.limit(limit))).scalars().all()
+
+    return await _runs_with_stages(db, runs)
+
+
+@router.get("/{run_id}", response_model=PipelineRun, name="pipeline:get_run")
+async def get_run(run_id: int, db: AsyncSession = Depends(get_async_session)):
+
+    run = await db.get(pipeline.PipelineRun, run_id)
+
+    if not run:
+        raise HTTPException(
+            status_code=404, detail=f"Record not found for run_id={run_id}"
+        )
+
+    return (await _runs_with_stages(db, [run]))[0]
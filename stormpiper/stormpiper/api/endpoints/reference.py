@@ -4,14 +4,17 @@ from sqlalchemy.engine.url import make_url
 
 from stormpiper.apps.supersafe.users import check_admin, check_user
 from stormpiper.core.config import settings
-from stormpiper.core.context import get_context
+from stormpiper.core.context import get_context, get_context_version
 
 router = APIRouter(dependencies=[Depends(check_user)])
 
 
 @router.get("/context")
 async def get_cxt(context=Depends(get_context)):
-    return JSONResponse(content=context, headers={"Cache-Control": "max-age=86400"})
+    return JSONResponse(
+        content=context,
+        headers={"Cache-Control": "max-age=86400", "ETag": get_context_version()},
+    )
 
 
 @router.get("/check_router", dependencies=[Depends(check_admin)], name="check_router")
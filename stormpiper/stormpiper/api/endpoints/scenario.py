@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+
+from stormpiper.apps.supersafe.users import check_user
+from stormpiper.core.exceptions import InvalidEpochs, InvalidOverrides
+from stormpiper.models.scenario import ScenarioRequest, ScenariosRequest
+from stormpiper.src.scenario import (
+    scenarios_per_second,
+    solve_scenario_from_db,
+    solve_scenarios_from_db,
+)
+
+rpc_router = APIRouter(dependencies=[Depends(check_user)])
+
+
+@rpc_router.post("/solve_scenario", tags=["rpc"])
+def solve_scenario(scenario: ScenarioRequest):
+    """Solves the water quality results downstream of the facility overrides in
+    memory. No tables are changed.
+    """
+
+    try:
+        results = solve_scenario_from_db(
+            overrides=scenario.overrides(), epochs=scenario.epochs
+        )
+
+    except InvalidEpochs as e:
+        raise HTTPException(status_code=422, detail=f"{e}")
+
+    except InvalidOverrides as e:
+        raise HTTPException(status_code=404, detail=f"{e}")
+
+    return Response(
+        content=results.drop(columns=["blob"], errors="ignore").to_json(
+            orient="records"
+        ),
+        media_type="application/json",
+    )
+
+
+@rpc_router.post("/solve_scenarios", tags=["rpc"])
+def solve_scenarios(scenarios: ScenariosRequest):
+    """Solves a batch of what-if scenarios in memory and returns a parquet file of
+    the numeric results indexed by scenario, node_id and epoch. No tables are changed.
+    """
+
+    try:
+        results, elapsed = solve_scenarios_from_db(
+            scenarios=scenarios.overrides(), epochs=scenarios.epochs
+        )
+
+    except InvalidEpochs as e:
+        raise HTTPException(status_code=422, detail=f"{e}")
+
+    except InvalidOverrides as e:
+        raise HTTPException(status_code=404, detail=f"{e}")
+
+    return Response(
+        content=results.to_parquet(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Scenarios-Per-Second": (
+                f"{scenarios_per_second(len(scenarios.scenarios), elapsed):.3f}"
+            )
+        },
+    )
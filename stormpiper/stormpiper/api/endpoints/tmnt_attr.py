@@ -11,8 +11,10 @@ from nereid.api.api_v1.models.treatment_facility_models import (
 from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import stormpiper.bg_worker as bg
 from stormpiper.apps import supersafe as ss
 from stormpiper.apps.supersafe.users import check_user
+from stormpiper.connections import arcgis
 from stormpiper.core.context import get_context
 from stormpiper.core.exceptions import RecordNotFound
 from stormpiper.database import crud
@@ -48,13 +50,17 @@ async def get_tmnt_attr(
     return attr
 
 
-def validate_tmnt_modeling_params(unvalidated_data: dict, context: dict) -> None:
-    modeling_fields = {
+def get_modeling_fields() -> set[str]:
+    return {
         f
         for c in TREATMENT_FACILITY_MODELS
         for f in type("_", (Base, c), {}).get_fields()
     }
 
+
+def validate_tmnt_modeling_params(unvalidated_data: dict, context: dict) -> None:
+    modeling_fields = get_modeling_fields()
+
     modifies_modeling_data = any(
         (k in modeling_fields for k in unvalidated_data.keys())
     )
@@ -187,13 +193,21 @@ async def patch_tmnt_attr(
 ):
 
     try:
-        return await crud.tmnt_attr.update(db=db, id=altid, new_obj=tmnt_attr)
+        attr = await crud.tmnt_attr.update(db=db, id=altid, new_obj=tmnt_attr)
 
     except RecordNotFound as e:
         raise HTTPException(
             status_code=404, detail=f"Record not found for altid={altid}"
         )
 
+    # only the results downstream of the facility change
+    if get_modeling_fields() & tmnt_attr.dict(exclude_unset=True).keys():
+        bg.refresh_result_table_for_nodes.apply_async(
+            args=([arcgis.facility_node_id(altid)],)
+        )
+
+    return attr
+
 
 @router.get(
     "/",
@@ -5,6 +5,7 @@ from fastapi.exceptions import HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import stormpiper.bg_worker as bg
 from stormpiper.apps import supersafe as ss
 from stormpiper.apps.supersafe.users import check_user
 from stormpiper.database import crud
@@ -12,6 +13,7 @@ from stormpiper.database.connection import get_async_session
 from stormpiper.database.schemas import tmnt
 from stormpiper.models.tmnt_source_control import (
     TMNTSourceControl,
+    TMNTSourceControlBase,
     TMNTSourceControlCreate,
     TMNTSourceControlPatch,
     TMNTSourceControlPost,
@@ -21,6 +23,18 @@ from stormpiper.models.tmnt_source_control import (
 router = APIRouter(dependencies=[Depends(check_user)])
 
 
+def get_modeling_fields() -> set[str]:
+    return set(TMNTSourceControlBase.get_fields())
+
+
+def refresh_src_ctrl_tables_for_subbasins(*subbasins: Optional[str]) -> None:
+    """Queues the refresh of the source control tables of the affected subbasins."""
+
+    affected = sorted({s for s in subbasins if s})
+    if affected:
+        bg.refresh_src_ctrl_tables_for_subbasins.apply_async(args=(affected,))
+
+
 @router.get(
     "/{id}",
     response_model=TMNTSourceControl,
@@ -55,6 +69,10 @@ async def patch_tmnt_source_control(
     if not attr:
         raise HTTPException(status_code=404, detail=f"Record not found for id={id}")
 
+    # a control may move between subbasins, so both need a refresh
+    old_subbasin = attr.subbasin
+    old_values = {f: getattr(attr, f) for f in get_modeling_fields()}
+
     new_obj = TMNTSourceControlUpdate(
         **tmnt_attr.dict(exclude_unset=True, exclude_none=True), updated_by=user.email
     )
@@ -67,6 +85,15 @@ async def patch_tmnt_source_control(
             detail=str(e).replace("\n", " "),
         )
 
+    # only the load reductions depend on the modeling fields
+    changed = {
+        k: v
+        for k, v in new_obj.dict(exclude_unset=True).items()
+        if k in old_values and old_values[k] != v
+    }
+    if changed:
+        refresh_src_ctrl_tables_for_subbasins(old_subbasin, new_obj.subbasin)
+
     return attr
 
 
@@ -94,6 +121,8 @@ async def create_tmnt_source_control(
             detail=str(e).replace("\n", " "),
         )
 
+    refresh_src_ctrl_tables_for_subbasins(attr.subbasin)
+
     return attr
 
 
@@ -106,6 +135,9 @@ async def delete_tmnt_source_control(
     id: int,
     db: AsyncSession = Depends(get_async_session),
 ):
+    existing = await crud.tmnt_source_control.get(db=db, id=id)
+    subbasin = existing.subbasin if existing else None
+
     try:
         attr = await crud.tmnt_source_control.remove(db=db, id=id)
     except Exception as e:
@@ -114,6 +146,8 @@ async def delete_tmnt_source_control(
             detail=str(e).replace("\n", " "),
         )
 
+    refresh_src_ctrl_tables_for_subbasins(subbasin)
+
     return attr
 
 
@@ -115,6 +115,13 @@ def delete_and_refresh_lgu_boundary_table(continue_chain=True):  # pragma: no co
     )
 
 
+@celery_app.task(acks_late=True, track_started=True)
+def refresh_lgu_tables_for_changes(continue_chain=True):  # pragma: no cover
+    return run_in_chain(
+        tasks.refresh_lgu_tables_for_changes, continue_chain=continue_chain
+    )
+
+
 @celery_app.task(acks_late=True, track_started=True)
 def delete_and_refresh_lgu_load_table(continue_chain=True):  # pragma: no cover
     return run_in_chain(
@@ -152,6 +159,26 @@ def delete_and_refresh_result_table(continue_chain=True):  # pragma: no cover
     )
 
 
+@celery_app.task(acks_late=True, track_started=True)
+def refresh_result_table_for_nodes(node_ids, continue_chain=True):  # pragma: no cover
+    return run_in_chain(
+        tasks.refresh_result_table_for_nodes,
+        node_ids=node_ids,
+        continue_chain=continue_chain,
+    )
+
+
+@celery_app.task(acks_late=True, track_started=True)
+def refresh_src_ctrl_tables_for_subbasins(
+    subbasins, continue_chain=True
+):  # pragma: no cover
+    return run_in_chain(
+        tasks.refresh_src_ctrl_tables_for_subbasins,
+        subbasins=subbasins,
+        continue_chain=continue_chain,
+    )
+
+
 @celery_app.task(acks_late=True, track_started=True)
 def delete_and_refresh_downstream_src_ctrl_tables(
     continue_chain=True,
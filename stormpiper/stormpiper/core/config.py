@@ -43,6 +43,21 @@ class Settings(BaseSettings):
         "projects/ee-stormwaterheatmap/assets/production/Mean_Annual_Q_4_epochs"
     )
     EE_COC_PATH = "projects/ee-tacoma-watershed/assets/production/coc_concentrations"
+    EE_ZONAL_STATS_MAX_FEATURES: int = 500  # zones per reduceRegions request
+    EE_ZONAL_STATS_MAX_BYTES: int = 4_000_000  # geojson payload per request
+    EE_ZONAL_STATS_WORKERS: int = 8
+    EE_ZONAL_STATS_RETRIES: int = 4
+    EE_ZONAL_STATS_BACKOFF_SECONDS: float = 2.0
+
+    # Loading
+    LOADING_BACKEND: str = "earth_engine"  # or "raster" to use the local GeoTIFFs
+    RASTER_RUNOFF_PATH: str = ""  # GeoTIFF with one runoff band per epoch
+    RASTER_COC_PATH: str = ""  # GeoTIFF with one concentration band per poc
+    RASTER_LOADING_WORKERS: int = 4
+    RASTER_LOADING_CHUNK_ROWS: int = 1024
+
+    # Spatial
+    OVERLAY_WORKERS: int = 1  # >1 overlays the lgu subbasin groups in a process pool
 
     # Database
     ADMIN_ACCOUNT_PASSWORD: str = "change me with an env variable"
@@ -67,6 +82,12 @@ class Settings(BaseSettings):
     REDIS_RESULT_BACKEND: str = "redis://redis:6379/0"
     ENABLE_BEAT_SCHEDULE: bool = False
 
+    # Solver
+    SOLVE_WQ_WORKERS: int = 1  # >1 solves each epoch in a process pool
+    SOLVE_WQ_BY_BASIN: bool = False  # solve basins independently, then the outfall
+    SRC_CTRL_BACKEND: str = "pandas"  # or "sql" to compute the reductions in postgres
+    CONTEXT_CHECK_SECONDS: float = 5.0  # how often to check the reference data files
+
     # Email via https://dev.mailjet.com/email/guides/send-api-v31/
 
     EMAIL_SEND_URL: str = "http://example.com"
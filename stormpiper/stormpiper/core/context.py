@@ -1,17 +1,92 @@
+import hashlib
+import threading
+import time
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
 from nereid.core import context, io
 from nereid.src.wq_parameters import init_wq_parameters
 
+from stormpiper.core.config import settings
 
-def get_context():
-    data_path = Path(__file__).parent.parent / "data" / "project_data"
-    io._load_file.cache_clear()
-    ctx = context.get_request_context("wa", "tac", datadir=data_path)
+DATA_PATH = Path(__file__).parent.parent / "data" / "project_data"
+STATE, REGION = "wa", "tac"
 
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {
+    "datadir": None,
+    "checked": None,
+    "stamp": None,
+    "version": None,
+    "context": None,
+}
+
+
+def _context_files(datadir: Path):
+    return sorted(p for p in (datadir / STATE / REGION).rglob("*") if p.is_file())
+
+
+def _context_stamp(datadir: Path) -> Tuple:
+    """Cheap check for changes to the reference data, used to invalidate the cache."""
+    return tuple(
+        (str(p), p.stat().st_mtime_ns, p.stat().st_size)
+        for p in _context_files(datadir)
+    )
+
+
+def _context_hash(datadir: Path) -> str:
+    """Content hash of the reference data. This is stable across deployments."""
+    h = hashlib.sha256()
+    for p in _context_files(datadir):
+        h.update(str(p.relative_to(datadir)).encode())
+        h.update(p.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _load_context(datadir: Optional[Path] = None) -> Tuple[str, Dict[str, Any]]:
+    datadir = datadir or DATA_PATH
+    now = time.monotonic()
+
+    with _lock:
+        # stat the reference files at most every CONTEXT_CHECK_SECONDS
+        if (
+            _cache["datadir"] == datadir
+            and _cache["checked"] is not None
+            and now - _cache["checked"] < settings.CONTEXT_CHECK_SECONDS
+        ):
+            return _cache["version"], _cache["context"]
+
+    stamp = _context_stamp(datadir)
+
+    with _lock:
+        if _cache["stamp"] != stamp:
+            # the reference files changed on disk, so nereid's file cache is stale too.
+            io._load_file.cache_clear()
+            ctx = context.get_request_context(STATE, REGION, datadir=datadir)
+            _cache.update(stamp=stamp, version=_context_hash(datadir), context=ctx)
+        _cache.update(datadir=datadir, checked=now)
+
+        return _cache["version"], _cache["context"]
+
+
+def get_context() -> Dict[str, Any]:
+    """Returns the process-wide model context. The config, bmp params and nomograph
+    files are only re-read when they change on disk, and checked for changes at most
+    every `CONTEXT_CHECK_SECONDS`.
+
+    The context is shared, so treat it as read-only. Callers that need to change it
+    must copy it first.
+    """
+    _, ctx = _load_context()
     return ctx
 
 
+def get_context_version() -> str:
+    """Returns the content hash of the reference data behind `get_context`."""
+    version, _ = _load_context()
+    return version
+
+
 def get_pocs(context):
     pocs = init_wq_parameters("land_surface_emc_table", context=context)
     return pocs
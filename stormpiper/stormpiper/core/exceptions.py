@@ -1,2 +1,10 @@
 class RecordNotFound(Exception):
     ...
+
+
+class InvalidEpochs(ValueError):
+    ...
+
+
+class InvalidOverrides(ValueError):
+    ...
@@ -1,13 +1,61 @@
 from functools import lru_cache
+from typing import Dict, Optional
 
+import numpy
+import pandas
 from pint import UnitRegistry
 
 ureg = UnitRegistry()
 ureg.define("cuft = cubic_feet")
 ureg.define("mcg = microgram")
 
+METRIC_TO_SYSTEM = {"l": "cuft", "mcg": "lbs"}
+
 
 @lru_cache()
 def conversion_factor_from_to(from_unit: str, to_unit: str) -> float:
     factor: float = ureg(from_unit).to(to_unit).magnitude
     return factor
+
+
+def convert_units(
+    df: pandas.DataFrame,
+    *,
+    mapper: Optional[Dict[str, str]] = None,
+    value_col: str = "value",
+    unit_col: str = "units",
+    inplace: bool = False,
+) -> pandas.DataFrame:
+    """Convert the `value_col` of a tidy frame from its `unit_col` units to the units
+    in `mapper`, which is keyed by the lower case from-unit.
+
+    The factors are looked up once per distinct unit and mapped onto the rows by
+    their category codes.
+    """
+
+    mapper = mapper or METRIC_TO_SYSTEM
+    if not inplace:
+        df = df.copy()
+
+    is_categorical = isinstance(df[unit_col].dtype, pandas.CategoricalDtype)
+    units = df[unit_col].astype("category")
+    codes = units.cat.codes.to_numpy()
+    from_units = units.cat.categories
+    to_units = [mapper.get(str(u).lower()) for u in from_units]
+
+    unknown = [u for u, t in zip(from_units, to_units) if t is None]
+    if unknown or (codes < 0).any():
+        raise ValueError(f"No conversion for units: {unknown or [None]}")
+
+    factors = numpy.array(
+        [conversion_factor_from_to(f, t) for f, t in zip(from_units, to_units)],
+        dtype=float,
+    )
+    values = df[value_col].to_numpy()
+    dtype = values.dtype if values.dtype.kind == "f" else float
+    df[value_col] = (values * factors[codes]).astype(dtype, copy=False)
+
+    new_units = numpy.array(to_units, dtype=object)[codes]
+    df[unit_col] = pandas.Categorical(new_units) if is_categorical else new_units
+
+    return df
@@ -1,12 +1,16 @@
 import asyncio
 import datetime
 import functools
+import logging
+import multiprocessing
 from typing import List, Optional
 
 import pandas
 import pytz
 from celery.result import AsyncResult
 
+logger = logging.getLogger(__name__)
+
 
 def columns_of_dtype(df: pandas.DataFrame, selector: str) -> List[str]:
     """get columns of df that  match the 'selector' dtype
@@ -56,6 +60,20 @@ async def wait_a_sec_and_see_if_we_can_return_some_data(
     return
 
 
+def process_pool_workers(workers: int) -> int:
+    """Returns `workers`, or 1 if this process can't start a process pool.
+
+    Daemon processes are not allowed to have children, e.g., the celery prefork
+    workers, so the pool would fail to start there.
+    """
+    if workers > 1 and multiprocessing.current_process().daemon:
+        logger.warning(
+            f"running in a daemon process, using 1 worker instead of {workers}."
+        )
+        return 1
+    return workers
+
+
 def datetime_now():
     return datetime.datetime.now(pytz.timezone("US/Pacific"))
 
@@ -8,6 +8,7 @@ from .globals import GlobalSetting
 from .graph import GraphEdge
 from .loads import *
 from .met import Met
+from .pipeline import PipelineRun, PipelineRunStage
 from .results import ResultBlob
 from .subbasin import Subbasin, SubbasinResult
 from .tmnt import *
@@ -5,7 +5,14 @@ from stormpiper.core.config import settings
 
 from .base_class import Base
 
-__all__ = ["LGUBoundary", "LGULoad", "LGULoadToStructural", "LoadToDownStreamSrcCtrl"]
+__all__ = [
+    "LGUBoundary",
+    "LGUBoundaryInput",
+    "LGULoad",
+    "LGULoadCache",
+    "LGULoadToStructural",
+    "LoadToDownStreamSrcCtrl",
+]
 
 
 class LGUBoundary(Base):
@@ -21,6 +28,20 @@ class LGUBoundary(Base):
     geom = Column(Geometry(srid=settings.TACOMA_EPSG))
 
 
+class LGUBoundaryInput(Base):
+    """This table records the hash of each delineation and subbasin that the
+    lgu_boundary was last built from, so a refresh can redo only the subbasins
+    whose inputs changed.
+    """
+
+    __tablename__ = "lgu_boundary_input"
+
+    id = Column(Integer, primary_key=True)
+    layer = Column(String)  # 'delineation' or 'subbasin'
+    key = Column(String)  # node_id of the delineation or the subbasin id
+    input_hash = Column(String)
+
+
 class LGULoadBase:
     id = Column(Integer, primary_key=True)
     node_id = Column(String)
@@ -39,6 +60,23 @@ class LGULoad(Base, LGULoadBase):
     __tablename__ = "lgu_load"
 
 
+class LGULoadCache(Base):
+    """This table caches the lgu_load of each zone geometry for a pair of runoff
+    and coc rasters, so zones whose geometry hasn't changed are not recomputed.
+    """
+
+    __tablename__ = "lgu_load_cache"
+
+    id = Column(Integer, primary_key=True)
+    geom_hash = Column(String, index=True)
+    runoff_path = Column(String)
+    coc_path = Column(String)
+    epoch = Column(String)
+    variable = Column(String)
+    value = Column(Float)
+    units = Column(String)
+
+
 class LGULoadToStructural(Base, LGULoadBase):
     """This table is computed by reducing the lgu_load table by the mass reduced by
     source controls upstream of structural treatment controls.
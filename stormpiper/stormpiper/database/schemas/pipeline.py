@@ -0,0 +1,35 @@
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String
+
+from .base_class import Base, TrackedTable
+
+
+class PipelineRun(Base, TrackedTable):
+    """This table records each run of a pipeline task, the hash of the inputs
+    it ran with and whether the results for those inputs were already current.
+    """
+
+    __tablename__ = "pipeline_run"
+
+    id = Column(Integer, primary_key=True)
+    task = Column(String, index=True)
+    input_hash = Column(String)
+    cache_hit = Column(Boolean)
+    version = Column(String)
+
+
+class PipelineRunStage(Base):
+    """This table records the wall time of each stage of a pipeline run, per epoch
+    where the stage is solved per epoch, and per basin where the basins are solved
+    separately.
+    """
+
+    __tablename__ = "pipeline_run_stage"
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(
+        Integer, ForeignKey("pipeline_run.id", ondelete="CASCADE"), index=True
+    )
+    stage = Column(String)
+    epoch = Column(String)
+    basin = Column(String)
+    seconds = Column(Float)
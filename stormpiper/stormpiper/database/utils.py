@@ -126,6 +126,45 @@ def _delete_and_replace_db(
     return None
 
 
+def delete_and_replace_table_from_query(
+    *,
+    query: str,
+    table_name: str,
+    columns: List[str],
+    engine,
+    params: Optional[dict] = None,
+) -> int:
+    """
+    Overwrites contents of `table_name` with the rows of `query` inside the database
+    with an `insert into ... select`, so the rows never leave postgres.
+    `query` must select the `columns` in order.
+    Returns the number of rows inserted.
+    """
+
+    cols = ", ".join(f'"{c}"' for c in columns)
+
+    Session = get_session(engine=engine)
+    with engine.begin() as conn:
+        conn.execute(f'delete from "{table_name}";')
+        result = conn.execute(
+            f'insert into "{table_name}" ({cols}) {query}', params or {}
+        )
+        if result.rowcount == 0:
+            raise ValueError(
+                f"No data selected to replace table {table_name}. Aborting."
+            )
+
+        # same transaction scope to update the change log
+        with Session.begin() as session:  # type: ignore
+            logger.info("recording table change...")
+            sync_log(tablename=table_name, db=session)
+
+    with engine.begin() as conn:
+        reset_sequence(table_name=table_name, connectable=conn)
+
+    return result.rowcount
+
+
 def delete_and_replace_postgis_table(
     *, gdf: geopandas.GeoDataFrame, table_name: str, engine, **kwargs
 ) -> None:
@@ -159,6 +198,153 @@ def delete_and_replace_table(
     )
 
 
+def delete_and_append_rows(
+    *, df: pandas.DataFrame, table_name: str, keys: List[str], engine, **kwargs
+) -> None:
+    """
+    Upserts the rows of df into `table_name` by deleting the rows that match the
+    `keys` columns of df and then appending df.
+    df schema must match destination table.
+    """
+    if len(df) == 0:
+        raise ValueError(f"No data provided to upsert into {table_name}. Aborting.")
+
+    index = kwargs.pop("index", False)
+
+    Session = get_session(engine=engine)
+    with engine.begin() as conn:
+        table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+        key_values = list(df[keys].drop_duplicates().itertuples(index=False, name=None))
+        conn.execute(
+            table.delete().where(sa.tuple_(*[table.c[k] for k in keys]).in_(key_values))
+        )
+        df.to_sql(table_name, con=conn, if_exists="append", index=index, **kwargs)
+
+        # same transaction scope to update the change log
+        with Session.begin() as session:  # type: ignore
+            logger.info("recording table change...")
+            sync_log(tablename=table_name, db=session)
+
+    return None
+
+
+def _delete_and_append_rows_where_db(
+    *,
+    method_name: str,
+    df: pandas.DataFrame,
+    table_name: str,
+    column: str,
+    values: List,
+    engine,
+    **kwargs,
+) -> None:
+    index = kwargs.pop("index", False)
+
+    Session = get_session(engine=engine)
+    with engine.begin() as conn:
+        table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+        conn.execute(table.delete().where(table.c[column].in_(list(values))))
+        if len(df) > 0:
+            df = df.drop(columns="id", errors="ignore")
+            method = getattr(df, method_name, df.to_sql)
+            method(table_name, con=conn, if_exists="append", index=index, **kwargs)
+
+        # same transaction scope to update the change log
+        with Session.begin() as session:  # type: ignore
+            logger.info("recording table change...")
+            sync_log(tablename=table_name, db=session)
+
+    return None
+
+
+def delete_and_append_rows_where(
+    *,
+    df: pandas.DataFrame,
+    table_name: str,
+    column: str,
+    values: List,
+    engine,
+    **kwargs,
+) -> None:
+    """
+    Replaces the rows of `table_name` whose `column` is in `values` with df. Unlike
+    `delete_and_append_rows`, rows in `values` that are missing from df are
+    removed, and df may be empty.
+    The id column of df is dropped so that the table's sequence assigns new ids.
+    """
+    return _delete_and_append_rows_where_db(
+        method_name="to_sql",
+        df=df,
+        table_name=table_name,
+        column=column,
+        values=values,
+        engine=engine,
+        **kwargs,
+    )
+
+
+def delete_and_append_rows_where_from_query(
+    *,
+    query: str,
+    table_name: str,
+    columns: List[str],
+    column: str,
+    values: List,
+    engine,
+    params: Optional[dict] = None,
+) -> int:
+    """
+    Replaces the rows of `table_name` whose `column` is in `values` with the rows of
+    `query` inside the database with an `insert into ... select`, so the rows never
+    leave postgres. `query` must select the `columns` in order, and may select no
+    rows. Leave the id column out of `columns` so that the table's sequence assigns
+    new ids.
+    Returns the number of rows inserted.
+    """
+
+    cols = ", ".join(f'"{c}"' for c in columns)
+
+    Session = get_session(engine=engine)
+    with engine.begin() as conn:
+        table = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+        conn.execute(table.delete().where(table.c[column].in_(list(values))))
+        result = conn.execute(
+            f'insert into "{table_name}" ({cols}) {query}', params or {}
+        )
+
+        # same transaction scope to update the change log
+        with Session.begin() as session:  # type: ignore
+            logger.info("recording table change...")
+            sync_log(tablename=table_name, db=session)
+
+    return result.rowcount
+
+
+def delete_and_append_postgis_rows_where(
+    *,
+    gdf: geopandas.GeoDataFrame,
+    table_name: str,
+    column: str,
+    values: List,
+    engine,
+    **kwargs,
+) -> None:
+    """
+    Replaces the rows of `table_name` whose `column` is in `values` with gdf, like
+    `delete_and_append_rows_where` for a postgis table.
+    """
+    gdf = gdf.rename_geometry("geom")  # type: ignore
+    return _delete_and_append_rows_where_db(
+        method_name="to_postgis",
+        df=gdf,
+        table_name=table_name,
+        column=column,
+        values=values,
+        engine=engine,
+        **kwargs,
+    )
+
+
 def load_spatialite_extension(conn, connection_record):
     conn.enable_load_extension(True)
     conn.load_extension("mod_spatialite")
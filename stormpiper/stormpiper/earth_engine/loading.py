@@ -1,10 +1,24 @@
 import json
-from functools import lru_cache
-from typing import List, Optional, Union
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, List, Optional, Union
 
 import ee
 import pandas
 from ee import FeatureCollection, Image
+from tenacity import before_sleep_log  # type: ignore
+from tenacity import stop_after_attempt  # type: ignore
+from tenacity import wait_exponential  # type: ignore
+from tenacity import retry
+
+from stormpiper.core.config import settings
+
+logging.basicConfig(level=settings.LOGLEVEL)
+logger = logging.getLogger(__name__)
+
+# separates the epoch from the load band name in the stacked loading image
+EPOCH_SEP = "__"
 
 
 def _build_poc_loading_Image(
@@ -78,51 +92,132 @@ def get_loading_zonal_stats_df(info: dict) -> pandas.DataFrame:
 
 
 @lru_cache
+def get_epochs_loading_Image(runoff_path: str, concentration_path: str) -> Image:
+    """Stacks the runoff volume and poc load bands of every epoch into one image
+    with bands named like '1980s__runoff_mm_per_year_x_m2', so a single
+    reduceRegions call returns all epochs.
+    """
+
+    runoff = Image(runoff_path)
+    ro_units = runoff.toDictionary().get("units").getInfo()
+    ro_col = f"runoff_{ro_units}_x_m2".replace("/", "_per_")
+
+    images = []
+    for band in get_runoff_bands(runoff_path):
+        epoch = band.split("_")[-1]
+        ro_volume = runoff.select(band).multiply(Image.pixelArea())
+        images.append(ro_volume.rename(f"{epoch}{EPOCH_SEP}{ro_col}"))
+
+        loadingImage = get_poc_loading_Image(runoff_path, concentration_path, band)
+        c_band = loadingImage.bandNames().getInfo()
+        images.append(loadingImage.rename([f"{epoch}{EPOCH_SEP}{b}" for b in c_band]))
+
+    return Image.cat(images)
+
+
+def chunk_features(
+    features: List[dict], *, max_features: int, max_bytes: int
+) -> List[List[dict]]:
+    """Splits features into chunks of at most `max_features` features and about
+    `max_bytes` of GeoJSON each. A single feature larger than `max_bytes` gets its
+    own chunk.
+    """
+
+    chunks: List[List[dict]] = []
+    chunk: List[dict] = []
+    chunk_bytes = 0
+    for feature in features:
+        n_bytes = len(json.dumps(feature))
+        if chunk and (len(chunk) >= max_features or chunk_bytes + n_bytes > max_bytes):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(feature)
+        chunk_bytes += n_bytes
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+@retry(
+    stop=stop_after_attempt(settings.EE_ZONAL_STATS_RETRIES + 1),
+    wait=wait_exponential(multiplier=settings.EE_ZONAL_STATS_BACKOFF_SECONDS),
+    before_sleep=before_sleep_log(logger, logging.WARN),
+    reraise=True,
+)
+def _chunk_zonal_stats(loading: Image, features: List[dict]) -> pandas.DataFrame:
+    zones_fc = FeatureCollection({"type": "FeatureCollection", "features": features})
+    return get_loading_zonal_stats_df(
+        get_loading_zonal_stats(loading, zones=zones_fc).getInfo()
+    )
+
+
+def _tidy_epochs(df: pandas.DataFrame, *, join_id: str) -> pandas.DataFrame:
+    """Unstacks the '<epoch>__<band>' columns into one row per zone and epoch."""
+
+    epochs: Dict[str, List[str]] = {}
+    for col in df.columns:
+        if EPOCH_SEP in col:
+            epoch, _ = col.split(EPOCH_SEP, 1)
+            epochs.setdefault(epoch, []).append(col)
+
+    dfs = []
+    for epoch, cols in epochs.items():
+        _df = df[[join_id] + cols].rename(columns=lambda c: c.split(EPOCH_SEP, 1)[-1])
+        _df.insert(1, "epoch", epoch)
+        dfs.append(_df)
+
+    return pandas.concat(dfs, ignore_index=True)
+
+
 def zonal_stats(
-    *, runoff_path: str, concentration_path: str, zones: str, join_id="id"
+    *,
+    runoff_path: str,
+    concentration_path: str,
+    zones: str,
+    join_id="id",
+    max_workers: Optional[int] = None,
 ) -> pandas.DataFrame:
     """
-    zones can be a string path to eeobject or json.dumps
+    zones is a json.dumps of a GeoJSON FeatureCollection
+
+    The zones are split into chunks bounded by the EE_ZONAL_STATS_MAX_FEATURES and
+    EE_ZONAL_STATS_MAX_BYTES settings, and each chunk is reduced over one multiband
+    image of every epoch's loads. The chunks are requested concurrently and retried
+    with exponential backoff.
     """
 
-    zones_fc = FeatureCollection(json.loads(zones))
+    max_workers = max_workers or settings.EE_ZONAL_STATS_WORKERS
 
-    runoff = Image(runoff_path)
-    ro_bands = get_runoff_bands(runoff_path)
-    ro_units = runoff.toDictionary().get("units").getInfo()
-    ro_dct = get_loading_zonal_stats(
-        runoff.multiply(Image.pixelArea()), zones=zones_fc
-    ).getInfo()
-    df = (
-        get_loading_zonal_stats_df(ro_dct)
-        .melt(
-            join_id,
-            ro_bands,
-            var_name="epoch",
-            value_name=f"runoff_{ro_units}_x_m2".replace("/", "_per_"),
-        )
-        .assign(epoch=lambda df: df["epoch"].str.split("_").str[-1])
+    # only the join_id property is needed in the request
+    features = [
+        {**f, "properties": {join_id: f["properties"][join_id]}}
+        for f in json.loads(zones)["features"]
+    ]
+    chunks = chunk_features(
+        features,
+        max_features=settings.EE_ZONAL_STATS_MAX_FEATURES,
+        max_bytes=settings.EE_ZONAL_STATS_MAX_BYTES,
     )
 
-    poc_dfs = []
-    for epoch in ro_bands:
+    loadingImage = get_epochs_loading_Image(runoff_path, concentration_path)
 
-        loadingImage = get_poc_loading_Image(runoff_path, concentration_path, epoch)
-        c_band = loadingImage.bandNames().getInfo()
-        poc_dct = get_loading_zonal_stats(loadingImage, zones=zones_fc).getInfo()
-
-        poc_df = (
-            get_loading_zonal_stats_df(poc_dct)
-            .reindex(columns=[join_id] + c_band)
-            .assign(epoch=epoch.split("_")[-1])
+    logger.info(
+        f"requesting zonal stats for {len(features)} zones in {len(chunks)} chunks"
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunk_dfs = list(
+            executor.map(partial(_chunk_zonal_stats, loadingImage), chunks)
         )
 
-        poc_dfs.append(poc_df)
-
-    poc_df = pandas.concat(poc_dfs)
-    df_wide = df.merge(poc_df, on=[join_id, "epoch"], how="left",).rename(
-        columns=lambda c: c.replace("mm_per_year_x_m2", "L").replace(
-            "mcg_per_L_x_L", "mcg"
+    df_wide = (
+        pandas.concat(chunk_dfs, ignore_index=True)
+        .pipe(_tidy_epochs, join_id=join_id)
+        .rename(
+            columns=lambda c: c.replace("mm_per_year_x_m2", "L").replace(
+                "mcg_per_L_x_L", "mcg"
+            )
         )
     )
 
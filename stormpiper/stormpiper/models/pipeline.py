@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import List, Optional
+
+from .base import BaseORM
+
+
+class PipelineRunStage(BaseORM):
+    stage: str
+    epoch: Optional[str] = None
+    basin: Optional[str] = None
+    seconds: float
+
+
+class PipelineRun(BaseORM):
+    id: int
+    task: str
+    input_hash: Optional[str] = None
+    cache_hit: Optional[bool] = None
+    version: Optional[str] = None
+    time_created: Optional[datetime] = None
+    stages: List[PipelineRunStage] = []
@@ -0,0 +1,48 @@
+from typing import Dict, List, Optional
+
+from pydantic import Field
+
+from .base import BaseModel
+from .tmnt_attr import TMNTFacilityAttrPatch
+
+EXAMPLE_SCENARIO = dict(
+    tmnt_facility_overrides={"SWFA-100002": {"area_sqft": 2000, "depth_ft": 1.5}},
+    epochs=["1980s"],
+)
+
+
+class ScenarioRequest(BaseModel):
+    tmnt_facility_overrides: Dict[str, TMNTFacilityAttrPatch]
+    epochs: Optional[List[str]] = None
+
+    class Config:
+        schema_extra = {"example": EXAMPLE_SCENARIO}
+
+    def overrides(self):
+        return {
+            node_id: attrs.dict(exclude_unset=True)
+            for node_id, attrs in self.tmnt_facility_overrides.items()
+        }
+
+
+EXAMPLE_SCENARIOS = dict(
+    scenarios=[
+        {"SWFA-100002": {"area_sqft": 2000}},
+        {"SWFA-100002": {"area_sqft": 4000}},
+    ],
+    epochs=["1980s"],
+)
+
+
+class ScenariosRequest(BaseModel):
+    scenarios: List[Dict[str, TMNTFacilityAttrPatch]] = Field(..., min_items=1)
+    epochs: Optional[List[str]] = None
+
+    class Config:
+        schema_extra = {"example": EXAMPLE_SCENARIOS}
+
+    def overrides(self):
+        return [
+            {node_id: attrs.dict(exclude_unset=True) for node_id, attrs in s.items()}
+            for s in self.scenarios
+        ]
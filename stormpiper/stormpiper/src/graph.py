@@ -1,7 +1,13 @@
+from typing import Iterable, Set
+
+import networkx as nx
 import pandas
 
 from stormpiper.database.connection import engine
 
+# every basin discharges to this node.
+OUTFALL = "PUGET_SOUND"
+
 
 def build_edge_list(lgu_boundary, tmnt_v):
 
@@ -31,7 +37,7 @@ def build_edge_list(lgu_boundary, tmnt_v):
         lgu.drop_duplicates(subset=["basinname"])
         .dropna()
         .assign(source=lambda df: df["basinname"])
-        .assign(target="PUGET_SOUND")
+        .assign(target=OUTFALL)
     )
 
     cols = ["source", "target", "ntype", "subbasin", "basinname"]
@@ -43,7 +49,7 @@ def build_edge_list(lgu_boundary, tmnt_v):
             subbasin_to_wshed,
             wshed_to_sound,
         ]
-    )[cols].assign(target=lambda df: df["target"].fillna("PUGET_SOUND"))
+    )[cols].assign(target=lambda df: df["target"].fillna(OUTFALL))
 
     return edge_list
 
@@ -56,3 +62,21 @@ def build_edge_list_from_database(*, engine=engine):
         fac = pandas.read_sql("select * from tmnt_v", con=conn)
 
     return build_edge_list(lgu, fac)
+
+
+def get_downstream_nodes(g: nx.DiGraph, node_ids: Iterable[str]) -> Set[str]:
+    """Returns the node_ids and every node they discharge to, e.g., for a facility
+    this is the facility, its 'SB_' subbasin, its 'B_' basin and the outfall.
+    """
+
+    nodes = {n for n in node_ids if n in g}
+    for n in list(nodes):
+        nodes |= nx.descendants(g, n)
+
+    return nodes
+
+
+def get_basin_nodes(g: nx.DiGraph, basin: str) -> Set[str]:
+    """Returns the 'B_' basin node and every node upstream of it."""
+
+    return nx.ancestors(g, basin) | {basin}
@@ -1,17 +1,29 @@
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 
 import geopandas
 import numpy
 import pandas
 
 from stormpiper.core.config import settings
-from stormpiper.core.units import conversion_factor_from_to
+from stormpiper.core.units import METRIC_TO_SYSTEM, convert_units
 from stormpiper.database.connection import engine
+from stormpiper.database.utils import (
+    delete_and_append_rows,
+    delete_and_append_rows_where,
+)
 from stormpiper.earth_engine import loading, login
 
-from .organics import add_virtual_pocs_to_tidy_load_summary
-from .utils import get_loading_df_from_db, unpack_results_blob
+from . import raster_loading
+from .organics import VIRTUAL_POCS, add_virtual_pocs_to_tidy_load_summary
+from .utils import (
+    compact_tidy_dtypes,
+    get_loading_df_from_db,
+    hash_geometries,
+    match_categorical_dtypes,
+    read_table_for_subbasins,
+    unpack_results_blob,
+)
 
 logging.basicConfig(level=settings.LOGLEVEL)
 logger = logging.getLogger(__name__)
@@ -29,16 +41,54 @@ POC_REMAPPER = {
 }
 
 
+def get_loading_paths(
+    backend: Optional[str] = None,
+    runoff_path: Optional[str] = None,
+    coc_path: Optional[str] = None,
+) -> Tuple[str, str, str]:
+    """Returns the backend and the runoff and coc paths, filling in the settings
+    for any that are not given.
+    """
+
+    backend = backend or settings.LOADING_BACKEND
+
+    if backend == "raster":
+        runoff_path = runoff_path or settings.RASTER_RUNOFF_PATH
+        coc_path = coc_path or settings.RASTER_COC_PATH
+    elif backend == "earth_engine":
+        runoff_path = runoff_path or settings.EE_RUNOFF_PATH
+        coc_path = coc_path or settings.EE_COC_PATH
+    else:
+        raise ValueError(f"unknown loading backend: {backend}")
+
+    return backend, runoff_path, coc_path
+
+
 def compute_loading_zonal_stats(
     *,
     lgu_boundary: geopandas.GeoDataFrame,
     runoff_path: Optional[str] = None,
     coc_path: Optional[str] = None,
+    backend: Optional[str] = None,
 ) -> pandas.DataFrame:
-    """Calculate land surface loading in metric units."""
+    """Calculate land surface loading in metric units.
+
+    backend : "earth_engine" or "raster". Defaults to the LOADING_BACKEND setting.
+        The raster backend reads local GeoTIFFs and doesn't need earth engine.
+    """
 
-    runoff_path = runoff_path or settings.EE_RUNOFF_PATH
-    coc_path = coc_path or settings.EE_COC_PATH
+    backend, runoff_path, coc_path = get_loading_paths(backend, runoff_path, coc_path)
+
+    if backend == "raster":
+        logger.info("Running zonal stats on local rasters...")
+        df_wide = raster_loading.zonal_stats(
+            runoff_path=runoff_path,
+            concentration_path=coc_path,
+            zones=lgu_boundary,
+            join_id="node_id",
+        )
+        logger.info("Completed zonal stats on local rasters.")
+        return df_wide
 
     if login():
         logger.info("Running zonal stats on earth engine...")
@@ -59,23 +109,40 @@ def compute_loading_zonal_stats(
     return df_wide
 
 
+def _parse_load_column(col: str, poc_remapper=POC_REMAPPER) -> Tuple[str, str]:
+    """'TotalSuspendedSolids_mcg' -> ('TSS', 'mcg')"""
+
+    *name, units = col.split("_")
+    variable = "_".join(name)
+
+    return poc_remapper.get(variable, variable), units
+
+
 def wide_load_to_tidy_load(wide_load: pandas.DataFrame, poc_remapper=POC_REMAPPER):
+    """Melt the zonal stats into node_id, epoch, variable, value, units records.
+
+    There are only a few load columns, so each column name is parsed once and the
+    variable and units are broadcast to the rows by column position.
+    """
+
+    id_vars = ["node_id", "epoch"]
+    value_cols = [c for c in wide_load.columns if c not in id_vars]
+    parsed = [_parse_load_column(c, poc_remapper) for c in value_cols]
+    variables = numpy.array([v for v, _ in parsed], dtype=object)
+    units = numpy.array([u for _, u in parsed], dtype=object)
+
+    col_ix = numpy.repeat(numpy.arange(len(value_cols)), len(wide_load))
 
     df_tidy = (
-        wide_load.melt(id_vars=["node_id", "epoch"])
-        .assign(
-            _variable=lambda df: df["variable"]
-            .str.split("_")
-            .str[:-1]  # pop off unit and rejoin
-            .str.join("_")
+        pandas.DataFrame(
+            {
+                "node_id": numpy.tile(wide_load["node_id"].to_numpy(), len(value_cols)),
+                "epoch": numpy.tile(wide_load["epoch"].to_numpy(), len(value_cols)),
+                "variable": variables[col_ix],
+                "value": wide_load[value_cols].to_numpy().ravel(order="F"),
+                "units": units[col_ix],
+            }
         )
-        .assign(
-            units=lambda df: df["variable"].str.split("_").str[-1]
-        )  # pop off unit into new column
-        .assign(
-            variable=lambda df: df["_variable"].replace(poc_remapper)
-        )  # normalize poc names
-        .drop(columns=["_variable"])
         .pipe(add_virtual_pocs_to_tidy_load_summary)
         .reset_index(drop=True)
         .assign(id=lambda df: df.index.values + 1)
@@ -89,24 +156,7 @@ def convert_tidy_data_from_metric_to_system(
     tidy_df: pandas.DataFrame,
 ) -> pandas.DataFrame:
 
-    mapper = {"l": "cuft", "mcg": "lbs"}
-    cols = tidy_df.columns
-
-    out = (
-        tidy_df.assign(from_value=lambda df: df["value"])
-        .assign(from_unit=lambda df: df["units"])
-        .assign(to_unit=lambda df: df["from_unit"].str.lower().map(mapper))
-        .assign(
-            factor=lambda df: numpy.vectorize(conversion_factor_from_to)(
-                df["from_unit"], df["to_unit"]
-            )
-        )
-        .assign(value=lambda df: df["factor"] * df["from_value"])
-        .assign(units=lambda df: df["to_unit"])
-        .reindex(columns=cols)
-    )
-
-    return out
+    return convert_units(tidy_df, mapper=METRIC_TO_SYSTEM)
 
 
 def compute_loading(
@@ -114,11 +164,15 @@ def compute_loading(
     lgu_boundary: geopandas.GeoDataFrame,
     runoff_path: Optional[str] = None,
     coc_path: Optional[str] = None,
+    backend: Optional[str] = None,
 ) -> pandas.DataFrame:
     try:
         # metric units
         wide_load_metric = compute_loading_zonal_stats(
-            lgu_boundary=lgu_boundary, runoff_path=runoff_path, coc_path=coc_path
+            lgu_boundary=lgu_boundary,
+            runoff_path=runoff_path,
+            coc_path=coc_path,
+            backend=backend,
         )
         # metric units
         tidy_load_metric = wide_load_to_tidy_load(wide_load_metric)
@@ -127,18 +181,155 @@ def compute_loading(
         ls_loading = convert_tidy_data_from_metric_to_system(tidy_load_metric)
         return ls_loading
     except Exception:
-        logger.error("Could not create loading zonal stats from ee.")
+        logger.error("Could not create loading zonal stats.")
         raise
 
 
-def compute_loading_db(engine=engine, runoff_path=None, coc_path=None):
+def compute_loading_cached(
+    *,
+    lgu_boundary: geopandas.GeoDataFrame,
+    cache: pandas.DataFrame,
+    runoff_path: Optional[str] = None,
+    coc_path: Optional[str] = None,
+    backend: Optional[str] = None,
+) -> Tuple[pandas.DataFrame, pandas.DataFrame]:
+    """Computes the loading of only the zones whose geometry is not in `cache`.
+
+    cache : tidy loading in system units keyed by geom_hash, e.g. the rows of the
+        lgu_load_cache table for these runoff and coc paths.
+
+    The cache only holds the pocs from the zonal stats. The virtual pocs are derived
+    from them after the cache is read.
+
+    Returns the loading of every zone in `lgu_boundary` and the new cache rows.
+    """
+
+    backend, runoff_path, coc_path = get_loading_paths(backend, runoff_path, coc_path)
+    cols = ["geom_hash", "epoch", "variable", "value", "units"]
+    cache = cache.loc[~cache["variable"].isin(list(VIRTUAL_POCS))]
+
+    zones = lgu_boundary
+    if "geom_hash" not in zones.columns:
+        zones = zones.assign(geom_hash=hash_geometries(zones.geometry))
+    new_zones = zones.loc[~zones["geom_hash"].isin(cache["geom_hash"])].drop_duplicates(
+        "geom_hash"
+    )
+
+    logger.info(
+        f"{len(new_zones)} of {len(zones)} zones have new geometry and need loading"
+    )
+    new_cache = pandas.DataFrame(columns=cols + ["runoff_path", "coc_path"])
+    if len(new_zones) > 0:
+        new_loading = compute_loading(
+            lgu_boundary=new_zones,
+            runoff_path=runoff_path,
+            coc_path=coc_path,
+            backend=backend,
+        )
+        new_cache = (
+            new_loading.loc[~new_loading["variable"].isin(list(VIRTUAL_POCS))]
+            .merge(new_zones[["node_id", "geom_hash"]], on="node_id", how="inner")
+            .reindex(columns=cols)
+            .assign(runoff_path=runoff_path, coc_path=coc_path)
+        )
+
+    ls_loading = zones[["node_id", "geom_hash"]].merge(
+        pandas.concat([cache.reindex(columns=cols), new_cache[cols]]),
+        on="geom_hash",
+        how="inner",
+    )[["node_id", "epoch", "variable", "value", "units"]]
+
+    if len(ls_loading) > 0:
+        ls_loading = add_virtual_pocs_to_tidy_load_summary(ls_loading).reset_index(
+            drop=True
+        )
+
+    return ls_loading, new_cache
+
+
+def prune_lgu_load_cache(*, geom_hashes, engine=engine) -> int:
+    """Deletes the lgu_load_cache rows of every geometry that is not in
+    `geom_hashes`, for all runoff and coc paths. Returns the number of geometries
+    removed.
+    """
+
+    existing = pandas.read_sql(
+        "select distinct geom_hash from lgu_load_cache", con=engine
+    )
+    removed = sorted(set(existing["geom_hash"]) - set(geom_hashes))
+    if removed:
+        logger.info(f"deleting {len(removed)} stale geometries from lgu_load_cache")
+        delete_and_append_rows_where(
+            df=pandas.DataFrame(),
+            table_name="lgu_load_cache",
+            column="geom_hash",
+            values=removed,
+            engine=engine,
+        )
+
+    return len(removed)
+
+
+def compute_loading_db(
+    engine=engine,
+    runoff_path=None,
+    coc_path=None,
+    backend=None,
+    use_cache=True,
+    subbasins=None,
+):
+    """Computes the loading of the lgu_boundary zones, or only of the zones in
+    `subbasins` if given.
+
+    If `use_cache` is True, only the zones with geometry that is new for these
+    runoff and coc paths are computed, and their loading is added to the
+    lgu_load_cache table. Cached geometries that are no longer in lgu_boundary are
+    deleted from the cache.
+    """
 
     with engine.begin() as conn:
         zones = geopandas.read_postgis("lgu_boundary", con=conn)
 
-    df = compute_loading(
-        lgu_boundary=zones, runoff_path=runoff_path, coc_path=coc_path  # type: ignore
+    if use_cache:
+        zones = zones.assign(geom_hash=hash_geometries(zones.geometry))
+        prune_lgu_load_cache(geom_hashes=zones["geom_hash"], engine=engine)
+
+    if subbasins is not None:
+        zones = zones.loc[zones["subbasin"].isin(subbasins)]
+
+    if not use_cache:
+        return compute_loading(
+            lgu_boundary=zones,  # type: ignore
+            runoff_path=runoff_path,
+            coc_path=coc_path,
+            backend=backend,
+        )
+
+    backend, runoff_path, coc_path = get_loading_paths(backend, runoff_path, coc_path)
+
+    cache = pandas.read_sql(
+        "select geom_hash, epoch, variable, value, units from lgu_load_cache "
+        "where runoff_path = %(runoff_path)s and coc_path = %(coc_path)s",
+        params={"runoff_path": runoff_path, "coc_path": coc_path},
+        con=engine,
+    )
+
+    df, new_cache = compute_loading_cached(
+        lgu_boundary=zones,  # type: ignore
+        cache=cache,
+        runoff_path=runoff_path,
+        coc_path=coc_path,
+        backend=backend,
     )
+
+    if len(new_cache) > 0:
+        delete_and_append_rows(
+            df=new_cache,
+            table_name="lgu_load_cache",
+            keys=["geom_hash", "runoff_path", "coc_path"],
+            engine=engine,
+        )
+
     return df
 
 
@@ -155,6 +346,15 @@ def _prep_00_loading_tidy_to_wide(
     if values is None:
         values = ["value"]
 
+    # drop unused categories, e.g., after a query, so they don't become empty columns
+    df_tidy = df_tidy.assign(
+        **{
+            c: df_tidy[c].cat.remove_unused_categories()
+            for c in ["node_id", "epoch", "variable", "units"]
+            if isinstance(df_tidy[c].dtype, pandas.CategoricalDtype)
+        }
+    )
+
     _df = df_tidy.pivot(
         index=["node_id", "epoch"], columns=["variable", "units"], values=values
     )
@@ -231,14 +431,16 @@ def land_surface_load_to_structural_from_db(epoch=None, connectable=engine):
 
 
 def apply_tidy_load_reduction(*, load, load_reduced):
+    keys = ["node_id", "epoch", "variable"]
+    load_reduced = (
+        load_reduced.groupby(keys, observed=True)["load_reduced"]
+        .sum()
+        .reset_index()
+        .pipe(match_categorical_dtypes, load, keys)
+    )
+
     load_to_next = (
-        load.merge(
-            load_reduced.groupby(["node_id", "epoch", "variable"])["load_reduced"]
-            .sum()
-            .reset_index(),
-            on=["node_id", "epoch", "variable"],
-            how="left",
-        )
+        load.merge(load_reduced, on=keys, how="left")
         .fillna({"load_reduced": 0})
         .assign(value=lambda df: df["value"] - df["load_reduced"])
         .drop(columns="load_reduced")
@@ -249,11 +451,13 @@ def apply_tidy_load_reduction(*, load, load_reduced):
     return load_to_next
 
 
-def load_to_structural_bmps_from_db(*, engine=engine):
-    lgu_load = pandas.read_sql("lgu_load", con=engine)
-    upstream_load_reduced = pandas.read_sql(
-        "tmnt_source_control_upstream_load_reduced", con=engine
-    )
+def load_to_structural_bmps_from_db(*, subbasins=None, engine=engine):
+    lgu_load = read_table_for_subbasins(
+        "lgu_load", subbasins=subbasins, by="lgu", engine=engine
+    ).pipe(compact_tidy_dtypes)
+    upstream_load_reduced = read_table_for_subbasins(
+        "tmnt_source_control_upstream_load_reduced", subbasins=subbasins, engine=engine
+    ).pipe(compact_tidy_dtypes)
 
     df = apply_tidy_load_reduction(load=lgu_load, load_reduced=upstream_load_reduced)
 
@@ -262,13 +466,15 @@ def load_to_structural_bmps_from_db(*, engine=engine):
 
 def load_to_downstream_src_ctrls(result_blob):
 
-    results = unpack_results_blob(result_blob)
+    # subbasin nodes start with "SB_". only their blobs are unpacked.
+    results = unpack_results_blob(
+        result_blob.loc[result_blob["node_id"].str.startswith("SB_").to_numpy()]
+    )
     discharge_cols = [c for c in results.columns if "_total_discharged" in c.lower()]
 
     cols = ["node_id", "epoch"] + discharge_cols
 
-    # subbasin nodes start with "SB_"
-    load_to_ds_src_ctrl = results.loc[results.node_id.str.startswith("SB_")][cols]
+    load_to_ds_src_ctrl = results[cols].copy()
 
     for col in discharge_cols:
         backup_results = results[col.replace("_total_discharged", "")]
@@ -291,8 +497,16 @@ def load_to_downstream_src_ctrls(result_blob):
     return load_to_ds_src_ctrl
 
 
-def load_to_downstream_src_ctrls_from_db(*, engine=engine):
-    result_blob = pandas.read_sql("result_blob", con=engine)
+def load_to_downstream_src_ctrls_from_db(*, subbasins=None, engine=engine):
+    # the typed result columns don't include the runoff volume, so only the blob
+    # is read.
+    result_blob = read_table_for_subbasins(
+        "result_blob",
+        subbasins=subbasins,
+        by="node",
+        columns=["node_id", "epoch", "blob"],
+        engine=engine,
+    )
 
     df = load_to_downstream_src_ctrls(result_blob)
 
@@ -316,11 +530,15 @@ def subbasin_loading_summary_result(
     return load_from_subbasin
 
 
-def subbasin_loading_summary_result_from_db(*, engine=engine):
-    load_to_ds_src_ctrl = pandas.read_sql("load_to_ds_src_ctrl", con=engine)
-    tmnt_source_control_ds_load_reduced = pandas.read_sql(
-        "tmnt_source_control_downstream_load_reduced", con=engine
-    )
+def subbasin_loading_summary_result_from_db(*, subbasins=None, engine=engine):
+    load_to_ds_src_ctrl = read_table_for_subbasins(
+        "load_to_ds_src_ctrl", subbasins=subbasins, by="node", engine=engine
+    ).pipe(compact_tidy_dtypes)
+    tmnt_source_control_ds_load_reduced = read_table_for_subbasins(
+        "tmnt_source_control_downstream_load_reduced",
+        subbasins=subbasins,
+        engine=engine,
+    ).pipe(compact_tidy_dtypes)
     df = subbasin_loading_summary_result(
         load=load_to_ds_src_ctrl, load_reduced=tmnt_source_control_ds_load_reduced
     )
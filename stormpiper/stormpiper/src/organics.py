@@ -1,13 +1,16 @@
+import numpy
 import pandas
 
-VIRTUAL_POLLUTANT_MAPPER = {
-    "PHE": lambda tss: tss * 1e-6 * 1 * 1,
-    "PYR": lambda tss: tss * 1.9 * 1,
-    "DEHP": lambda tss: tss * 1e-6 * 19.3 * 2.3,
+# sediment-bound organics are estimated as a fixed multiple of the TSS load or
+# concentration, e.g., DEHP = TSS * 1e-6 * 19.3 * 2.3
+VIRTUAL_POLLUTANT_COEFFICIENTS = {
+    "PHE": 1e-6 * 1 * 1,
+    "PYR": 1.9 * 1,
+    "DEHP": 1e-6 * 19.3 * 2.3,
 }
 
 
-VIRTUAL_POCS = VIRTUAL_POLLUTANT_MAPPER.keys()
+VIRTUAL_POCS = VIRTUAL_POLLUTANT_COEFFICIENTS.keys()
 
 
 def add_virtual_pocs_to_tidy_load_summary(
@@ -16,21 +19,30 @@ def add_virtual_pocs_to_tidy_load_summary(
     """
     load_tidy must have a 'variable' column with parameters labels.
 
+    Returns the non-virtual rows followed by a copy of the TSS rows for each
+    virtual poc, in the order of `VIRTUAL_POLLUTANT_COEFFICIENTS`.
+
     """
 
-    tss = load_tidy.query('variable == "TSS"')
-    non_virtual_pocs = load_tidy.query("variable not in @VIRTUAL_POCS")
+    variable = load_tidy["variable"]
+    tss = load_tidy.loc[(variable == "TSS").to_numpy()]
 
     if tss.empty:
         return pandas.DataFrame()
 
-    virtual_pocs = []
-    for poc in VIRTUAL_POCS:
-        func = VIRTUAL_POLLUTANT_MAPPER[poc]
-        virtual_poc = tss.assign(variable=poc).assign(value=lambda df: func(df.value))
-        virtual_pocs.append(virtual_poc)
+    non_virtual_pocs = load_tidy.loc[~variable.isin(VIRTUAL_POCS).to_numpy()]
+
+    pocs = list(VIRTUAL_POLLUTANT_COEFFICIENTS.keys())
+    coefficients = numpy.fromiter(VIRTUAL_POLLUTANT_COEFFICIENTS.values(), float)
+    n = len(tss)
 
-    df = pandas.concat([non_virtual_pocs] + virtual_pocs)
+    virtual_pocs = tss.iloc[numpy.tile(numpy.arange(n), len(pocs))]
+    virtual_pocs = virtual_pocs.assign(
+        variable=numpy.repeat(numpy.array(pocs, dtype=object), n),
+        value=virtual_pocs["value"].to_numpy() * numpy.repeat(coefficients, n),
+    )
+
+    df = pandas.concat([non_virtual_pocs, virtual_pocs])
 
     return df
 
@@ -39,10 +51,8 @@ def add_virtual_pocs_to_wide_load_summary(results):
 
     tss_cols = [c for c in results.columns if "tss" in c.lower()]
 
-    for poc in VIRTUAL_POCS:
+    for poc, coefficient in VIRTUAL_POLLUTANT_COEFFICIENTS.items():
         new_cols = [c.replace("TSS", poc) for c in tss_cols]
-
-        func = VIRTUAL_POLLUTANT_MAPPER[poc]
-        results[new_cols] = results[tss_cols].apply(func, axis=1, result_type="expand")
+        results[new_cols] = results[tss_cols].to_numpy(dtype=float) * coefficient
 
     return results
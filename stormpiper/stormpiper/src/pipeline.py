@@ -0,0 +1,111 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+
+from stormpiper.core import utils
+from stormpiper.core.config import settings
+from stormpiper.database.connection import engine
+from stormpiper.database.schemas.changelog import TableChangeLog
+from stormpiper.database.schemas.pipeline import PipelineRun, PipelineRunStage
+
+logging.basicConfig(level=settings.LOGLEVEL)
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def timed(stage: str, spans: Optional[List[Dict[str, Any]]] = None):
+    """Times the block and appends a {"stage", "seconds"} record to `spans`.
+    Does nothing if `spans` is None.
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if spans is not None:
+            spans.append(dict(stage=stage, seconds=time.perf_counter() - start))
+
+
+def log_spans(spans: List[Dict[str, Any]]) -> None:
+    for span in spans:
+        logger.info(json.dumps({"span": span}))
+
+
+def is_current(*, task: str, input_hash: str, table_name: str, engine=engine) -> bool:
+    """True if the last run of `task` had the same `input_hash`, and `table_name`
+    has not been written to by anything else since then.
+    """
+
+    with engine.begin() as conn:
+        last_run = conn.execute(
+            sa.select(PipelineRun)
+            .where(PipelineRun.task == task)
+            .order_by(PipelineRun.id.desc())
+            .limit(1)
+        ).first()
+
+        if last_run is None or last_run.input_hash != input_hash:
+            return False
+
+        last_updated = (
+            sa.select(sa.func.max(TableChangeLog.last_updated))
+            .where(TableChangeLog.tablename == table_name)
+            .scalar_subquery()
+        )
+        table_is_current = conn.execute(
+            sa.select(
+                sa.and_(
+                    sa.exists().select_from(sa.table(table_name)),
+                    sa.func.coalesce(last_updated <= last_run.time_created, False),
+                )
+            )
+        ).scalar()
+
+    return bool(table_is_current)
+
+
+def record_run(
+    *,
+    task: str,
+    input_hash: str,
+    cache_hit: bool,
+    spans: Optional[List[Dict[str, Any]]] = None,
+    engine=engine,
+) -> int:
+    """Record a run of `task` and the timing of its stages. Returns the run id."""
+
+    logger.info(f"{task} cache {'hit' if cache_hit else 'miss'}: {input_hash}")
+    with engine.begin() as conn:
+        run_id = conn.execute(
+            sa.insert(PipelineRun)
+            .values(
+                task=task,
+                input_hash=input_hash,
+                cache_hit=cache_hit,
+                version=settings.VERSION,
+                # same clock as the changelog
+                time_created=utils.datetime_now(),
+            )
+            .returning(PipelineRun.id)
+        ).scalar()
+
+        if spans:
+            conn.execute(
+                sa.insert(PipelineRunStage),
+                [
+                    dict(
+                        run_id=run_id,
+                        stage=span["stage"],
+                        epoch=span.get("epoch"),
+                        basin=span.get("basin"),
+                        seconds=span["seconds"],
+                    )
+                    for span in spans
+                ],
+            )
+
+    return run_id
@@ -0,0 +1,195 @@
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import geopandas
+import numpy
+import pandas
+import rasterio
+from rasterio.features import rasterize
+from rasterio.windows import Window
+
+from stormpiper.core.config import settings
+
+logging.basicConfig(level=settings.LOGLEVEL)
+logger = logging.getLogger(__name__)
+
+# units of the production assets. GeoTIFFs exported from earth engine do not carry
+# the asset properties, so these are used unless the file has a 'units' tag.
+RUNOFF_UNITS = "mm/year"
+COC_UNITS = "mcg/L"
+
+# authalic radius of the WGS84 ellipsoid, for the pixel area of geographic rasters
+EARTH_RADIUS_M = 6371007.2
+
+
+def _band_names(src) -> List[str]:
+    names = list(src.descriptions)
+    if not all(names):
+        raise ValueError(
+            f"every band of {src.name} needs a description, e.g., 'runoff_1980s'."
+        )
+    return names
+
+
+def _pixel_area_m2(src, row_off: int, n_rows: int) -> numpy.ndarray:
+    """Area of the pixels in each row of the window as an (n_rows, 1) array."""
+
+    t = src.transform
+    if src.crs.is_geographic:
+        top = numpy.radians(t.f + t.e * (row_off + numpy.arange(n_rows)))
+        bottom = top + numpy.radians(t.e)
+        area = (
+            EARTH_RADIUS_M**2
+            * numpy.radians(abs(t.a))
+            * numpy.abs(numpy.sin(top) - numpy.sin(bottom))
+        )
+    else:
+        _, factor = src.crs.linear_units_factor
+        area = numpy.full(n_rows, abs(t.a * t.e - t.b * t.d) * factor**2)
+
+    return area[:, None]
+
+
+def _read_window(src, window) -> numpy.ndarray:
+    # masked and nan pixels don't contribute to the sums, like an ee.Image mask.
+    data = src.read(window=window, masked=True).astype(float).filled(0)
+    return numpy.nan_to_num(data, nan=0.0)
+
+
+def _zonal_sums_chunk(
+    chunk: Tuple[int, int],
+    *,
+    runoff_path: str,
+    concentration_path: str,
+    labels_path: Path,
+    shape: Tuple[int, int],
+    n_zones: int,
+) -> numpy.ndarray:
+    """Per-zone sums of the rows [row_off, row_off + n_rows) of the rasters.
+
+    Returns an (epoch, runoff + pocs, zone) array.
+    """
+
+    row_off, n_rows = chunk
+    labels = numpy.memmap(labels_path, dtype="int32", mode="r", shape=shape)
+    labels = numpy.asarray(labels[row_off : row_off + n_rows]).ravel()
+
+    # each thread opens its own handles; rasterio datasets are not thread safe.
+    with rasterio.open(runoff_path) as ro, rasterio.open(concentration_path) as c:
+        sums = numpy.zeros((ro.count, 1 + c.count, n_zones + 1))
+        if not labels.any():
+            return sums[:, :, 1:]
+
+        window = Window(0, row_off, shape[1], n_rows)
+        area = _pixel_area_m2(ro, row_off, n_rows)
+        runoff = _read_window(ro, window)
+        coc = _read_window(c, window)
+
+    for e, runoff_depth in enumerate(runoff):
+        runoff_volume = runoff_depth * area  # (mm/year * m^2)
+        sums[e, 0] = numpy.bincount(
+            labels, runoff_volume.ravel(), minlength=n_zones + 1
+        )
+        for p, concentration in enumerate(coc):
+            load = runoff_volume * concentration  # (mm/year * mcg/l * m^2)
+            sums[e, 1 + p] = numpy.bincount(labels, load.ravel(), minlength=n_zones + 1)
+
+    return sums[:, :, 1:]
+
+
+def _rename_load_column(c: str) -> str:
+    # same names as earth_engine.loading.zonal_stats
+    return c.replace("mm_per_year_x_m2", "L").replace("mcg_per_L_x_L", "mcg")
+
+
+def zonal_stats(
+    *,
+    runoff_path: str,
+    concentration_path: str,
+    zones: geopandas.GeoDataFrame,
+    join_id: str = "id",
+    workers: Optional[int] = None,
+    chunk_rows: Optional[int] = None,
+) -> pandas.DataFrame:
+    """Sums the runoff volume and poc loads of each zone from local GeoTIFFs.
+
+    This is the local counterpart of `earth_engine.loading.zonal_stats` and returns
+    the same wide frame of `join_id`, epoch, runoff_L and <poc>_mcg columns.
+
+    The runoff raster has one band per epoch and the concentration raster has one
+    band per poc, and the band descriptions carry the names (e.g., 'runoff_1980s'
+    and 'TSS_mcg_per_L'). Both must be on the same grid. The zones are rasterized
+    once into a memory-mapped label grid and the rasters are read in windows of
+    `chunk_rows` rows which are summed in a thread pool.
+    """
+
+    workers = workers or settings.RASTER_LOADING_WORKERS
+    chunk_rows = chunk_rows or settings.RASTER_LOADING_CHUNK_ROWS
+
+    with rasterio.open(runoff_path) as ro, rasterio.open(concentration_path) as c:
+        if (ro.crs, ro.transform, ro.shape) != (c.crs, c.transform, c.shape):
+            raise ValueError(
+                "runoff and concentration rasters must share a crs, transform and shape."
+            )
+        ro_bands, c_bands = _band_names(ro), _band_names(c)
+        ro_units = ro.tags().get("units", RUNOFF_UNITS)
+        c_units = c.tags().get("units", COC_UNITS)
+        crs, transform, shape = ro.crs, ro.transform, ro.shape
+
+    epochs = [b.split("_")[-1] for b in ro_bands]
+    pocs = [b.split("_")[0] for b in c_bands]
+    columns = [f"runoff_{ro_units}_x_m2".replace("/", "_per_")] + [
+        f"{poc}_{c_units}*{ro_units}*m2".replace("/", "_per_").replace("*", "_x_")
+        for poc in pocs
+    ]
+
+    n_zones = len(zones)
+    sums = numpy.zeros((len(epochs), len(columns), n_zones))
+    shapes = [
+        (geom, i + 1)
+        for i, geom in enumerate(zones.to_crs(crs).geometry)
+        if geom is not None and not geom.is_empty
+    ]
+
+    if shapes:
+        with tempfile.TemporaryDirectory() as tmp:
+            labels_path = Path(tmp) / "labels.int32"
+            labels = numpy.memmap(labels_path, dtype="int32", mode="w+", shape=shape)
+            rasterize(shapes, out=labels, transform=transform)
+            labels.flush()
+            del labels
+
+            chunks = [
+                (row_off, min(chunk_rows, shape[0] - row_off))
+                for row_off in range(0, shape[0], chunk_rows)
+            ]
+            func = partial(
+                _zonal_sums_chunk,
+                runoff_path=runoff_path,
+                concentration_path=concentration_path,
+                labels_path=labels_path,
+                shape=shape,
+                n_zones=n_zones,
+            )
+
+            logger.info(
+                f"summing {n_zones} zones over {len(chunks)} raster chunks "
+                f"with {workers} workers"
+            )
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for chunk_sums in executor.map(func, chunks):
+                    sums += chunk_sums
+
+    df_wide = pandas.DataFrame(
+        {
+            join_id: numpy.tile(zones[join_id].to_numpy(), len(epochs)),
+            "epoch": numpy.repeat(epochs, n_zones),
+            **{col: sums[:, i, :].ravel() for i, col in enumerate(columns)},
+        }
+    ).rename(columns=_rename_load_column)
+
+    return df_wide
@@ -1,4 +1,5 @@
 import warnings
+from textwrap import dedent
 from typing import Any, Dict, List, Optional
 
 import pandas
@@ -7,7 +8,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from stormpiper.database.connection import engine
 from stormpiper.database.schemas import changelog
-from stormpiper.database.utils import orm_to_dict, scalars_to_records
+from stormpiper.database.utils import (
+    delete_and_append_rows_where_from_query,
+    delete_and_replace_table_from_query,
+    orm_to_dict,
+    scalars_to_records,
+)
+from stormpiper.src.utils import (
+    compact_tidy_dtypes,
+    match_categorical_dtypes,
+    read_table_for_subbasins,
+)
 
 
 async def is_dirty_dep(db: AsyncSession) -> Dict[str, Any]:  # pragma: no cover
@@ -91,7 +102,7 @@ def calculate_src_ctrl_percent_reduction(
     *,
     load: pandas.DataFrame,
     src_ctrls: pandas.DataFrame,
-    direction: Optional[str] = "upstream"
+    direction: Optional[str] = "upstream",
 ):
     """
     load must have the subbasins and basinname attributes pre-joined in and runoff removed (pocs only)
@@ -113,88 +124,205 @@ def calculate_src_ctrl_percent_reduction(
             ],
         ]
         .sort_values(["subbasin", "variable", "order"])
+        .pipe(match_categorical_dtypes, load, ["variable"])
     )
 
-    df1 = load.merge(src_ctrl_directional, on=["subbasin", "variable"]).sort_values(
-        ["node_id", "epoch", "variable", "order"]
-    )
+    keys = ["node_id", "epoch", "variable"]
 
-    df1_ck = df1.groupby(["node_id", "epoch", "variable", "order"]).count()
+    df = load.merge(src_ctrl_directional, on=["subbasin", "variable"]).sort_values(
+        keys + ["order"], kind="stable", ignore_index=True
+    )
 
-    assert all(df1_ck.max(axis=1) <= 1), df1.sort_values(
-        ["node_id", "epoch", "variable", "order"]
-    ).to_json(orient="records", indent=2)
+    # rows of a load are adjacent once sorted, so a repeated order is a duplicate.
+    group = df.groupby(keys, observed=True, sort=False).ngroup()
+    dups = (group.diff() == 0) & (df["order"].diff() == 0)
+    assert not dups.any(), df.loc[dups].to_json(orient="records", indent=2)
+
+    # each control reduces what remains after the controls before it, so the
+    # fraction remaining is the running product of (1 - pct) within each load.
+    factor = 1 - (df["percent_reduction"] / 100)
+    remaining = factor.groupby(group).cumprod()
+    remaining_prev = remaining.groupby(group).shift(fill_value=1.0)
+
+    value_remaining_prev = df["value"] * remaining_prev
+    value_remaining = df["value"] * remaining
+
+    df = df.assign(
+        value_remaining_prev=value_remaining_prev,
+        value_remaining=value_remaining,
+        load_reduced=value_remaining_prev - value_remaining,
+        id=df.index.values,
+    )
+    return df
 
-    df2 = []
-    orders = sorted(df1["order"].unique())
-    for i, order in enumerate(orders):
 
-        _df = df1.query("order == @order")
+SRC_CTRL_LOAD_TABLES = {
+    "upstream": ("lgu_load", "tmnt_source_control_upstream_load_reduced"),
+    "downstream": (
+        "load_to_ds_src_ctrl",
+        "tmnt_source_control_downstream_load_reduced",
+    ),
+}
 
-        col = "value"
-        if i > 0:
-            prev_order = orders[i - 1]
-            col = "value_remaining"
-            columns = ["node_id", "epoch", "variable"]
 
-            _df = _df.merge(
-                df2[prev_order].reindex(columns=columns + [col]), on=columns, how="left"
-            )
+def source_controls_load_reduction_db(
+    *, direction: str, subbasins: Optional[List[str]] = None, engine=engine
+):
+    """Reduces the loads of `direction` by the source controls of their subbasin.
 
-        _df = _df.assign(
-            value_remaining_prev=lambda df: df[col].fillna(df["value"])
-        ).assign(
-            value_remaining=lambda df: df["value_remaining_prev"]
-            * (1 - (df["percent_reduction"] / 100))
-        )
+    If `subbasins` is given, only the loads and source controls of those
+    subbasins are read and reduced.
+    """
 
-        df2.append(_df)
+    load_table, _ = SRC_CTRL_LOAD_TABLES[direction]
 
-    df = (
-        pandas.concat(df2)
-        .sort_values(["node_id", "epoch", "variable", "order"])
-        .assign(
-            load_reduced=lambda df: df["value_remaining_prev"] - df["value_remaining"]
-        )
-        .reset_index(drop=True)
-        .assign(id=lambda df: df.index.values)
+    load = read_table_for_subbasins(
+        load_table, subbasins=subbasins, by="lgu", engine=engine
+    ).pipe(compact_tidy_dtypes)
+    lgu_boundary = read_table_for_subbasins(
+        "lgu_boundary",
+        subbasins=subbasins,
+        columns=["node_id", "subbasin", "basinname"],
+        engine=engine,
     )
-    return df
+    src_ctrls = read_table_for_subbasins(
+        "tmnt_source_control", subbasins=subbasins, engine=engine
+    ).query("direction == @direction")
 
+    lgu_boundary = lgu_boundary.pipe(match_categorical_dtypes, load, ["node_id"])
 
-def source_controls_upstream_load_reduction_db(*, engine=engine):
-    lgu_load = pandas.read_sql("lgu_load", con=engine)
-    lgu_boundary = pandas.read_sql("lgu_boundary", con=engine)
-    src_ctrls = pandas.read_sql(
-        "select * from tmnt_source_control where direction = 'upstream'",
-        con=engine,
-    )
-
-    lgu_to_us_src_ctrl = lgu_load.query('variable != "runoff"').merge(
-        lgu_boundary[["node_id", "subbasin", "basinname"]], on="node_id", how="left"
+    load_to_src_ctrl = load.query('variable != "runoff"').merge(
+        lgu_boundary, on="node_id", how="left"
     )
 
     df = calculate_src_ctrl_percent_reduction(
-        load=lgu_to_us_src_ctrl, src_ctrls=src_ctrls, direction="upstream"
+        load=load_to_src_ctrl, src_ctrls=src_ctrls, direction=direction
     )
 
     return df
 
 
+def source_controls_upstream_load_reduction_db(*, engine=engine):
+    return source_controls_load_reduction_db(direction="upstream", engine=engine)
+
+
 def source_controls_downstream_load_reduction_db(*, engine=engine):
-    lgu_load = pandas.read_sql("load_to_ds_src_ctrl", con=engine)
-    lgu_boundary = pandas.read_sql("lgu_boundary", con=engine)
-    src_ctrls = pandas.read_sql(
-        "select * from tmnt_source_control where direction = 'downstream'",
-        con=engine,
-    )
+    return source_controls_load_reduction_db(direction="downstream", engine=engine)
+
+
+SRC_CTRL_RESULT_COLS = [
+    "id",
+    "node_id",
+    "subbasin",
+    "basinname",
+    "variable",
+    "order",
+    "activity",
+    "direction",
+    "epoch",
+    "value",
+    "units",
+    "percent_reduction",
+    "value_remaining_prev",
+    "value_remaining",
+    "load_reduced",
+]
+
+
+def src_ctrl_percent_reduction_query(load_table: str, by_subbasin: bool = False) -> str:
+    """The sql version of `calculate_src_ctrl_percent_reduction` for the loads in
+    `load_table`, selecting the `SRC_CTRL_RESULT_COLS`.
+
+    The running product of (1 - pct/100) over the controls of each load is
+    exp(sum(ln(1 - pct/100))). ln(0) is undefined, so a 100% control is left out of
+    the sum and zeroes the product instead.
+
+    If `by_subbasin` is True, only the loads of the lgus in the `subbasins` parameter
+    are selected.
+    """
 
-    lgu_to_ds_src_ctrl = lgu_load.query('variable != "runoff"').merge(
-        lgu_boundary[["node_id", "subbasin", "basinname"]], on="node_id", how="left"
+    subbasin_filter = "and b.subbasin in %(subbasins)s" if by_subbasin else ""
+
+    return dedent(
+        f"""\
+        select
+            row_number() over (order by node_id, epoch, variable, "order") as id,
+            node_id, subbasin, basinname, variable, "order", activity, direction,
+            epoch, value, units, percent_reduction,
+            value * remaining_prev as value_remaining_prev,
+            value * remaining as value_remaining,
+            value * (remaining_prev - remaining) as load_reduced
+        from (
+            select
+                *,
+                case when max(percent_reduction) over w >= 100 then 0.0
+                    else exp(sum(log_remaining) over w) end as remaining,
+                case when max(percent_reduction) over w_prev >= 100 then 0.0
+                    else coalesce(exp(sum(log_remaining) over w_prev), 1.0)
+                    end as remaining_prev
+            from (
+                select
+                    l.node_id, b.subbasin, b.basinname, l.variable, s."order",
+                    s.activity, s.direction, l.epoch, l.value, l.units,
+                    s.percent_reduction,
+                    case when s.percent_reduction < 100
+                        then ln(1 - s.percent_reduction / 100) else 0.0
+                        end as log_remaining
+                from "{load_table}" l
+                join lgu_boundary b on b.node_id = l.node_id
+                join tmnt_source_control s
+                    on s.subbasin = b.subbasin and s.variable = l.variable
+                where s.direction = %(direction)s and l.variable != 'runoff'
+                    {subbasin_filter}
+            ) as controlled
+            window
+                w as (
+                    partition by node_id, epoch, variable order by "order"
+                    rows between unbounded preceding and current row
+                ),
+                w_prev as (
+                    partition by node_id, epoch, variable order by "order"
+                    rows between unbounded preceding and 1 preceding
+                )
+        ) as reduced
+        """
     )
 
-    df = calculate_src_ctrl_percent_reduction(
-        load=lgu_to_ds_src_ctrl, src_ctrls=src_ctrls, direction="downstream"
-    )
 
-    return df
+def source_controls_load_reduction_sql(
+    *, direction: str, subbasins: Optional[List[str]] = None, engine=engine
+) -> int:
+    """Computes the source control load reductions of `direction` inside postgres
+    and replaces the tmnt_source_control_<direction>_load_reduced table with them
+    via `insert into ... select`. No load rows are read into pandas.
+
+    If `subbasins` is given, only the rows of those subbasins are replaced.
+
+    Returns the number of rows written.
+    """
+
+    load_table, table_name = SRC_CTRL_LOAD_TABLES[direction]
+
+    if subbasins is None:
+        return delete_and_replace_table_from_query(
+            query=src_ctrl_percent_reduction_query(load_table),
+            table_name=table_name,
+            columns=SRC_CTRL_RESULT_COLS,
+            params={"direction": direction},
+            engine=engine,
+        )
+
+    # the table's sequence assigns the ids of the new rows
+    columns = [c for c in SRC_CTRL_RESULT_COLS if c != "id"]
+    query = src_ctrl_percent_reduction_query(load_table, by_subbasin=True)
+    cols = ", ".join(f'"{c}"' for c in columns)
+
+    return delete_and_append_rows_where_from_query(
+        query=f"select {cols} from ({query}) as q",
+        table_name=table_name,
+        columns=columns,
+        column="subbasin",
+        values=subbasins,
+        params={"direction": direction, "subbasins": tuple(subbasins)},
+        engine=engine,
+    )
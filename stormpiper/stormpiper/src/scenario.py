@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas
+
+from stormpiper.core.config import settings
+from stormpiper.core.context import get_context, get_context_version
+from stormpiper.core.exceptions import InvalidEpochs, InvalidOverrides
+from stormpiper.core.utils import process_pool_workers
+from stormpiper.database.connection import engine
+from stormpiper.database.schemas.results import COLS
+from stormpiper.src.solve_structural_wq import (
+    get_graph_edges_from_db,
+    get_results_from_db,
+    get_tmnt_facilities_from_db,
+    land_surface_load_to_structural_from_db,
+    solve_wq_epochs_incremental,
+)
+
+logging.basicConfig(level=settings.LOGLEVEL)
+logger = logging.getLogger(__name__)
+
+# the tables behind the scenario inputs. tmnt_v is a view of the tmnt_facility tables.
+SCENARIO_INPUT_TABLES = [
+    "graph_edge",
+    "lgu_load_to_structural",
+    "tmnt_facility",
+    "tmnt_facility_attributes",
+    "met",
+    "result_blob",
+]
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {"key": None, "inputs": None}
+
+# inputs shared by every scenario solved in a worker process
+_worker_inputs: Dict[str, Any] = {}
+
+
+def _scenario_inputs_key(connectable) -> tuple:
+    changelog = pandas.read_sql(
+        "select tablename, last_updated from tablechangelog where tablename in %(t)s",
+        params={"t": tuple(SCENARIO_INPUT_TABLES)},
+        con=connectable,
+    )
+    stamps = tuple(
+        sorted((t, str(ts)) for t, ts in changelog.itertuples(index=False, name=None))
+    )
+    return stamps, get_context_version()
+
+
+def load_scenario_inputs(*, engine=engine) -> Dict[str, Any]:
+    """Returns a warm, process-wide copy of the solver inputs.
+
+    The inputs are only re-read when the changelog shows that one of the
+    `SCENARIO_INPUT_TABLES` changed, or when the reference data changed. Callers
+    must not mutate the returned frames.
+    """
+
+    with engine.begin() as conn:
+        key = _scenario_inputs_key(conn)
+
+        with _lock:
+            if _cache["key"] != key:
+                logger.info("loading scenario inputs...")
+                edge_list = get_graph_edges_from_db(conn)
+                tmnt_facilities = get_tmnt_facilities_from_db(conn)
+                met = pandas.read_sql("met", con=conn)
+
+                inputs = dict(
+                    edge_list=edge_list,
+                    tmnt_facilities=tmnt_facilities,
+                    met=met,
+                    loading=land_surface_load_to_structural_from_db(
+                        epoch=None, connectable=conn
+                    ),
+                    # a scenario only reuses the results of nodes with upstream
+                    # nodes. see `plan_incremental_solve`.
+                    cached_results=get_results_from_db(
+                        conn, node_ids=set(edge_list["target"])
+                    ),
+                    epochs=list(met.epoch.unique()),
+                    context=get_context(),
+                )
+                _cache.update(key=key, inputs=inputs)
+
+            return _cache["inputs"]
+
+
+def apply_facility_overrides(
+    tmnt_facilities: pandas.DataFrame, overrides: Dict[str, Dict[str, Any]]
+) -> pandas.DataFrame:
+    """Returns a copy of tmnt_facilities with the attributes in `overrides` set.
+
+    overrides : mapping of facility node_id to {attribute: value}
+
+    Raises InvalidOverrides if a facility or attribute is not in tmnt_facilities.
+    """
+
+    unknown_nodes = set(overrides) - set(tmnt_facilities["node_id"])
+    if unknown_nodes:
+        raise InvalidOverrides(f"facilities not found: {sorted(unknown_nodes)}")
+
+    unknown_attrs = {k for attrs in overrides.values() for k in attrs} - set(
+        tmnt_facilities.columns
+    )
+    if unknown_attrs:
+        raise InvalidOverrides(
+            f"facility attributes not found: {sorted(unknown_attrs)}"
+        )
+
+    df = tmnt_facilities.set_index("node_id")
+    for node_id, attrs in overrides.items():
+        for attr, value in attrs.items():
+            df.loc[node_id, attr] = value
+
+    return df.reset_index()
+
+
+def validate_epochs(
+    epochs: Optional[List[str]], met: pandas.DataFrame
+) -> Optional[List[str]]:
+    """Raises InvalidEpochs if any of `epochs` is not in the met table."""
+
+    unknown_epochs = set(epochs or []) - set(met["epoch"])
+    if unknown_epochs:
+        raise InvalidEpochs(
+            f"epochs not found: {sorted(unknown_epochs)}. "
+            f"Valid epochs are: {sorted(met['epoch'].unique())}"
+        )
+
+    return epochs
+
+
+def solve_scenario(
+    *,
+    overrides: Dict[str, Dict[str, Any]],
+    inputs: Dict[str, Any],
+    epochs: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+) -> pandas.DataFrame:
+    """Solve a what-if scenario of facility attribute overrides against `inputs`.
+
+    Only the overridden facilities and the nodes downstream of them are solved, and
+    only their results are returned. Nothing is written to the database.
+    """
+
+    epochs = validate_epochs(epochs, inputs["met"])
+
+    return solve_wq_epochs_incremental(
+        node_ids=list(overrides),
+        edge_list=inputs["edge_list"],
+        met=inputs["met"],
+        loading=inputs["loading"],
+        tmnt_facilities=apply_facility_overrides(inputs["tmnt_facilities"], overrides),
+        cached_results=inputs["cached_results"],
+        epochs=epochs or inputs["epochs"],
+        context=inputs["context"],
+        workers=workers,
+    )
+
+
+def solve_scenario_from_db(
+    *,
+    overrides: Dict[str, Dict[str, Any]],
+    epochs: Optional[List[str]] = None,
+    engine=engine,
+) -> pandas.DataFrame:
+    inputs = load_scenario_inputs(engine=engine)
+
+    # this runs in the request, so it must not start a process pool
+    return solve_scenario(overrides=overrides, inputs=inputs, epochs=epochs, workers=1)
+
+
+def _init_scenario_worker(inputs: Dict[str, Any]) -> None:
+    _worker_inputs.update(inputs)
+
+
+def _solve_scenario_in_worker(
+    overrides: Dict[str, Dict[str, Any]], epochs: Optional[List[str]]
+) -> pandas.DataFrame:
+    return solve_scenario(
+        overrides=overrides, inputs=_worker_inputs, epochs=epochs, workers=1
+    )
+
+
+def scenarios_per_second(n_scenarios: int, elapsed: float) -> float:
+    """Returns the solve rate, or inf if the timer did not advance."""
+
+    if elapsed <= 0:
+        return float("inf")
+    return n_scenarios / elapsed
+
+
+def solve_scenarios(
+    *,
+    scenarios: List[Dict[str, Dict[str, Any]]],
+    inputs: Dict[str, Any],
+    epochs: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+) -> Tuple[pandas.DataFrame, float]:
+    """Solve a batch of what-if scenarios against the same `inputs`.
+
+    If `workers` is greater than one, the scenarios are solved in a process pool.
+    The inputs are sent to each worker process once rather than with every
+    scenario. `workers` defaults to the `SOLVE_WQ_WORKERS` setting.
+
+    Returns a long frame of the numeric result columns indexed by scenario (the
+    position in `scenarios`), node_id and epoch, and the elapsed seconds.
+    """
+
+    if not scenarios:
+        raise ValueError("No scenarios provided. Aborting.")
+
+    epochs = validate_epochs(epochs, inputs["met"])
+
+    if workers is None:
+        workers = settings.SOLVE_WQ_WORKERS
+    workers = process_pool_workers(workers)
+
+    start = time.perf_counter()
+    if workers > 1 and len(scenarios) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(scenarios)),
+            initializer=_init_scenario_worker,
+            initargs=(inputs,),
+        ) as executor:
+            solved = list(
+                executor.map(_solve_scenario_in_worker, scenarios, repeat(epochs))
+            )
+    else:
+        solved = [
+            solve_scenario(overrides=s, inputs=inputs, epochs=epochs, workers=1)
+            for s in scenarios
+        ]
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        f"solved {len(scenarios)} scenarios in {elapsed:.2f} seconds "
+        f"({scenarios_per_second(len(scenarios), elapsed):.1f} scenarios/sec)"
+    )
+
+    results = pandas.concat(
+        [df.assign(scenario=i) for i, df in enumerate(solved)], ignore_index=True
+    )
+    metrics = results.reindex(columns=COLS).infer_objects().select_dtypes("number")
+    results = metrics.set_index(
+        [results["scenario"], results["node_id"], results["epoch"]]
+    ).sort_index()
+
+    return results, elapsed
+
+
+def solve_scenarios_from_db(
+    *,
+    scenarios: List[Dict[str, Dict[str, Any]]],
+    epochs: Optional[List[str]] = None,
+    engine=engine,
+) -> Tuple[pandas.DataFrame, float]:
+    inputs = load_scenario_inputs(engine=engine)
+
+    # this runs in the request, so it must not start a process pool
+    return solve_scenarios(scenarios=scenarios, inputs=inputs, epochs=epochs, workers=1)
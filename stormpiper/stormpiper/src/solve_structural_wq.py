@@ -1,17 +1,27 @@
+import hashlib
 import json
-from typing import Any, Dict, Hashable, List, Optional
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
 
 import networkx as nx
+import numpy
 import pandas
-from nereid.src.network.utils import nxGraph_to_dict
 from nereid.src.tasks import solve_watershed
 
+from stormpiper.core.config import settings
 from stormpiper.core.context import get_context
+from stormpiper.core.utils import process_pool_workers
 from stormpiper.database.connection import engine
 from stormpiper.database.schemas.results import COLS
 
+from .graph import OUTFALL, get_basin_nodes, get_downstream_nodes
 from .loading import land_surface_load_to_structural_from_db
 from .organics import add_virtual_pocs_to_wide_load_summary
+from .pipeline import log_spans, timed
+
+logging.basicConfig(level=settings.LOGLEVEL)
+logger = logging.getLogger(__name__)
 
 
 def get_graph_edges_from_db(connectable):
@@ -27,86 +37,342 @@ def get_tmnt_facilities_from_db(connectable):
     return facilities
 
 
-def init_graph_from_df(*, edge_list: pandas.DataFrame) -> nx.DiGraph:
+def get_results_from_db(connectable, *, node_ids: Iterable[str]) -> pandas.DataFrame:
+    node_ids = tuple(node_ids)
+    if not node_ids:
+        return pandas.DataFrame(columns=["node_id", "epoch", "blob"])
 
-    g = nx.from_pandas_edgelist(edge_list, create_using=nx.DiGraph)
-    edge_data = {
-        dct.get("source"): {k: v for k, v in dct.to_dict().items() if k != "id"}
-        for i, dct in edge_list.iterrows()
-    }
-    nx.set_node_attributes(g, edge_data)
+    cached_results = pandas.read_sql(
+        "select node_id, epoch, blob from result_blob where node_id in %(node_ids)s",
+        params={"node_ids": node_ids},
+        con=connectable,
+    )
+    return cached_results
+
+
+def records_without_nulls(
+    df: pandas.DataFrame, exclude: Optional[List[str]] = None
+) -> List[Dict[Hashable, Any]]:
+    """Equivalent to `[row.dropna().to_dict() for _, row in df.iterrows()]` but
+    builds the records in one pass and drops nulls with a precomputed mask.
+    """
 
-    return g
+    cols = [c for c in df.columns if c not in (exclude or [])]
+    notna = df[cols].notna().to_numpy()
+    records = df[cols].to_dict("records")
 
+    return [
+        {k: v for (k, v), keep in zip(rec.items(), mask) if keep}
+        for rec, mask in zip(records, notna)
+    ]
 
-def init_land_surface_loading_node_data_from_df(
+
+def loading_node_data_from_df(
     *, df: pandas.DataFrame
 ) -> Dict[str, Dict[Hashable, Any]]:
-    """pre filter for epoch"""
-    ls_data = {
-        str(dct.get("node_id", "")): {
-            k: v for k, v in dct.to_dict().items() if k != "node_id" and pandas.notna(v)
-        }
-        for _, dct in df.iterrows()
-    }
+    """Land surface node data keyed by node_id, without the null values."""
 
-    return ls_data
+    node_ids = df["node_id"].astype(str).to_numpy()
+    records = records_without_nulls(df, exclude=["node_id"])
 
+    return dict(zip(node_ids, records))
 
-def init_treatment_facilities_from_df(
-    *, df: pandas.DataFrame
-) -> List[Dict[Hashable, Any]]:
-    treatment_facilities_list = [row.dropna().to_dict() for _, row in df.iterrows()]
-    return treatment_facilities_list
+
+def graph_node_order(edge_list: pandas.DataFrame) -> numpy.ndarray:
+    """The nodes of the edge list in the order of the nereid graph."""
+
+    # networkx adds each edge's source and then its target, so this is the node order
+    sources = edge_list["source"].to_numpy()
+    targets = edge_list["target"].to_numpy()
+
+    return pandas.unique(numpy.column_stack([sources, targets]).ravel())
+
+
+def build_graph_dict_from_df(
+    *, edge_list: pandas.DataFrame, loading: pandas.DataFrame
+) -> Dict[str, Any]:
+    """Build the serialized nereid graph directly from the edge list and loading
+    frames. The output matches `nxGraph_to_dict` of the networkx graph of the edge
+    list with the edge and loading records set as node attributes, including the
+    order of the nodes and edges.
+    """
+
+    sources = edge_list["source"].to_numpy()
+    targets = edge_list["target"].to_numpy()
+
+    nodes = graph_node_order(edge_list)
+    position = {n: i for i, n in enumerate(nodes)}
+
+    metadata: Dict[Hashable, Dict[Hashable, Any]] = {n: {} for n in nodes}
+    edge_records = edge_list.drop(columns=["id"], errors="ignore").to_dict("records")
+    for src, rec in zip(sources, edge_records):
+        metadata[src] = rec
+
+    for node_id, rec in loading_node_data_from_df(df=loading).items():
+        if node_id in metadata:
+            metadata[node_id].update(rec)
+
+    # networkx iterates edges by the position of their source node
+    edge_order = numpy.argsort([position[s] for s in sources], kind="stable")
+
+    graph = dict(
+        directed=True,
+        multigraph=False,
+        graph={},
+        nodes=[{"id": n, "metadata": metadata[n]} for n in nodes],
+        edges=[
+            {"source": sources[i], "target": targets[i], "metadata": {}}
+            for i in edge_order
+        ],
+    )
+
+    return graph
+
+
+def build_watershed_from_df(*, edge_list, loading, tmnt_facilities) -> Dict[str, Any]:
+    """Columnar construction of the nereid watershed."""
+
+    graph = build_graph_dict_from_df(edge_list=edge_list, loading=loading)
+    treatment_facilities = records_without_nulls(tmnt_facilities)
+    watershed = dict(graph=graph, treatment_facilities=treatment_facilities)
+
+    return watershed
+
+
+class PreparedWatershed:
+    """The parts of the nereid watershed that are the same for every epoch.
+
+    The graph topology is serialized once, and the treatment facilities are
+    converted to records once. Each epoch then only swaps in its land surface
+    loading and the facilities' `ref_data_key` and `design_storm_depth_inches`.
+
+    Only this serialization is cached. nereid's `solve_watershed` does not accept
+    a pre-built graph, so it still builds, validates and sorts the graph from the
+    serialized watershed of every epoch.
+    """
+
+    def __init__(
+        self, *, edge_list: pandas.DataFrame, tmnt_facilities: pandas.DataFrame
+    ):
+        self.graph = build_graph_dict_from_df(
+            edge_list=edge_list, loading=pandas.DataFrame(columns=["node_id"])
+        )
+        self.treatment_facilities = records_without_nulls(tmnt_facilities)
+
+    def watershed(
+        self,
+        *,
+        loading: pandas.DataFrame,
+        ref_data_key: str,
+        design_storm_depth_inches: float,
+        previous_results: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+
+        loading_data = loading_node_data_from_df(df=loading)
+
+        nodes = [
+            {
+                "id": n["id"],
+                "metadata": {**n["metadata"], **loading_data.get(n["id"], {})},
+            }
+            for n in self.graph["nodes"]
+        ]
+
+        treatment_facilities = [
+            {
+                **dct,
+                "design_storm_depth_inches": design_storm_depth_inches,
+                "ref_data_key": ref_data_key,
+            }
+            for dct in self.treatment_facilities
+        ]
+
+        watershed = dict(
+            graph={**self.graph, "nodes": nodes},
+            treatment_facilities=treatment_facilities,
+        )
+        if previous_results:
+            watershed["previous_results"] = previous_results
+
+        return watershed
 
 
 def solve_wq(
     *, edge_list, loading, tmnt_facilities, context: Optional[Dict[str, Any]] = None
 ) -> pandas.DataFrame:
 
+    watershed = build_watershed_from_df(
+        edge_list=edge_list, loading=loading, tmnt_facilities=tmnt_facilities
+    )
+
+    return solve_wq_watershed(watershed=watershed, context=context)
+
+
+def solve_wq_watershed(
+    *,
+    watershed: Dict[str, Any],
+    context: Optional[Dict[str, Any]] = None,
+    include_blob: bool = True,
+    spans: Optional[List[Dict[str, Any]]] = None,
+) -> pandas.DataFrame:
+    """Solve the watershed with nereid and assemble the result_blob columns. If a
+    `spans` list is passed, the timing of each stage is appended to it.
+    """
+
     if context is None:  # pragma: no cover
         context = get_context()
 
-    loading_data = init_land_surface_loading_node_data_from_df(df=loading)
-    treatment_facilities = init_treatment_facilities_from_df(df=tmnt_facilities)
+    with timed("solve_watershed", spans):
+        response_dict = solve_watershed(
+            watershed=watershed,
+            treatment_pre_validated=False,
+            context=context,
+        )
+
+    with timed("virtual_pocs", spans):
+        _r = response_dict["results"] + response_dict["leaf_results"]
+        results = add_virtual_pocs_to_wide_load_summary(pandas.DataFrame(_r))
 
-    # make a fresh graph
-    g = init_graph_from_df(edge_list=edge_list)
+    with timed("result_blob", spans):
+        res_df = results_to_result_blob(results, include_blob=include_blob)
 
-    # set loading data
-    nx.set_node_attributes(g, loading_data)
+    return res_df
 
-    # prep for nereid call
 
-    ## serialise the graph with data
-    graph = nxGraph_to_dict(g)
-    watershed = dict(graph=graph, treatment_facilities=treatment_facilities)
+def results_to_result_blob(
+    results: pandas.DataFrame, include_blob: bool = True
+) -> pandas.DataFrame:
+    """Assemble the result_blob columns from the wide nereid results.
+
+    The blob is a dict of every result column with sorted keys and nulls as None,
+    so it can be written to the JSON column as-is. Set `include_blob` to False to
+    only keep the typed `COLS`.
+    """
+
+    res_df = results.reindex(columns=["node_id"] + COLS)
+
+    if include_blob:
+        blob = results.reindex(columns=sorted(results.columns)).astype(object)
+        res_df.insert(1, "blob", blob.where(blob.notna(), None).to_dict("records"))
+
+    return res_df
+
+
+def previous_results_from_result_blob(
+    results: pandas.DataFrame,
+) -> List[Dict[str, Any]]:
+    """nereid `previous_results` records from the node_id and blob columns of
+    result_blob rows, without the null values.
+    """
+
+    return [
+        {**{k: v for k, v in blob.items() if v is not None}, "node_id": node_id}
+        for node_id, blob in zip(results["node_id"], results["blob"])
+    ]
+
+
+def solve_wq_epochs_from_upstream(
+    *,
+    node_ids: Iterable[str],
+    edge_list: pandas.DataFrame,
+    met: pandas.DataFrame,
+    loading: pandas.DataFrame,
+    tmnt_facilities: pandas.DataFrame,
+    upstream_results: pandas.DataFrame,
+    epochs: List,
+    context: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    include_blob: bool = True,
+    spans: Optional[List[Dict[str, Any]]] = None,
+) -> pandas.DataFrame:
+    """Solve only `node_ids` with nereid from the results of the nodes that
+    discharge to them.
 
-    response_dict = solve_watershed(
-        watershed=watershed,
-        treatment_pre_validated=False,
+    nereid's `solve_watershed` solves the subgraph of `node_ids` and the nodes that
+    discharge to them. Land surfaces with nothing upstream are solved from their
+    loading. Every other upstream node is passed to nereid as a `previous_results`
+    record from the node_id, epoch and blob columns of `upstream_results`, so nothing
+    above them is solved again.
+
+    Returns the result_blob rows of `node_ids` only.
+    """
+
+    nodes = set(node_ids)
+    sub_edge_list = edge_list.loc[edge_list["target"].isin(nodes)]
+    upstream = set(sub_edge_list["source"]) - nodes
+    previous = upstream & set(edge_list["target"])
+
+    previous_results = upstream_results.loc[
+        upstream_results["node_id"].isin(previous)
+        & upstream_results["epoch"].isin(epochs),
+        ["node_id", "epoch", "blob"],
+    ]
+    expected = len(previous) * len(set(epochs))
+    if len(previous_results.drop_duplicates(["node_id", "epoch"])) < expected:
+        raise ValueError(f"missing upstream results for some of {sorted(previous)}")
+
+    solved = nodes | (upstream - previous)
+    results = solve_wq_epochs(
+        edge_list=sub_edge_list,
+        met=met,
+        loading=loading.loc[loading["node_id"].isin(solved)],
+        tmnt_facilities=tmnt_facilities.loc[tmnt_facilities["node_id"].isin(nodes)],
+        previous_results=previous_results,
+        epochs=epochs,
         context=context,
+        workers=workers,
+        include_blob=include_blob,
+        spans=spans,
     )
 
-    _r = response_dict["results"] + response_dict["leaf_results"]
-    result = json.loads(
-        add_virtual_pocs_to_wide_load_summary(pandas.DataFrame(_r))
-        .replace({pandas.NA: None})
-        .to_json(orient="records")
-    )
+    return results.loc[results["node_id"].isin(nodes)].reset_index(drop=True)
 
-    res_df = pandas.DataFrame(
-        [
-            {
-                "node_id": n.get("node_id"),
-                "blob": json.dumps(n, sort_keys=True),
-                **{c: n.get(c, None) for c in COLS},
-            }
-            for n in result
-        ]
-    )
 
-    return res_df
+def solve_wq_epoch(
+    *,
+    epoch: str,
+    prepared: PreparedWatershed,
+    met: pandas.DataFrame,
+    loading: pandas.DataFrame,
+    context: Dict[str, Any],
+    include_blob: bool = True,
+    previous_results: Optional[pandas.DataFrame] = None,
+) -> Tuple[pandas.DataFrame, List[Dict[str, Any]]]:
+    """Solve a single epoch and return the results with the timing of each stage.
+
+    This is a module level function so that it can be pickled and sent to a
+    worker process by `solve_wq_epochs`.
+    """
+
+    spans: List[Dict[str, Any]] = []
+
+    with timed("build_graph", spans):
+        # TODO: loading should be _after_ applying upstream source controls
+        epoch_loading_df = loading.query("epoch==@epoch").assign(
+            node_type="land_surface"
+        )
+
+        epoch_data = met.query("epoch==@epoch").iloc[0].to_dict()
+
+        # epoch-specific reference data assignment on treatment facilities for nomographs
+        watershed = prepared.watershed(
+            loading=epoch_loading_df,
+            ref_data_key=epoch_data["epoch"],
+            design_storm_depth_inches=epoch_data["design_storm_precip_depth_inches"],
+            previous_results=None
+            if previous_results is None
+            else previous_results_from_result_blob(
+                previous_results.loc[previous_results["epoch"] == epoch]
+            ),
+        )
+
+    res_df = solve_wq_watershed(
+        watershed=watershed, context=context, include_blob=include_blob, spans=spans
+    ).assign(epoch=epoch)
+
+    # TODO: compute virtual pollutant values (sediment-bound organics)
+
+    return res_df, [{**span, "epoch": epoch} for span in spans]
 
 
 def solve_wq_epochs(
@@ -116,37 +382,68 @@ def solve_wq_epochs(
     loading,
     tmnt_facilities,
     epochs: List,
-    context: Optional[Dict[str, Any]] = None
+    context: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    include_blob: bool = True,
+    spans: Optional[List[Dict[str, Any]]] = None,
+    previous_results: Optional[pandas.DataFrame] = None,
 ):
+    """Solve each epoch and stack the results.
+
+    If `workers` is greater than one, the epochs are solved concurrently in a
+    process pool. Results are always concatenated in the order of `epochs`, so
+    the output is identical to the serial path. `workers` defaults to the
+    `SOLVE_WQ_WORKERS` setting. Daemon processes, e.g., the celery workers, can't
+    start a pool and always solve serially.
+
+    Set `include_blob` to False to skip the blob column, which duplicates the
+    typed columns plus any results that are not in `COLS`.
+
+    If a `spans` list is passed, the timing of each stage of each epoch is
+    appended to it.
+
+    `previous_results` are result_blob rows of nodes that nereid should not solve
+    again, see `solve_wq_epochs_from_upstream`.
+    """
 
     if context is None:  # pragma: no cover
         context = get_context()
-    results_per_epoch_dfs = []
 
-    for epoch in epochs:
-        # TODO: loading should be _after_ applying upstream source controls
-        epoch_loading_df = loading.query("epoch==@epoch").assign(
-            node_type="land_surface"
-        )
+    if workers is None:
+        workers = settings.SOLVE_WQ_WORKERS
+    workers = process_pool_workers(workers)
 
-        epoch_data = met.query("epoch==@epoch").iloc[0].to_dict()
-        ref_data_key = epoch_data["epoch"]
-        design_storm_depth_inches = epoch_data["design_storm_precip_depth_inches"]
-
-        # epoch-specific reference data assignment on treatment facilities for nomographs
-        tmnt_facilities_df = tmnt_facilities.assign(
-            design_storm_depth_inches=design_storm_depth_inches
-        ).assign(ref_data_key=ref_data_key)
+    with timed("prepare_graph", spans):
+        prepared = PreparedWatershed(
+            edge_list=edge_list, tmnt_facilities=tmnt_facilities
+        )
 
-        res_df = solve_wq(
-            edge_list=edge_list,
-            loading=epoch_loading_df,
-            tmnt_facilities=tmnt_facilities_df,
-            context=context,
-        ).assign(epoch=epoch)
+    kwargs = dict(
+        prepared=prepared,
+        met=met,
+        loading=loading,
+        context=context,
+        include_blob=include_blob,
+        previous_results=previous_results,
+    )
 
-        # TODO: compute virtual pollutant values (sediment-bound organics)
+    if workers > 1 and len(epochs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(epochs))) as executor:
+            futures = [
+                executor.submit(solve_wq_epoch, epoch=epoch, **kwargs)
+                for epoch in epochs
+            ]
+            solved = [f.result() for f in futures]
+    else:
+        solved = [solve_wq_epoch(epoch=epoch, **kwargs) for epoch in epochs]
 
+    results_per_epoch_dfs = []
+    for epoch, (res_df, epoch_spans) in zip(epochs, solved):
+        log_spans(epoch_spans)
+        elapsed = sum(span["seconds"] for span in epoch_spans)
+        logger.info(f"solved epoch {epoch} in {elapsed:.2f} seconds")
+        if spans is not None:
+            spans.extend(epoch_spans)
         results_per_epoch_dfs.append(res_df)
 
     results_blob = pandas.concat(results_per_epoch_dfs).reset_index(drop=True)
@@ -154,7 +451,50 @@ def solve_wq_epochs(
     return results_blob
 
 
-def solve_wq_epochs_from_db(engine=engine):
+def get_solve_inputs_from_db(connectable) -> Dict[str, pandas.DataFrame]:
+    edge_list = get_graph_edges_from_db(connectable)
+    tmnt_facilities = get_tmnt_facilities_from_db(connectable)
+    met = pandas.read_sql("met", con=connectable)
+
+    # get all loading data for all epochs. will query it down later.
+    loading = land_surface_load_to_structural_from_db(
+        epoch=None, connectable=connectable
+    )
+
+    return dict(
+        edge_list=edge_list, met=met, loading=loading, tmnt_facilities=tmnt_facilities
+    )
+
+
+def hash_solve_inputs(
+    *, context_version: str, by_basin: bool = False, **inputs: pandas.DataFrame
+) -> str:
+    """Content hash of the solver input frames, the context version and the solver
+    choice.
+
+    The hash does not depend on the order of the rows or of the columns, since
+    neither are guaranteed when reading the tables back from the database.
+    """
+
+    h = hashlib.sha256(context_version.encode())
+    h.update(json.dumps({"by_basin": by_basin}).encode())
+    for name, df in sorted(inputs.items()):
+        df = df.reindex(columns=sorted(df.columns))
+        h.update(name.encode())
+        h.update(json.dumps(df.columns.tolist()).encode())
+        h.update(numpy.sort(pandas.util.hash_pandas_object(df, index=False)).tobytes())
+
+    return h.hexdigest()
+
+
+def solve_wq_epochs_from_db(
+    engine=engine,
+    workers: Optional[int] = None,
+    include_blob: bool = True,
+    by_basin: Optional[bool] = None,
+    inputs: Optional[Dict[str, pandas.DataFrame]] = None,
+    spans: Optional[List[Dict[str, Any]]] = None,
+):
     """
     get epochs
     get graph
@@ -185,24 +525,261 @@ def solve_wq_epochs_from_db(engine=engine):
     delete and replace table
 
     """
+    if inputs is None:
+        with engine.begin() as conn:
+            inputs = get_solve_inputs_from_db(conn)
+
+    if by_basin is None:
+        by_basin = settings.SOLVE_WQ_BY_BASIN
+
+    epochs = list(inputs["met"].epoch.unique())
+    context = get_context()
+    solver = solve_wq_epochs_by_basin if by_basin else solve_wq_epochs
+    results_blob = solver(
+        epochs=epochs,
+        **inputs,
+        context=context,
+        workers=workers,
+        include_blob=include_blob,
+        spans=spans,
+    )
+
+    return results_blob
+
+
+def partition_edge_list_by_basin(
+    edge_list: pandas.DataFrame,
+) -> List[pandas.DataFrame]:
+    """Split the edge list into the sub-watersheds that discharge to the outfall.
+
+    Each partition is a basin and every node that drains to it. Any nodes that do
+    not drain to a basin are kept together in a last partition.
+    """
+
+    g = nx.from_pandas_edgelist(edge_list, create_using=nx.DiGraph)
+    if OUTFALL not in g:
+        return [edge_list]
+
+    scopes = [get_basin_nodes(g, b) for b in g.predecessors(OUTFALL)]
+    partitioned = set().union(*scopes)
+    rest = edge_list.loc[~edge_list["source"].isin(partitioned)]
+
+    partitions = [edge_list.loc[edge_list["source"].isin(s)] for s in scopes]
+    if len(rest):
+        partitions.append(rest)
+
+    return partitions
+
+
+def solve_wq_epochs_for_basin(
+    basin: Optional[str], kwargs: Dict[str, Any]
+) -> Tuple[pandas.DataFrame, List[Dict[str, Any]]]:
+    """Solve the epochs of a single basin partition and return the results with the
+    timing of each stage, tagged with the `basin`.
+
+    This is a module level function so that it can be pickled and sent to a
+    worker process by `solve_wq_epochs_by_basin`.
+    """
+
+    spans: List[Dict[str, Any]] = []
+    results = solve_wq_epochs(**kwargs, spans=spans)
+
+    return results, [{**span, "basin": basin} for span in spans]
+
+
+def solve_wq_epochs_by_basin(
+    *,
+    edge_list: pandas.DataFrame,
+    met: pandas.DataFrame,
+    loading: pandas.DataFrame,
+    tmnt_facilities: pandas.DataFrame,
+    epochs: List,
+    context: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    include_blob: bool = True,
+    spans: Optional[List[Dict[str, Any]]] = None,
+) -> pandas.DataFrame:
+    """Solve each basin independently and then the outfall.
+
+    Every basin only meets the others at the outfall, so the basins are solved
+    concurrently in a process pool if `workers` is greater than one. nereid then
+    solves the outfall from the basin results with `solve_wq_epochs_from_upstream`.
+    `workers` defaults to the `SOLVE_WQ_WORKERS` setting.
+
+    If a `spans` list is passed, the timing of each stage of each basin and epoch is
+    appended to it.
+    """
+
+    if context is None:  # pragma: no cover
+        context = get_context()
+
+    if workers is None:
+        workers = settings.SOLVE_WQ_WORKERS
+    workers = process_pool_workers(workers)
+
+    basins, partitions = [], []
+    for part in partition_edge_list_by_basin(edge_list):
+        nodes = set(part["source"]) | set(part["target"])
+        basins.append(next(iter(part.loc[part["target"] == OUTFALL, "source"]), None))
+        partitions.append(
+            dict(
+                edge_list=part,
+                met=met,
+                loading=loading.loc[loading["node_id"].isin(nodes)],
+                tmnt_facilities=tmnt_facilities.loc[
+                    tmnt_facilities["node_id"].isin(nodes)
+                ],
+                epochs=epochs,
+                context=context,
+                workers=1,
+            )
+        )
+
+    with timed("solve_basins", spans):
+        if workers > 1 and len(partitions) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(partitions))
+            ) as executor:
+                solved = list(
+                    executor.map(solve_wq_epochs_for_basin, basins, partitions)
+                )
+        else:
+            solved = [solve_wq_epochs_for_basin(*p) for p in zip(basins, partitions)]
+
+    if spans is not None:
+        for _, basin_spans in solved:
+            spans.extend(basin_spans)
+
+    # the outfall in each partition only includes that basin
+    results = pandas.concat([res_df for res_df, _ in solved])
+    results = results.loc[results["node_id"] != OUTFALL]
+
+    results_dfs = [results]
+    if (edge_list["target"] == OUTFALL).any():
+        with timed("solve_outfall", spans):
+            results_dfs.append(
+                solve_wq_epochs_from_upstream(
+                    node_ids=[OUTFALL],
+                    edge_list=edge_list,
+                    met=met,
+                    loading=loading,
+                    tmnt_facilities=tmnt_facilities,
+                    upstream_results=results,
+                    epochs=epochs,
+                    context=context,
+                    workers=1,
+                    include_blob=include_blob,
+                )
+            )
+
+    # keep the epoch-major order of `solve_wq_epochs`
+    results_blob = (
+        pandas.concat(results_dfs)
+        .assign(_order=lambda df: df["epoch"].map({e: i for i, e in enumerate(epochs)}))
+        .sort_values("_order", kind="stable")
+        .drop(columns=["_order"])
+        .reset_index(drop=True)
+    )
+
+    # the basin blobs are only kept to solve the outfall
+    if not include_blob:
+        results_blob = results_blob.drop(columns=["blob"])
+
+    return results_blob
+
+
+def plan_incremental_solve(
+    *, node_ids: List[str], edge_list: pandas.DataFrame
+) -> Tuple[Set[str], Set[str]]:
+    """Find the nodes to re-solve after editing `node_ids`, and the nodes whose
+    existing results they are solved from.
+
+    Returns:
+        dirty: `node_ids` and every node downstream of them, i.e., the results that
+            change.
+        cached: the nodes that discharge to `dirty` and have upstream nodes of their
+            own. Land surfaces with nothing upstream are solved from their loading
+            instead. See `solve_wq_epochs_from_upstream`.
+    """
+
+    g = nx.from_pandas_edgelist(edge_list, create_using=nx.DiGraph)
+    dirty = get_downstream_nodes(g, node_ids)
+
+    upstream = {u for n in dirty for u in g.predecessors(n)} - dirty
+    cached = {u for u in upstream if g.in_degree(u) > 0}
+
+    return dirty, cached
+
+
+def solve_wq_epochs_incremental(
+    *,
+    node_ids: List[str],
+    edge_list: pandas.DataFrame,
+    met: pandas.DataFrame,
+    loading: pandas.DataFrame,
+    tmnt_facilities: pandas.DataFrame,
+    cached_results: pandas.DataFrame,
+    epochs: List,
+    context: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+) -> pandas.DataFrame:
+    """Re-solve only the nodes downstream of `node_ids`.
+
+    An edited facility only changes its own results and those of the nodes it
+    discharges to, e.g., its subbasin, its basin and the outfall. Only those nodes
+    are solved, from the `cached_results` of the other nodes that discharge to them.
+    See `plan_incremental_solve`.
+
+    `cached_results` is the existing result_blob table, and only needs the
+    node_id, epoch and blob columns of the `cached` nodes of the plan.
+
+    Returns the result_blob rows of the downstream nodes only.
+    """
+
+    dirty, _ = plan_incremental_solve(node_ids=node_ids, edge_list=edge_list)
+
+    if not dirty:
+        return pandas.DataFrame([])
+
+    return solve_wq_epochs_from_upstream(
+        node_ids=dirty,
+        edge_list=edge_list,
+        met=met,
+        loading=loading,
+        tmnt_facilities=tmnt_facilities,
+        upstream_results=cached_results,
+        epochs=epochs,
+        context=context,
+        workers=workers,
+    )
+
+
+def solve_wq_epochs_incremental_from_db(
+    *, node_ids: List[str], engine=engine, workers: Optional[int] = None
+) -> pandas.DataFrame:
+
     with engine.begin() as conn:
 
         edge_list = get_graph_edges_from_db(conn)
         tmnt_facilities = get_tmnt_facilities_from_db(conn)
         met = pandas.read_sql("met", con=conn)
-
-        # get all loading data for all epochs. will query it down later.
         loading = land_surface_load_to_structural_from_db(epoch=None, connectable=conn)
 
+        _, cached = plan_incremental_solve(node_ids=node_ids, edge_list=edge_list)
+        cached_results = get_results_from_db(conn, node_ids=cached)
+
     epochs = list(met.epoch.unique())
     context = get_context()
-    results_blob = solve_wq_epochs(
+    results_blob = solve_wq_epochs_incremental(
+        node_ids=node_ids,
         epochs=epochs,
         edge_list=edge_list,
         met=met,
         loading=loading,
         tmnt_facilities=tmnt_facilities,
+        cached_results=cached_results,
         context=context,
+        workers=workers,
     )
 
     return results_blob
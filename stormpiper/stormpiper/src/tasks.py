@@ -1,16 +1,21 @@
 import logging
 
 import pandas
+from sqlalchemy import JSON
 
 from stormpiper.connections import arcgis
 from stormpiper.core.config import settings
+from stormpiper.core.context import get_context_version
 from stormpiper.database.connection import engine
 from stormpiper.database.utils import (
+    delete_and_append_postgis_rows_where,
+    delete_and_append_rows,
+    delete_and_append_rows_where,
     delete_and_replace_postgis_table,
     delete_and_replace_table,
 )
 
-from . import graph, loading, met, results, solve_structural_wq
+from . import graph, loading, met, pipeline, results, solve_structural_wq
 from .tmnt import default_attrs, default_tmnt_source_controls, spatial
 
 logging.basicConfig(level=settings.LOGLEVEL)
@@ -93,10 +98,20 @@ def delete_and_refresh_subbasin_table(
     return gdf
 
 
+def _replace_lgu_boundary_input_table(*, delineations, subbasins, engine=engine):
+    df = (
+        spatial.overlay_input_hashes(delineations=delineations, subbasins=subbasins)
+        .reset_index(drop=True)
+        .assign(id=lambda df: df.index.values + 1)
+    )
+    delete_and_replace_table(df=df, table_name="lgu_boundary_input", engine=engine)
+
+
 def delete_and_refresh_lgu_boundary_table(*, engine=engine):  # pragma: no cover
     logger.info("Creating lgu_boundary with the overlay rodeo")
+    delin, subs = spatial.read_overlay_inputs(engine)
     gdf = (
-        spatial.overlay_rodeo_from_database(engine)
+        spatial.overlay_rodeo(delineations=delin, subbasins=subs)
         .reset_index(drop=True)
         .assign(id=lambda df: df.index.values + 1)
     )
@@ -107,13 +122,58 @@ def delete_and_refresh_lgu_boundary_table(*, engine=engine):  # pragma: no cover
         table_name="lgu_boundary",
         engine=engine,
     )
+    _replace_lgu_boundary_input_table(delineations=delin, subbasins=subs, engine=engine)
     logger.info("TASK COMPLETE: replaced lgu_boundary table.")
 
     return gdf
 
 
+def refresh_lgu_boundary_table_for_changes(*, engine=engine):  # pragma: no cover
+    """Upsert only the lgu_boundary rows of the subbasins whose delineations or
+    geometry changed since the last refresh, and return those subbasins so the
+    downstream tables can be refreshed for them too.
+
+    Falls back to a full refresh if the inputs of the last refresh are unknown.
+    """
+    previous_inputs = pandas.read_sql(
+        "select layer, key, input_hash from lgu_boundary_input", con=engine
+    )
+    if previous_inputs.empty:
+        logger.info("no inputs recorded for lgu_boundary, refreshing all of it")
+        gdf = delete_and_refresh_lgu_boundary_table(engine=engine)
+        return sorted(set(gdf["subbasin"]) - {"None"})
+
+    delin, subs = spatial.read_overlay_inputs(engine)
+    lgu_boundary = pandas.read_sql(
+        "select node_id, subbasin from lgu_boundary", con=engine
+    )
+
+    rows, stale_node_ids, subbasins = spatial.overlay_rodeo_changes(
+        delineations=delin,
+        subbasins=subs,
+        lgu_boundary=lgu_boundary,
+        previous_inputs=previous_inputs,
+    )
+
+    logger.info(
+        f"replacing {len(stale_node_ids)} lgu_boundary nodes with {len(rows)} rows "
+        f"for subbasins {subbasins}"
+    )
+    delete_and_append_postgis_rows_where(
+        gdf=rows,  # type: ignore
+        table_name="lgu_boundary",
+        column="node_id",
+        values=stale_node_ids,
+        engine=engine,
+    )
+    _replace_lgu_boundary_input_table(delineations=delin, subbasins=subs, engine=engine)
+    logger.info("TASK COMPLETE: refreshed changed lgu_boundary rows.")
+
+    return subbasins
+
+
 def delete_and_refresh_lgu_load_table(*, engine=engine):  # pragma: no cover
-    logger.info("Recomputing LGU Loading with Earth Engine")
+    logger.info("Recomputing LGU Loading for new zone geometries")
     df = (
         loading.compute_loading_db(engine=engine)
         .reset_index(drop=True)
@@ -127,6 +187,82 @@ def delete_and_refresh_lgu_load_table(*, engine=engine):  # pragma: no cover
     return df
 
 
+def refresh_lgu_load_table_for_subbasins(*, subbasins, engine=engine):
+    """Recompute and replace the lgu_load rows of only the lgu_boundary zones in
+    `subbasins`.
+    """
+    subbasins = sorted(set(subbasins))
+    logger.info(f"Recomputing LGU Loading for subbasins {subbasins}...")
+
+    lgu_boundary = pandas.read_sql(
+        "select node_id, subbasin from lgu_boundary", con=engine
+    )
+    node_ids = lgu_boundary.loc[lgu_boundary["subbasin"].isin(subbasins), "node_id"]
+
+    df = loading.compute_loading_db(subbasins=subbasins, engine=engine).reset_index(
+        drop=True
+    )
+
+    logger.info(f"replacing {len(df)} rows of lgu_load table")
+    delete_and_append_rows_where(
+        df=df,
+        table_name="lgu_load",
+        column="node_id",
+        values=sorted(set(node_ids)),
+        engine=engine,
+    )
+    logger.info("TASK COMPLETE: refreshed lgu_load table for subbasins.")
+
+    return df
+
+
+def _delete_rows_of_removed_nodes(*, engine=engine):
+    """Delete the node rows of the tables that are keyed by node_id for the nodes that
+    are no longer in the graph_edge table, e.g., replaced lgu_boundary zones.
+    """
+    edges = pandas.read_sql("select source, target from graph_edge", con=engine)
+    nodes = set(edges["source"]) | set(edges["target"])
+
+    for table_name in ["lgu_load", "lgu_load_to_structural", "result_blob"]:
+        existing = pandas.read_sql(
+            f'select distinct node_id from "{table_name}"', con=engine
+        )
+        removed = sorted(set(existing["node_id"]) - nodes)
+        if removed:
+            logger.info(f"deleting {len(removed)} removed nodes from {table_name}")
+            delete_and_append_rows_where(
+                df=pandas.DataFrame(),
+                table_name=table_name,
+                column="node_id",
+                values=removed,
+                engine=engine,
+            )
+
+
+def refresh_lgu_tables_for_changes(*, engine=engine):  # pragma: no cover
+    """Refresh the lgu_boundary rows that changed, then refresh the tables that
+    depend on them for only the subbasins those rows belong to.
+
+    The graph_edge table is rebuilt in full, since its nodes change with the
+    lgu_boundary and it is cheap to build.
+    """
+    subbasins = refresh_lgu_boundary_table_for_changes(engine=engine)
+    if not subbasins:
+        logger.info("TASK COMPLETE: no lgu_boundary changes to refresh.")
+        return subbasins
+
+    refresh_lgu_load_table_for_subbasins(subbasins=subbasins, engine=engine)
+    delete_and_refresh_graph_edge_table(engine=engine)
+    _delete_rows_of_removed_nodes(engine=engine)
+
+    # src ctrls -> load to structural bmps -> results -> subbasin results
+    refresh_src_ctrl_tables_for_subbasins(subbasins=subbasins, engine=engine)
+
+    logger.info(f"TASK COMPLETE: refreshed lgu tables for subbasins {subbasins}.")
+
+    return subbasins
+
+
 def delete_and_refresh_met_table(*, engine=engine):
     logger.info("Reloading Met Table")
     df = (
@@ -157,43 +293,149 @@ def delete_and_refresh_graph_edge_table(*, engine=engine):
     return df
 
 
-def delete_and_refresh_result_table(*, engine=engine):
-    """Solve volume and wq for STRUCTURAL BMPs"""
-    logger.info("Solving Watershed...")
+def delete_and_refresh_result_table(*, engine=engine, force=False):
+    """Solve volume and wq for STRUCTURAL BMPs
+
+    The solve and the table rewrite are skipped if the result_blob table was
+    already solved from identical inputs, unless `force` is True.
+
+    The timing of each stage is logged and recorded in the pipeline_run_stage table.
+    Returns the id of the pipeline_run row, whose `cache_hit` says whether the solve
+    was skipped.
+    """
+    task = "delete_and_refresh_result_table"
+    spans = []
+    by_basin = settings.SOLVE_WQ_BY_BASIN
 
-    df = solve_structural_wq.solve_wq_epochs_from_db(engine=engine)
+    with pipeline.timed("read_inputs", spans), engine.begin() as conn:
+        inputs = solve_structural_wq.get_solve_inputs_from_db(conn)
+
+    with pipeline.timed("hash_inputs", spans):
+        input_hash = solve_structural_wq.hash_solve_inputs(
+            context_version=get_context_version(), by_basin=by_basin, **inputs
+        )
+
+    if not force and pipeline.is_current(
+        task=task, input_hash=input_hash, table_name="result_blob", engine=engine
+    ):
+        pipeline.log_spans(spans)
+        run_id = pipeline.record_run(
+            task=task, input_hash=input_hash, cache_hit=True, spans=spans, engine=engine
+        )
+        logger.info("TASK COMPLETE: results_blob table is current for these inputs.")
+        return run_id
+
+    logger.info("Solving Watershed...")
+    df = solve_structural_wq.solve_wq_epochs_from_db(
+        engine=engine, inputs=inputs, by_basin=by_basin, spans=spans
+    )
 
     logger.info("deleting and replacing results_blob table")
-    delete_and_replace_table(df=df, table_name="result_blob", engine=engine)
+    with pipeline.timed("write_results", spans):
+        delete_and_replace_table(
+            df=df, table_name="result_blob", engine=engine, dtype={"blob": JSON}
+        )
+
+    pipeline.log_spans([s for s in spans if "epoch" not in s])
+    run_id = pipeline.record_run(
+        task=task, input_hash=input_hash, cache_hit=False, spans=spans, engine=engine
+    )
     logger.info("TASK COMPLETE: replaced results_blob table.")
 
+    return run_id
+
+
+def refresh_result_table_for_nodes(*, node_ids, engine=engine):
+    """Re-solve volume and wq for the nodes downstream of `node_ids`, e.g., after
+    editing a facility's attributes, and upsert their results.
+    """
+    logger.info(f"Solving Watershed downstream of {node_ids}...")
+
+    df = solve_structural_wq.solve_wq_epochs_incremental_from_db(
+        node_ids=node_ids, engine=engine
+    )
+
+    if df.empty:
+        logger.info(f"TASK COMPLETE: no results downstream of {node_ids}.")
+        return df
+
+    logger.info(f"upserting {len(df)} rows into results_blob table")
+    delete_and_append_rows(
+        df=df,
+        table_name="result_blob",
+        keys=["node_id", "epoch"],
+        engine=engine,
+        dtype={"blob": JSON},
+    )
+    logger.info("TASK COMPLETE: upserted results_blob table.")
+
     return df
 
 
-def _delete_and_refresh_source_controls_upstream_load_reduction(*, engine=engine):
-    """Solve wq for UPSTREAM Src Ctrls"""
+def _delete_and_refresh_source_controls_load_reduction(*, direction, engine=engine):
+    """Solve wq for the `direction` Src Ctrls, in the database or in pandas depending
+    on the SRC_CTRL_BACKEND setting.
+    """
+
+    _, table_name = results.SRC_CTRL_LOAD_TABLES[direction]
+
+    if settings.SRC_CTRL_BACKEND == "sql":
+        logger.info(f"replacing {table_name} table in the database")
+        n = results.source_controls_load_reduction_sql(
+            direction=direction, engine=engine
+        )
+        logger.info(f"TASK COMPLETE: replaced {table_name} table with {n} rows.")
+        return None
 
     df = (
-        results.source_controls_upstream_load_reduction_db(engine=engine)
+        results.source_controls_load_reduction_db(direction=direction, engine=engine)
         .reset_index(drop=True)
         .assign(id=lambda df: df.index + 1)
     )
 
-    logger.info(
-        "deleting and replacing tmnt_source_control_upstream_load_reduced table"
-    )
-    delete_and_replace_table(
-        df=df,
-        table_name="tmnt_source_control_upstream_load_reduced",
-        engine=engine,
+    logger.info(f"deleting and replacing {table_name} table")
+    delete_and_replace_table(df=df, table_name=table_name, engine=engine)
+    logger.info(f"TASK COMPLETE: replaced {table_name} table.")
+
+    return df
+
+
+def _refresh_source_controls_load_reduction_for_subbasins(
+    *, direction, subbasins, engine=engine
+):
+    """Replace the `direction` Src Ctrl rows of only `subbasins`, in the database or
+    in pandas depending on the SRC_CTRL_BACKEND setting.
+    """
+
+    _, table_name = results.SRC_CTRL_LOAD_TABLES[direction]
+
+    if settings.SRC_CTRL_BACKEND == "sql":
+        n = results.source_controls_load_reduction_sql(
+            direction=direction, subbasins=subbasins, engine=engine
+        )
+        logger.info(f"replaced {n} rows of {table_name} table in the database")
+        return None
+
+    df = results.source_controls_load_reduction_db(
+        direction=direction, subbasins=subbasins, engine=engine
     )
-    logger.info(
-        "TASK COMPLETE: replaced tmnt_source_control_upstream_load_reduced table."
+
+    logger.info(f"replacing {len(df)} rows of {table_name} table")
+    delete_and_append_rows_where(
+        df=df, table_name=table_name, column="subbasin", values=subbasins, engine=engine
     )
 
     return df
 
 
+def _delete_and_refresh_source_controls_upstream_load_reduction(*, engine=engine):
+    """Solve wq for UPSTREAM Src Ctrls"""
+
+    return _delete_and_refresh_source_controls_load_reduction(
+        direction="upstream", engine=engine
+    )
+
+
 def _delete_and_refresh_lgu_load_to_structural_table(*, engine=engine):
     """Prepare loading table FROM Upstream Src Ctrl TO Structural BMPs"""
 
@@ -241,26 +483,10 @@ def _delete_and_refresh_load_to_ds_src_ctrl_table(*, engine=engine):
 def _delete_and_refresh_source_controls_downstream_load_reduction(*, engine=engine):
     """Solve wq for DOWNSTREAM Src Ctrls"""
 
-    df = (
-        results.source_controls_downstream_load_reduction_db(engine=engine)
-        .reset_index(drop=True)
-        .assign(id=lambda df: df.index + 1)
-    )
-
-    logger.info(
-        "deleting and replacing tmnt_source_control_downstream_load_reduced table"
-    )
-    delete_and_replace_table(
-        df=df,
-        table_name="tmnt_source_control_downstream_load_reduced",
-        engine=engine,
-    )
-    logger.info(
-        "TASK COMPLETE: replaced tmnt_source_control_downstream_load_reduced table."
+    return _delete_and_refresh_source_controls_load_reduction(
+        direction="downstream", engine=engine
     )
 
-    return df
-
 
 def delete_and_refresh_subbasin_result_table(*, engine=engine):
 
@@ -289,6 +515,83 @@ def delete_and_refresh_downstream_src_ctrl_tables(*, engine=engine):
     _delete_and_refresh_source_controls_downstream_load_reduction(engine=engine)
 
 
+def refresh_src_ctrl_tables_for_subbasins(*, subbasins, engine=engine):
+    """Recompute the source control tables for only the nodes of `subbasins`, e.g.,
+    after a source control in one of them was created, edited or deleted, and
+    replace their rows.
+
+    The structural results downstream of the subbasins' lgus are re-solved in
+    between, since their load changes with the upstream source controls.
+    """
+    subbasins = sorted(set(subbasins))
+    if not subbasins:
+        logger.info("TASK COMPLETE: no subbasins to refresh.")
+        return None
+
+    sb_nodes = [f"SB_{s}" for s in subbasins]
+    lgu_nodes = pandas.read_sql(
+        "select node_id from lgu_boundary where subbasin in %(subbasins)s",
+        params={"subbasins": tuple(subbasins)},
+        con=engine,
+    )["node_id"].to_list()
+    # a facility may have lost the lgus that drained to it
+    facility_nodes = pandas.read_sql(
+        "select node_id from tmnt_v where subbasin in %(subbasins)s",
+        params={"subbasins": tuple(subbasins)},
+        con=engine,
+    )["node_id"].to_list()
+
+    def _replace(df, table_name, column, values):
+        logger.info(f"replacing {len(df)} rows of {table_name} table")
+        delete_and_append_rows_where(
+            df=df, table_name=table_name, column=column, values=values, engine=engine
+        )
+
+    logger.info(f"Recomputing source control tables for subbasins {subbasins}...")
+
+    # upstream src ctrls -> load to structural bmps
+    _refresh_source_controls_load_reduction_for_subbasins(
+        direction="upstream", subbasins=subbasins, engine=engine
+    )
+    _replace(
+        loading.load_to_structural_bmps_from_db(subbasins=subbasins, engine=engine),
+        "lgu_load_to_structural",
+        "node_id",
+        lgu_nodes,
+    )
+
+    # structural bmps -> load to downstream src ctrls
+    if lgu_nodes or facility_nodes:
+        refresh_result_table_for_nodes(
+            node_ids=lgu_nodes + facility_nodes, engine=engine
+        )
+    _replace(
+        loading.load_to_downstream_src_ctrls_from_db(
+            subbasins=subbasins, engine=engine
+        ),
+        "load_to_ds_src_ctrl",
+        "node_id",
+        sb_nodes,
+    )
+
+    # downstream src ctrls -> subbasin results
+    _refresh_source_controls_load_reduction_for_subbasins(
+        direction="downstream", subbasins=subbasins, engine=engine
+    )
+    _replace(
+        loading.subbasin_loading_summary_result_from_db(
+            subbasins=subbasins, engine=engine
+        ),
+        "subbasin_result",
+        "node_id",
+        sb_nodes,
+    )
+
+    logger.info(f"TASK COMPLETE: refreshed source control tables for {subbasins}.")
+
+    return None
+
+
 def delete_and_refresh_all_results_tables(*, engine=engine):
     delete_and_refresh_upstream_src_ctrl_tables(engine=engine)
     delete_and_refresh_graph_edge_table(engine=engine)
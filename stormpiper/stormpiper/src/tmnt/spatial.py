@@ -1,15 +1,253 @@
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Set, Tuple
+
 import geopandas
 import numpy
 import pandas
+import shapely
+
+from stormpiper.core.config import settings
+from stormpiper.core.utils import process_pool_workers
+
+from ..utils import hash_geometries
+
+logging.basicConfig(level=settings.LOGLEVEL)
+logger = logging.getLogger(__name__)
+
+DELINEATION_COLS = ["node_id", "altid", "relid"]
+SUBBASIN_COLS = ["subbasin", "basinname"]
+
+# the pieces of a union overlay, in the order geopandas.overlay stacks them
+_INTERSECTION, _DELINEATION_DIFF, _SUBBASIN_DIFF = 0, 1, 2
+
+Partition = Tuple[
+    geopandas.GeoDataFrame,
+    geopandas.GeoDataFrame,
+    geopandas.GeoDataFrame,
+    geopandas.GeoDataFrame,
+]
+
+
+def _with_geometry_name(gdf: geopandas.GeoDataFrame) -> geopandas.GeoDataFrame:
+    # the union overlay always returns a 'geometry' column, e.g., for postgis 'geom'
+    if gdf.geometry.name != "geometry":
+        gdf = gdf.rename_geometry("geometry")
+    return gdf
+
+
+def _make_valid(gdf: geopandas.GeoDataFrame) -> geopandas.GeoDataFrame:
+    # same as geopandas.overlay, so the candidate search sees the same geometries
+    gdf = gdf.copy()
+    if gdf.geom_type.isin(["Polygon", "MultiPolygon"]).all():
+        invalid = ~gdf.geometry.is_valid
+        gdf.loc[invalid, gdf.geometry.name] = gdf.loc[invalid].geometry.buffer(0)
+    return gdf
+
+
+def _intersecting_pairs(
+    delineations: geopandas.GeoDataFrame, subbasins: geopandas.GeoDataFrame
+) -> pandas.DataFrame:
+    """Positions of each intersecting (delineation, subbasin) pair from an STRtree
+    search, sorted by delineation then subbasin.
+    """
+
+    tree = shapely.STRtree(subbasins.geometry.values)
+    d_ix, s_ix = tree.query(delineations.geometry.values, predicate="intersects")
+    order = numpy.lexsort((s_ix, d_ix))
+
+    return pandas.DataFrame({"d": d_ix[order], "s": s_ix[order]})
+
+
+def _intersection_order(
+    pairs: pandas.DataFrame, n_delineations: int, n_subbasins: int
+) -> pandas.DataFrame:
+    """The row of each intersection in `geopandas.overlay`, which joins the
+    attributes of both frames onto the pairs and keeps the row order of the joins.
+    """
+
+    joined = pairs.merge(
+        pandas.DataFrame(index=pandas.RangeIndex(n_delineations)),
+        left_on="d",
+        right_index=True,
+    ).merge(
+        pandas.DataFrame(index=pandas.RangeIndex(n_subbasins)),
+        left_on="s",
+        right_index=True,
+    )
+
+    return pandas.DataFrame(
+        {
+            "__d": joined["d"].to_numpy(),
+            "__s": joined["s"].to_numpy(),
+            "__order": numpy.arange(len(joined)),
+        }
+    )
+
+
+def _partition_by_subbasin(
+    delineations: geopandas.GeoDataFrame,
+    subbasins: geopandas.GeoDataFrame,
+    pairs: pandas.DataFrame,
+    n_partitions: int,
+) -> List[Partition]:
+    """Splits the union of `delineations` and `subbasins` into `n_partitions` groups
+    of subbasins from their intersecting `pairs`.
+
+    Each partition is (delineations in the subbasins, the subbasins, delineations
+    whose first intersecting subbasin is in the group, all subbasins those
+    delineations intersect). Delineations outside of every subbasin are differenced
+    in the first partition.
+    """
+
+    groups = [
+        g
+        for g in numpy.array_split(numpy.arange(len(subbasins)), n_partitions)
+        if len(g)
+    ] or [numpy.arange(0)]
+    group_of_s = numpy.zeros(len(subbasins), dtype=int)
+    for k, group in enumerate(groups):
+        group_of_s[group] = k
+
+    # each delineation is differenced against all of its subbasins exactly once, in
+    # the partition of the first one.
+    group_of_d = numpy.zeros(len(delineations), dtype=int)
+    first_s = pairs.groupby("d")["s"].min()
+    group_of_d[first_s.index.values] = group_of_s[first_s.values]
+
+    pair_group = group_of_s[pairs["s"].values]
+    pair_d_group = group_of_d[pairs["d"].values]
+
+    partitions = []
+    for k, group in enumerate(groups):
+        diff_d = numpy.flatnonzero(group_of_d == k)
+        partitions.append(
+            (
+                delineations.iloc[numpy.unique(pairs["d"].values[pair_group == k])],
+                subbasins.iloc[group],
+                delineations.iloc[diff_d],
+                subbasins.iloc[numpy.unique(pairs["s"].values[pair_d_group == k])],
+            )
+        )
+
+    return partitions
+
+
+def _overlay_partition(partition: Partition) -> geopandas.GeoDataFrame:
+    """The pieces of the union overlay that belong to a single partition, tagged with
+    the delineation and subbasin positions they came from.
+    """
+
+    delineations, subbasin, diff_delineations, diff_subbasins = partition
+
+    pieces = []
+    if len(delineations) and len(subbasin):
+        inter = geopandas.overlay(
+            delineations, subbasin, how="intersection", keep_geom_type=True
+        )
+        pieces.append(inter.assign(__piece=_INTERSECTION))
+    if len(subbasin):
+        diff = geopandas.overlay(
+            subbasin, delineations, how="difference", keep_geom_type=True
+        )
+        pieces.append(diff.assign(__piece=_SUBBASIN_DIFF))
+    if len(diff_delineations):
+        diff = geopandas.overlay(
+            diff_delineations, diff_subbasins, how="difference", keep_geom_type=True
+        )
+        pieces.append(diff.assign(__piece=_DELINEATION_DIFF))
+
+    return pandas.concat(pieces, ignore_index=True)
+
+
+def overlay_union_by_subbasin(
+    *,
+    delineations: geopandas.GeoDataFrame,
+    subbasins: geopandas.GeoDataFrame,
+    workers: Optional[int] = None,
+    n_partitions: Optional[int] = None,
+) -> geopandas.GeoDataFrame:
+    """Same rows as `geopandas.overlay(delineations, subbasins, how="union")` for the
+    `DELINEATION_COLS` and `SUBBASIN_COLS`, computed for `n_partitions` groups of
+    subbasins (default four per worker) at a time.
+
+    If `workers` is greater than one, the partitions are overlaid in a process pool.
+    The pieces are stacked in the order of the citywide overlay, so the output is
+    identical to the serial path. `workers` defaults to the `OVERLAY_WORKERS`
+    setting, and is always 1 in a daemon process like a celery worker.
+    """
+
+    if workers is None:
+        workers = settings.OVERLAY_WORKERS
+    workers = process_pool_workers(workers)
+
+    delineations = _make_valid(
+        _with_geometry_name(delineations)
+        .reset_index(drop=True)
+        .reindex(columns=DELINEATION_COLS + ["geometry"])
+        .assign(__d=lambda df: df.index.values)
+    )
+    subbasins = _make_valid(
+        _with_geometry_name(subbasins)
+        .reset_index(drop=True)
+        .reindex(columns=SUBBASIN_COLS + ["geometry"])
+        .assign(__s=lambda df: df.index.values)
+    )
+
+    pairs = _intersecting_pairs(delineations, subbasins)
+    partitions = _partition_by_subbasin(
+        delineations, subbasins, pairs, n_partitions=n_partitions or 4 * workers
+    )
+    logger.info(
+        f"overlaying {len(delineations)} delineations in {len(partitions)} "
+        f"subbasin partitions with {workers} workers"
+    )
+
+    if workers > 1 and len(partitions) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pieces = list(executor.map(_overlay_partition, partitions))
+    else:
+        pieces = [_overlay_partition(partition) for partition in partitions]
+
+    # stack the pieces like geopandas.overlay: the intersections in join order, then
+    # the delineation differences and then the subbasin differences.
+    union = pandas.concat(pieces, ignore_index=True)
+    union = (
+        union.merge(
+            _intersection_order(pairs, len(delineations), len(subbasins)),
+            on=["__d", "__s"],
+            how="left",
+        )
+        .assign(
+            __order=lambda df: df["__order"]
+            .fillna(df["__d"].where(df["__piece"] == _DELINEATION_DIFF))
+            .fillna(df["__s"])
+        )
+        .sort_values(["__piece", "__order"], kind="mergesort")
+        .drop(columns=["__piece", "__d", "__s", "__order"])
+        .reset_index(drop=True)
+    )
+
+    return union
 
 
 def overlay_rodeo(
-    *, delineations: geopandas.GeoDataFrame, subbasins: geopandas.GeoDataFrame
+    *,
+    delineations: geopandas.GeoDataFrame,
+    subbasins: geopandas.GeoDataFrame,
+    workers: Optional[int] = None,
+    n_partitions: Optional[int] = None,
 ) -> geopandas.GeoDataFrame:
     if any(i is None for i in [delineations, subbasins]):
         return geopandas.GeoDataFrame([])
     out = (
-        geopandas.overlay(delineations, subbasins, how="union", keep_geom_type=True)  # type: ignore
+        overlay_union_by_subbasin(
+            delineations=delineations,
+            subbasins=subbasins,
+            workers=workers,
+            n_partitions=n_partitions,
+        )
         .assign(subbasin=lambda df: df["subbasin"].fillna("None").astype(str))
         .assign(basinname=lambda df: df["basinname"].fillna("None").astype(str))
         .assign(
@@ -35,7 +273,168 @@ def overlay_rodeo(
     return out
 
 
-def overlay_rodeo_from_database(engine) -> geopandas.GeoDataFrame:
+def overlay_input_hashes(
+    *, delineations: geopandas.GeoDataFrame, subbasins: geopandas.GeoDataFrame
+) -> pandas.DataFrame:
+    """The hash of each delineation (by node_id) and subbasin that the overlay rodeo
+    reads, from its geometry hash and the attributes it copies into lgu_boundary.
+    """
+
+    frames = []
+    for layer, gdf, key, attrs in [
+        ("delineation", delineations, "node_id", DELINEATION_COLS),
+        ("subbasin", subbasins, "subbasin", SUBBASIN_COLS),
+    ]:
+        values = hash_geometries(gdf.geometry).fillna("")
+        for col in attrs:
+            values = values + "|" + gdf[col].astype(str)
+        frames.append(
+            pandas.DataFrame(
+                {
+                    "layer": layer,
+                    "key": gdf[key].astype(str).to_numpy(),
+                    "input_hash": [
+                        hashlib.sha256(v.encode()).hexdigest() for v in values
+                    ],
+                }
+            )
+        )
+
+    return pandas.concat(frames, ignore_index=True)
+
+
+def _changed_keys(
+    previous: pandas.DataFrame, current: pandas.DataFrame, layer: str
+) -> Set[str]:
+    """Keys of `layer` that were added, removed or whose hashes differ."""
+
+    def _hashes(df):
+        return (
+            df.loc[df["layer"] == layer]
+            .groupby("key")["input_hash"]
+            .agg(lambda h: tuple(sorted(h)))
+        )
+
+    prev, cur = _hashes(previous), _hashes(current)
+    keys = prev.index.union(cur.index)
+    changed = [p != c for p, c in zip(prev.reindex(keys), cur.reindex(keys))]
+
+    return set(keys[changed])
+
+
+def _lgu_delineation_keys(lgu_boundary: pandas.DataFrame) -> pandas.Series:
+    # lgu node_ids are '<delineation node_id>_SB_<subbasin>', or 'SB_<subbasin>' for
+    # the undelineated area of the subbasin.
+    suffixes = "_SB_" + lgu_boundary["subbasin"].astype(str)
+    return pandas.Series(
+        [
+            node_id[: -len(suffix)] if node_id.endswith(suffix) else None
+            for node_id, suffix in zip(lgu_boundary["node_id"], suffixes)
+        ],
+        index=lgu_boundary.index,
+        dtype=object,
+    )
+
+
+def overlay_rodeo_changes(
+    *,
+    delineations: geopandas.GeoDataFrame,
+    subbasins: geopandas.GeoDataFrame,
+    lgu_boundary: pandas.DataFrame,
+    previous_inputs: pandas.DataFrame,
+    workers: Optional[int] = None,
+    n_partitions: Optional[int] = None,
+) -> Tuple[geopandas.GeoDataFrame, List[str], List[str]]:
+    """Recomputes only the lgu_boundary rows whose inputs changed since the overlay
+    rodeo that built `lgu_boundary` from `previous_inputs`, the output of
+    `overlay_input_hashes`.
+
+    The touched subbasins are those that changed, plus those a changed delineation
+    intersected before or after its change. They are overlaid again with every
+    delineation in them. Those delineations also get their area outside of every
+    subbasin recomputed.
+
+    Returns the new rows, the node_ids of the rows of `lgu_boundary` they replace,
+    and the touched subbasins. The new rows are the same as the matching rows of a
+    full `overlay_rodeo`.
+    """
+
+    current = overlay_input_hashes(delineations=delineations, subbasins=subbasins)
+    changed_d = _changed_keys(previous_inputs, current, "delineation")
+    changed_s = _changed_keys(previous_inputs, current, "subbasin")
+
+    delineations = _make_valid(_with_geometry_name(delineations))
+    subbasins = _make_valid(_with_geometry_name(subbasins))
+    d_keys = delineations["node_id"].astype(str)
+    s_keys = subbasins["subbasin"].astype(str)
+    lgu_subbasins = lgu_boundary["subbasin"].astype(str)
+    lgu_d_keys = _lgu_delineation_keys(lgu_boundary)
+
+    d_tree = shapely.STRtree(delineations.geometry.values)
+    s_tree = shapely.STRtree(subbasins.geometry.values)
+
+    def _intersecting(tree, geoms):
+        return numpy.unique(tree.query(geoms, predicate="intersects")[1])
+
+    is_changed_d = d_keys.isin(changed_d).to_numpy()
+    touched = (
+        changed_s
+        | set(lgu_subbasins[lgu_d_keys.isin(changed_d)])
+        | set(
+            s_keys.iloc[
+                _intersecting(s_tree, delineations.geometry.values[is_changed_d])
+            ]
+        )
+    )
+    touched.discard("None")  # the area outside of every subbasin
+    is_touched_s = s_keys.isin(touched).to_numpy()
+
+    redo_d = (
+        changed_d
+        | set(
+            d_keys.iloc[_intersecting(d_tree, subbasins.geometry.values[is_touched_s])]
+        )
+        | set(lgu_d_keys[lgu_subbasins.isin(touched)].dropna())
+    )
+    is_redo_d = d_keys.isin(redo_d).to_numpy()
+
+    # the outside area of a delineation is differenced with all of its subbasins.
+    is_redo_s = is_touched_s.copy()
+    is_redo_s[_intersecting(s_tree, delineations.geometry.values[is_redo_d])] = True
+
+    logger.info(
+        f"overlaying {is_redo_d.sum()} delineations and {is_redo_s.sum()} subbasins "
+        f"for {len(changed_d)} changed delineations and {len(changed_s)} changed "
+        "subbasins"
+    )
+
+    rows = geopandas.GeoDataFrame(
+        columns=["node_id", "altid", "relid", "subbasin", "basinname", "geometry"],
+        geometry="geometry",
+        crs=subbasins.crs,
+    )
+    if is_redo_d.any() or is_redo_s.any():
+        rows = overlay_rodeo(
+            delineations=delineations.loc[is_redo_d],
+            subbasins=subbasins.loc[is_redo_s],
+            workers=workers,
+            n_partitions=n_partitions,
+        ).loc[lambda df: df["subbasin"].isin(touched) | (df["subbasin"] == "None")]
+
+    is_stale = lgu_subbasins.isin(touched) | (
+        (lgu_subbasins == "None") & lgu_d_keys.isin(redo_d)
+    )
+    stale_node_ids = sorted(
+        set(lgu_boundary.loc[is_stale, "node_id"]) | set(rows["node_id"])
+    )
+
+    return rows, stale_node_ids, sorted(touched)
+
+
+def read_overlay_inputs(
+    engine,
+) -> Tuple[geopandas.GeoDataFrame, geopandas.GeoDataFrame]:
+    """The delineations and subbasins for the overlay rodeo."""
 
     with engine.begin() as conn:
         relid = pandas.read_sql("select distinct altid from tmnt_facility", con=conn)[
@@ -48,4 +447,11 @@ def overlay_rodeo_from_database(engine) -> geopandas.GeoDataFrame:
         )
         subs = geopandas.read_postgis("subbasin", con=conn)
 
+    return delin, subs  # type: ignore
+
+
+def overlay_rodeo_from_database(engine) -> geopandas.GeoDataFrame:
+
+    delin, subs = read_overlay_inputs(engine)
+
     return overlay_rodeo(delineations=delin, subbasins=subs)  # type: ignore
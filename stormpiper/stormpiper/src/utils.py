@@ -1,27 +1,111 @@
+import hashlib
 from textwrap import dedent
 
 import pandas
+import shapely
+
+# the repeated string keys of the long/tidy load tables
+TIDY_CATEGORICAL_COLS = ["node_id", "epoch", "variable", "units"]
 
 
 def unpack_results_blob(results_blob):
-    results_blob = results_blob.set_index(["node_id", "epoch"])[["blob"]]
-    results_unpacked = results_blob["blob"].apply(
-        lambda dct: pandas.Series(dct.values(), index=dct.keys())
+    """Expands the `blob` dicts of result_blob into one column per key.
+
+    The blobs are read in a single `from_records` pass, so keys that are missing
+    from some blobs are NaN. The node_id and epoch always come from the table.
+    """
+
+    unpacked = pandas.DataFrame.from_records(results_blob["blob"].tolist()).drop(
+        columns=["node_id", "epoch"], errors="ignore"
     )
 
-    results = (
-        results_blob.join(results_unpacked)
-        # if these duplicate keys are in the blob, we need to drop them to prevent dupplicate column names
-        # when resetting the index
-        .drop(columns=["blob", "node_id", "epoch"]).reset_index()
-        # drop duplicated columns
-        .loc[:, lambda df: ~df.columns.duplicated()]
+    results = pandas.concat(
+        [results_blob[["node_id", "epoch"]].reset_index(drop=True), unpacked], axis=1
     )
 
     return results
 
 
-def get_loading_df_from_db(*, tablename="lgu_load", epoch=None, engine):
+def compact_tidy_dtypes(df, columns=None):
+    """Casts the repeated string keys of a tidy frame to categoricals.
+
+    The values are left as float64 since they are summed and reduced downstream.
+    Columns that are missing from `df` are ignored.
+    """
+
+    if columns is None:
+        columns = TIDY_CATEGORICAL_COLS
+
+    return df.astype({c: "category" for c in columns if c in df.columns})
+
+
+def match_categorical_dtypes(df, like, columns):
+    """Casts `columns` of `df` to the categorical dtypes they have in `like` so that
+    merges between the two keep the categoricals. Values of `df` that are not
+    categories in `like` become NaN.
+    """
+
+    dtypes = {
+        c: like[c].dtype
+        for c in columns
+        if isinstance(like[c].dtype, pandas.CategoricalDtype)
+    }
+    return df.astype(dtypes)
+
+
+def hash_geometries(geometry) -> pandas.Series:
+    """sha256 of the normalized WKB of each geometry of a GeoSeries, so the hash
+    doesn't depend on ring orientation or the starting vertex.
+    """
+
+    wkb = shapely.to_wkb(shapely.normalize(geometry.to_numpy()))
+    return pandas.Series(
+        [hashlib.sha256(w).hexdigest() if w is not None else None for w in wkb],
+        index=geometry.index,
+    )
+
+
+def read_table_for_subbasins(
+    tablename: str, *, subbasins=None, by: str = "subbasin", columns=None, engine
+) -> pandas.DataFrame:
+    """Reads the `columns` (default all) of `tablename`, or only its rows that
+    belong to `subbasins` if given.
+
+    by : how the rows belong to a subbasin. "subbasin" filters on the subbasin
+        column, "lgu" on the node_id of the lgu_boundary zones in the subbasins and
+        "node" on the node_id of the subbasin's 'SB_' node.
+    """
+
+    filters = {
+        "subbasin": "subbasin in %(subbasins)s",
+        "lgu": (
+            "node_id in "
+            "(select node_id from lgu_boundary where subbasin in %(subbasins)s)"
+        ),
+        "node": "node_id in %(sb_nodes)s",
+    }
+
+    cols = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+    qry = f'select {cols} from "{tablename}"'
+    params = None
+    if subbasins is not None:
+        subbasins = tuple(subbasins)
+        if not subbasins:
+            # `in ()` is not valid sql, so only read the columns.
+            return pandas.read_sql(f"{qry} limit 0", con=engine)
+
+        qry += f" where {filters[by]}"
+        params = {
+            "subbasins": subbasins,
+            "sb_nodes": tuple(f"SB_{s}" for s in subbasins),
+        }
+
+    return pandas.read_sql(qry, params=params, con=engine)
+
+
+def get_loading_df_from_db(
+    *, tablename="lgu_load", epoch=None, engine, compact: bool = True
+):
 
     if epoch is None:
         epoch_str, user_epoch = "1=%(epoch)s", "1"
@@ -41,4 +125,7 @@ def get_loading_df_from_db(*, tablename="lgu_load", epoch=None, engine):
 
     df_tidy = pandas.read_sql(qry, params={"epoch": user_epoch}, con=engine)
 
+    if compact:
+        df_tidy = compact_tidy_dtypes(df_tidy)
+
     return df_tidy
@@ -0,0 +1,178 @@
+"""Benchmarks for the land surface loading transforms.
+
+Run with: python -m stormpiper.tests.benchmarks.bench_loading
+"""
+
+import timeit
+
+import numpy
+import pandas
+
+from stormpiper.src import loading
+from stormpiper.src.organics import add_virtual_pocs_to_tidy_load_summary
+from stormpiper.src.utils import compact_tidy_dtypes
+
+EPOCHS = ["1980s", "2030s", "2050s", "2080s"]
+
+
+def make_wide_load(n_lgus: int = 50_000, seed=42) -> pandas.DataFrame:
+    """Synthetic zonal stats with the same columns as `loading.zonal_stats`. The
+    default is about 10x the number of lgus we run today.
+    """
+
+    rng = numpy.random.default_rng(seed)
+    cols = ["runoff_L"] + [f"{poc}_mcg" for poc in loading.POC_REMAPPER]
+    n = n_lgus * len(EPOCHS)
+
+    wide_load = pandas.DataFrame({c: rng.random(n) * 1e6 for c in cols})
+    wide_load.insert(0, "epoch", numpy.repeat(EPOCHS, n_lgus))
+    wide_load.insert(0, "node_id", numpy.tile([f"ls_{i}" for i in range(n_lgus)], 4))
+
+    return wide_load
+
+
+def wide_load_to_tidy_load_by_row(wide_load, poc_remapper=loading.POC_REMAPPER):
+    """The previous implementation, which parses the column name of every row."""
+
+    df_tidy = (
+        wide_load.melt(id_vars=["node_id", "epoch"])
+        .assign(
+            _variable=lambda df: df["variable"]
+            .str.split("_")
+            .str[:-1]  # pop off unit and rejoin
+            .str.join("_")
+        )
+        .assign(units=lambda df: df["variable"].str.split("_").str[-1])
+        .assign(variable=lambda df: df["_variable"].replace(poc_remapper))
+        .drop(columns=["_variable"])
+        .pipe(add_virtual_pocs_to_tidy_load_summary)
+        .reset_index(drop=True)
+        .assign(id=lambda df: df.index.values + 1)
+        .set_index("id")
+    )
+
+    return df_tidy
+
+
+def make_result_blob(n_nodes: int = 20_000, seed=42) -> pandas.DataFrame:
+    """Synthetic result_blob rows for lgu, facility and 'SB_' subbasin nodes. The
+    subbasin blobs carry the total discharged loads and volume.
+    """
+
+    rng = numpy.random.default_rng(seed)
+    pocs = ["TSS", "TN", "TP", "TZn", "TCu"]
+    ls_cols = ["runoff_volume_cuft"] + [f"{poc}_load_lbs" for poc in pocs]
+    ds_cols = [f"{c}_total_discharged" for c in ls_cols]
+    fac_cols = ["captured_pct", "treated_pct", "retained_pct", "bypassed_pct"]
+
+    rows = []
+    for epoch in EPOCHS:
+        for i in range(n_nodes):
+            node_type, cols = [
+                ("ls", ls_cols),
+                ("fac", fac_cols + ds_cols),
+                ("SB", ls_cols + ds_cols),
+            ][i % 3]
+            blob = {c: float(v) for c, v in zip(cols, rng.random(len(cols)) * 1e3)}
+            node_id = f"{node_type}_{i}"
+            rows.append(
+                {
+                    "node_id": node_id,
+                    "epoch": epoch,
+                    "blob": {"node_id": node_id, "epoch": epoch, **blob},
+                }
+            )
+
+    result_blob = pandas.DataFrame(rows)
+    # some discharged loads are null, e.g., subbasins with no upstream facilities.
+    for blob in result_blob["blob"].iloc[2::9]:
+        blob["TSS_load_lbs_total_discharged"] = None
+
+    return result_blob
+
+
+def unpack_results_blob_by_row(results_blob):
+    """The previous implementation, which builds a Series from every blob."""
+
+    results_blob = results_blob.set_index(["node_id", "epoch"])[["blob"]]
+    results_unpacked = results_blob["blob"].apply(
+        lambda dct: pandas.Series(dct.values(), index=dct.keys())
+    )
+
+    results = (
+        results_blob.join(results_unpacked)
+        .drop(columns=["blob", "node_id", "epoch"])
+        .reset_index()
+        .loc[:, lambda df: ~df.columns.duplicated()]
+    )
+
+    return results
+
+
+def load_to_downstream_src_ctrls_by_row(result_blob):
+    """The previous implementation, which unpacks every blob before selecting the
+    subbasin nodes.
+    """
+
+    results = unpack_results_blob_by_row(result_blob)
+    discharge_cols = [c for c in results.columns if "_total_discharged" in c.lower()]
+
+    cols = ["node_id", "epoch"] + discharge_cols
+
+    load_to_ds_src_ctrl = results.loc[results.node_id.str.startswith("SB_")][cols]
+
+    for col in discharge_cols:
+        backup_results = results[col.replace("_total_discharged", "")]
+        load_to_ds_src_ctrl[col] = load_to_ds_src_ctrl[col].fillna(backup_results)
+
+    load_to_ds_src_ctrl = (
+        load_to_ds_src_ctrl.melt(id_vars=["node_id", "epoch"])
+        .assign(
+            units=lambda df: df.variable.str.split("_total_discharged")
+            .str[0]
+            .str.split("_")
+            .str[-1]
+        )
+        .assign(variable=lambda df: df["variable"].str.split("_").str[0])
+        .pipe(add_virtual_pocs_to_tidy_load_summary)
+        .reset_index(drop=True)
+        .assign(id=lambda df: df.index.values + 1)
+    )
+
+    return load_to_ds_src_ctrl
+
+
+def bench_wide_load_to_tidy_load(n_lgus: int = 50_000, number: int = 3):
+    wide_load = make_wide_load(n_lgus)
+
+    for func in [wide_load_to_tidy_load_by_row, loading.wide_load_to_tidy_load]:
+        t = timeit.timeit(lambda: func(wide_load), number=number) / number
+        print(f"{func.__name__} ({n_lgus} lgus): {t:.4f} seconds")
+
+
+def bench_tidy_load_memory(n_lgus: int = 50_000):
+    tidy_load = loading.wide_load_to_tidy_load(make_wide_load(n_lgus))
+
+    for name, df in [
+        ("object", tidy_load),
+        ("compact", compact_tidy_dtypes(tidy_load)),
+    ]:
+        mb = df.memory_usage(deep=True).sum() / 1e6
+        print(f"tidy load {name} dtypes ({n_lgus} lgus): {mb:.1f} MB")
+
+
+def bench_load_to_downstream_src_ctrls(n_nodes: int = 20_000, number: int = 3):
+    result_blob = make_result_blob(n_nodes)
+
+    for func in [
+        load_to_downstream_src_ctrls_by_row,
+        loading.load_to_downstream_src_ctrls,
+    ]:
+        t = timeit.timeit(lambda: func(result_blob), number=number) / number
+        print(f"{func.__name__} ({n_nodes} nodes): {t:.4f} seconds")
+
+
+if __name__ == "__main__":
+    bench_wide_load_to_tidy_load()
+    bench_tidy_load_memory()
+    bench_load_to_downstream_src_ctrls()
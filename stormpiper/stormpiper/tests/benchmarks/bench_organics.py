@@ -0,0 +1,92 @@
+"""Benchmarks for the virtual (sediment-bound organics) pocs.
+
+Run with: python -m stormpiper.tests.benchmarks.bench_organics
+"""
+
+import timeit
+
+import numpy
+import pandas
+
+from stormpiper.src import organics
+from stormpiper.tests.benchmarks.bench_loading import make_wide_load
+
+VIRTUAL_POLLUTANT_MAPPER = {
+    "PHE": lambda tss: tss * 1e-6 * 1 * 1,
+    "PYR": lambda tss: tss * 1.9 * 1,
+    "DEHP": lambda tss: tss * 1e-6 * 19.3 * 2.3,
+}
+
+
+def make_wide_results(n_nodes: int = 20_000, seed=42) -> pandas.DataFrame:
+    """Synthetic wide nereid results with the TSS load and concentration columns."""
+
+    rng = numpy.random.default_rng(seed)
+    cols = [
+        f"{poc}_{kind}_{stage}"
+        for poc in ["TSS", "TN", "TP"]
+        for kind in ["load_lbs", "conc_mg/l"]
+        for stage in ["inflow", "removed", "discharged"]
+    ]
+
+    results = pandas.DataFrame({c: rng.random(n_nodes) * 1e3 for c in cols})
+    results.insert(0, "node_id", [f"node_{i}" for i in range(n_nodes)])
+
+    return results
+
+
+def add_virtual_pocs_to_tidy_load_summary_by_poc(load_tidy):
+    """The previous implementation, which queries and copies the TSS rows per poc."""
+
+    tss = load_tidy.query('variable == "TSS"')
+    non_virtual_pocs = load_tidy.query("variable not in @organics.VIRTUAL_POCS")
+
+    if tss.empty:
+        return pandas.DataFrame()
+
+    virtual_pocs = []
+    for poc, func in VIRTUAL_POLLUTANT_MAPPER.items():
+        virtual_poc = tss.assign(variable=poc).assign(value=lambda df: func(df.value))
+        virtual_pocs.append(virtual_poc)
+
+    return pandas.concat([non_virtual_pocs] + virtual_pocs)
+
+
+def add_virtual_pocs_to_wide_load_summary_by_row(results):
+    """The previous implementation, which applies the pocs to each row."""
+
+    tss_cols = [c for c in results.columns if "tss" in c.lower()]
+
+    for poc, func in VIRTUAL_POLLUTANT_MAPPER.items():
+        new_cols = [c.replace("TSS", poc) for c in tss_cols]
+        results[new_cols] = results[tss_cols].apply(func, axis=1, result_type="expand")
+
+    return results
+
+
+def bench_add_virtual_pocs_to_tidy_load_summary(n_lgus: int = 50_000, number: int = 3):
+    load_tidy = make_wide_load(n_lgus).melt(id_vars=["node_id", "epoch"])
+    load_tidy["variable"] = load_tidy["variable"].str.replace("TSS_mcg", "TSS")
+
+    for func in [
+        add_virtual_pocs_to_tidy_load_summary_by_poc,
+        organics.add_virtual_pocs_to_tidy_load_summary,
+    ]:
+        t = timeit.timeit(lambda: func(load_tidy), number=number) / number
+        print(f"{func.__name__} ({n_lgus} lgus): {t:.4f} seconds")
+
+
+def bench_add_virtual_pocs_to_wide_load_summary(n_nodes: int = 20_000, number: int = 3):
+    results = make_wide_results(n_nodes)
+
+    for func in [
+        add_virtual_pocs_to_wide_load_summary_by_row,
+        organics.add_virtual_pocs_to_wide_load_summary,
+    ]:
+        t = timeit.timeit(lambda: func(results.copy()), number=number) / number
+        print(f"{func.__name__} ({n_nodes} nodes): {t:.4f} seconds")
+
+
+if __name__ == "__main__":
+    bench_add_virtual_pocs_to_tidy_load_summary()
+    bench_add_virtual_pocs_to_wide_load_summary()
@@ -0,0 +1,153 @@
+"""Benchmarks for the source control load reductions.
+
+Run with: python -m stormpiper.tests.benchmarks.bench_results
+"""
+
+import timeit
+from typing import Optional
+
+import numpy
+import pandas
+
+from stormpiper.src import results
+from stormpiper.src.utils import compact_tidy_dtypes, match_categorical_dtypes
+
+EPOCHS = ["1980s", "2030s", "2050s", "2080s"]
+POCS = ["TSS", "TN", "TP", "TZn", "TCu", "PHE", "PYR", "DEHP"]
+
+
+def make_src_ctrl_inputs(
+    n_lgus: int = 50_000, n_subbasins: int = 100, n_orders: int = 4, seed=42
+):
+    """Synthetic tidy load with subbasins pre-joined, and upstream source controls
+    for every subbasin and poc with `n_orders` controls each.
+    """
+
+    rng = numpy.random.default_rng(seed)
+
+    node_ids = numpy.array([f"ls_{i}" for i in range(n_lgus)], dtype=object)
+    subbasins = numpy.array([f"SB_{i % n_subbasins}" for i in range(n_lgus)])
+    n = n_lgus * len(EPOCHS) * len(POCS)
+
+    load = pandas.DataFrame(
+        {
+            "node_id": numpy.tile(node_ids, len(EPOCHS) * len(POCS)),
+            "epoch": numpy.tile(numpy.repeat(EPOCHS, n_lgus), len(POCS)),
+            "variable": numpy.repeat(POCS, n_lgus * len(EPOCHS)),
+            "value": rng.random(n) * 1e3,
+            "units": "lbs",
+            "subbasin": numpy.tile(subbasins, len(EPOCHS) * len(POCS)),
+            "basinname": "basin",
+        }
+    )
+
+    src_ctrls = pandas.DataFrame(
+        [
+            {
+                "subbasin": f"SB_{s}",
+                "variable": poc,
+                "order": order,
+                "activity": f"activity_{order}",
+                "direction": "upstream",
+                "percent_reduction": rng.random() * 60,
+            }
+            for s in range(n_subbasins)
+            for poc in POCS
+            for order in range(n_orders)
+        ]
+    )
+
+    return load, src_ctrls
+
+
+def calculate_src_ctrl_percent_reduction_by_order(
+    *,
+    load: pandas.DataFrame,
+    src_ctrls: pandas.DataFrame,
+    direction: Optional[str] = "upstream",
+):
+    """The previous implementation, which merges each order with the one before."""
+
+    src_ctrl_directional = (
+        src_ctrls.query("direction==@direction")
+        .loc[
+            :,
+            [
+                "subbasin",
+                "variable",
+                "order",
+                "activity",
+                "direction",
+                "percent_reduction",
+            ],
+        ]
+        .sort_values(["subbasin", "variable", "order"])
+        .pipe(match_categorical_dtypes, load, ["variable"])
+    )
+
+    df1 = load.merge(src_ctrl_directional, on=["subbasin", "variable"]).sort_values(
+        ["node_id", "epoch", "variable", "order"]
+    )
+
+    df1_ck = df1.groupby(
+        ["node_id", "epoch", "variable", "order"], observed=True
+    ).count()
+
+    assert all(df1_ck.max(axis=1) <= 1), df1.sort_values(
+        ["node_id", "epoch", "variable", "order"]
+    ).to_json(orient="records", indent=2)
+
+    df2 = []
+    orders = sorted(df1["order"].unique())
+    for i, order in enumerate(orders):
+
+        _df = df1.query("order == @order")
+
+        col = "value"
+        if i > 0:
+            prev_order = orders[i - 1]
+            col = "value_remaining"
+            columns = ["node_id", "epoch", "variable"]
+
+            _df = _df.merge(
+                df2[prev_order].reindex(columns=columns + [col]), on=columns, how="left"
+            )
+
+        _df = _df.assign(
+            value_remaining_prev=lambda df: df[col].fillna(df["value"])
+        ).assign(
+            value_remaining=lambda df: df["value_remaining_prev"]
+            * (1 - (df["percent_reduction"] / 100))
+        )
+
+        df2.append(_df)
+
+    df = (
+        pandas.concat(df2)
+        .sort_values(["node_id", "epoch", "variable", "order"])
+        .assign(
+            load_reduced=lambda df: df["value_remaining_prev"] - df["value_remaining"]
+        )
+        .reset_index(drop=True)
+        .assign(id=lambda df: df.index.values)
+    )
+    return df
+
+
+def bench_calculate_src_ctrl_percent_reduction(n_lgus: int = 50_000, number: int = 3):
+    load, src_ctrls = make_src_ctrl_inputs(n_lgus)
+    load = compact_tidy_dtypes(load)
+
+    for func in [
+        calculate_src_ctrl_percent_reduction_by_order,
+        results.calculate_src_ctrl_percent_reduction,
+    ]:
+        t = (
+            timeit.timeit(lambda: func(load=load, src_ctrls=src_ctrls), number=number)
+            / number
+        )
+        print(f"{func.__name__} ({n_lgus} lgus): {t:.4f} seconds")
+
+
+if __name__ == "__main__":
+    bench_calculate_src_ctrl_percent_reduction()
@@ -0,0 +1,64 @@
+"""Benchmarks for the what-if scenario solve.
+
+Run with: python -m stormpiper.tests.benchmarks.bench_scenario
+"""
+
+import timeit
+
+import pandas
+
+from stormpiper.core.context import get_context
+from stormpiper.src import scenario, solve_structural_wq
+from stormpiper.tests.benchmarks.bench_solve_structural_wq import (
+    make_watershed_frames,
+)
+
+
+def make_scenario_inputs(n_facilities: int = 3000):
+    """Synthetic scenario inputs, with the full solve as the cached results."""
+
+    edge_list, loading, tmnt_facilities = make_watershed_frames(n_facilities)
+    met = pandas.DataFrame(
+        dict(epoch=["1980s"], design_storm_precip_depth_inches=[0.652])
+    )
+
+    inputs = dict(
+        edge_list=edge_list,
+        tmnt_facilities=tmnt_facilities,
+        met=met,
+        loading=loading,
+        epochs=["1980s"],
+        context=get_context(),
+    )
+    inputs["cached_results"] = solve_structural_wq.solve_wq_epochs(**inputs, workers=1)
+
+    return inputs
+
+
+def bench_solve_scenario(n_facilities: int = 3000, number: int = 3):
+    inputs = make_scenario_inputs(n_facilities)
+    overrides = {"F0": {"area_sqft": 2000}}
+
+    def full():
+        solve_structural_wq.solve_wq_epochs(
+            edge_list=inputs["edge_list"],
+            met=inputs["met"],
+            loading=inputs["loading"],
+            tmnt_facilities=scenario.apply_facility_overrides(
+                inputs["tmnt_facilities"], overrides
+            ),
+            epochs=inputs["epochs"],
+            context=inputs["context"],
+            workers=1,
+        )
+
+    def incremental():
+        scenario.solve_scenario(overrides=overrides, inputs=inputs, workers=1)
+
+    for func in [full, incremental]:
+        t = timeit.timeit(func, number=number) / number
+        print(f"{func.__name__} ({n_facilities} facilities): {t:.4f} seconds")
+
+
+if __name__ == "__main__":
+    bench_solve_scenario()
@@ -0,0 +1,176 @@
+"""Benchmarks for the solve_structural_wq pre-processing.
+
+Run with: python -m stormpiper.tests.benchmarks.bench_solve_structural_wq
+"""
+
+import timeit
+from typing import Any, Dict, Hashable, List
+
+import networkx as nx
+import numpy
+import pandas
+from nereid.src.network.utils import nxGraph_to_dict
+
+from stormpiper.src import solve_structural_wq
+
+POCS = ["TSS", "TN", "TP", "TCu", "TZn", "PHE", "PYR", "DEHP"]
+
+
+def make_watershed_frames(
+    n_facilities: int = 3000, n_subbasins: int = 300, n_basins: int = 10, seed=42
+):
+    """Synthetic graph_edge, loading and facility frames with the same topology as
+    `graph.build_edge_list`: lgu -> facility -> SB_ -> B_ -> PUGET_SOUND
+    """
+
+    rng = numpy.random.default_rng(seed)
+    rows = []
+    for f in range(n_facilities):
+        sb = rng.integers(n_subbasins)
+        for d in range(rng.integers(1, 3)):
+            rows.append(
+                dict(source=f"D{f}-{d}_SB_{sb}", target=f"F{f}", ntype="land_surface")
+            )
+        rows.append(dict(source=f"F{f}", target=f"SB_{sb}", ntype="tmnt_structural"))
+
+    for sb in range(n_subbasins):
+        rows.append(
+            dict(source=f"SB_{sb}", target=f"B_{sb % n_basins}", ntype="land_surface")
+        )
+
+    for b in range(n_basins):
+        rows.append(dict(source=f"B_{b}", target="PUGET_SOUND", ntype="land_surface"))
+
+    edge_list = (
+        pandas.DataFrame(rows)
+        .assign(subbasin="sb", basinname="basin")
+        .reset_index(drop=True)
+        .assign(id=lambda df: df.index + 1)
+    )
+
+    ls = edge_list.loc[~edge_list["source"].str.match(r"^(F|B_)"), "source"]
+    n = len(ls)
+    loading = pandas.DataFrame(
+        dict(
+            node_id=ls.to_numpy(),
+            epoch="1980s",
+            area_acres=rng.random(n),
+            eff_area_acres=rng.random(n),
+            runoff_volume_cuft=rng.random(n),
+            **{f"{p}_load_lbs": rng.random(n) for p in POCS},
+            **{f"{p}_conc_mg/l": rng.random(n) for p in POCS},
+        )
+    ).assign(node_type="land_surface")
+    loading.loc[rng.random(n) > 0.8, "TN_load_lbs"] = numpy.nan
+
+    tmnt_facilities = pandas.DataFrame(
+        dict(
+            node_id=[f"F{f}" for f in range(n_facilities)],
+            facility_type="bioretention",
+            ref_data_key="1980s",
+            design_storm_depth_inches=0.652,
+            area_sqft=rng.random(n_facilities) * 1000,
+            depth_ft=numpy.where(rng.random(n_facilities) > 0.5, 1.0, numpy.nan),
+            hsg=None,
+        )
+    )
+
+    return edge_list, loading, tmnt_facilities
+
+
+def init_graph_from_df(*, edge_list: pandas.DataFrame) -> nx.DiGraph:
+
+    g = nx.from_pandas_edgelist(edge_list, create_using=nx.DiGraph)
+    edge_data = {
+        dct.get("source"): {k: v for k, v in dct.to_dict().items() if k != "id"}
+        for i, dct in edge_list.iterrows()
+    }
+    nx.set_node_attributes(g, edge_data)
+
+    return g
+
+
+def init_land_surface_loading_node_data_from_df(
+    *, df: pandas.DataFrame
+) -> Dict[str, Dict[Hashable, Any]]:
+    """pre filter for epoch"""
+    ls_data = {
+        str(dct.get("node_id", "")): {
+            k: v for k, v in dct.to_dict().items() if k != "node_id" and pandas.notna(v)
+        }
+        for _, dct in df.iterrows()
+    }
+
+    return ls_data
+
+
+def init_treatment_facilities_from_df(
+    *, df: pandas.DataFrame
+) -> List[Dict[Hashable, Any]]:
+    treatment_facilities_list = [row.dropna().to_dict() for _, row in df.iterrows()]
+    return treatment_facilities_list
+
+
+def init_watershed_from_df(*, edge_list, loading, tmnt_facilities) -> Dict[str, Any]:
+    """The previous row-wise construction of the nereid watershed, kept as the
+    reference for `solve_structural_wq.build_watershed_from_df`.
+    """
+
+    loading_data = init_land_surface_loading_node_data_from_df(df=loading)
+    treatment_facilities = init_treatment_facilities_from_df(df=tmnt_facilities)
+
+    # make a fresh graph
+    g = init_graph_from_df(edge_list=edge_list)
+
+    # set loading data
+    nx.set_node_attributes(g, loading_data)
+
+    # prep for nereid call
+
+    ## serialise the graph with data
+    graph = nxGraph_to_dict(g)
+    watershed = dict(graph=graph, treatment_facilities=treatment_facilities)
+
+    return watershed
+
+
+def bench_watershed_construction(number: int = 3):
+    edge_list, loading, tmnt_facilities = make_watershed_frames()
+    kwargs = dict(edge_list=edge_list, loading=loading, tmnt_facilities=tmnt_facilities)
+
+    for func in [
+        init_watershed_from_df,
+        solve_structural_wq.build_watershed_from_df,
+    ]:
+        t = timeit.timeit(lambda: func(**kwargs), number=number) / number
+        print(f"{func.__name__}: {t:.4f} seconds")
+
+
+def bench_prepared_watershed(number: int = 3, epochs: int = 4):
+    edge_list, loading, tmnt_facilities = make_watershed_frames()
+
+    def per_epoch():
+        for _ in range(epochs):
+            solve_structural_wq.build_watershed_from_df(
+                edge_list=edge_list,
+                loading=loading,
+                tmnt_facilities=tmnt_facilities,
+            )
+
+    def prepared_once():
+        prepared = solve_structural_wq.PreparedWatershed(
+            edge_list=edge_list, tmnt_facilities=tmnt_facilities
+        )
+        for _ in range(epochs):
+            prepared.watershed(
+                loading=loading, ref_data_key="1980s", design_storm_depth_inches=0.652
+            )
+
+    for func in [per_epoch, prepared_once]:
+        t = timeit.timeit(func, number=number) / number
+        print(f"{func.__name__} ({epochs} epochs): {t:.4f} seconds")
+
+
+if __name__ == "__main__":
+    bench_watershed_construction()
+    bench_prepared_watershed()
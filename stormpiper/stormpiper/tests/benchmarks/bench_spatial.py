@@ -0,0 +1,104 @@
+"""Benchmarks for the lgu overlay rodeo.
+
+Run with: python -m stormpiper.tests.benchmarks.bench_spatial
+"""
+
+import timeit
+from functools import partial
+
+import geopandas
+import numpy
+from shapely.geometry import Point, box
+
+from stormpiper.src.tmnt import spatial
+
+
+def make_overlay_inputs(n_subbasins: int = 400, n_delineations: int = 4_000, seed=42):
+    """Synthetic subbasins on a square grid of 1000 ft cells, and round
+    delineations that overlap each other, straddle subbasin edges and spill past
+    the edge of the grid.
+    """
+
+    rng = numpy.random.default_rng(seed)
+    side = int(numpy.ceil(numpy.sqrt(n_subbasins)))
+    size = 1000.0
+
+    subbasins = geopandas.GeoDataFrame(
+        {
+            "subbasin": [f"{i}" for i in range(n_subbasins)],
+            "basinname": [f"basin_{i // side}" for i in range(n_subbasins)],
+        },
+        geometry=[
+            box(x * size, y * size, (x + 1) * size, (y + 1) * size)
+            for x, y in (divmod(i, side) for i in range(n_subbasins))
+        ],
+        crs=2927,
+    )
+
+    xy = rng.uniform(-size / 2, side * size + size / 2, size=(n_delineations, 2))
+    radius = rng.uniform(20, 400, size=n_delineations)
+    delineations = geopandas.GeoDataFrame(
+        {
+            "node_id": [f"delin_{i}" for i in range(n_delineations)],
+            "altid": [f"fac_{i}" for i in range(n_delineations)],
+            "relid": [f"fac_{i}" for i in range(n_delineations)],
+        },
+        geometry=[Point(x, y).buffer(r) for (x, y), r in zip(xy, radius)],
+        crs=2927,
+    )
+
+    return delineations, subbasins
+
+
+def overlay_rodeo_citywide(*, delineations, subbasins):
+    """The previous implementation, which runs one citywide union overlay."""
+
+    out = (
+        geopandas.overlay(delineations, subbasins, how="union", keep_geom_type=True)  # type: ignore
+        .assign(subbasin=lambda df: df["subbasin"].fillna("None").astype(str))
+        .assign(basinname=lambda df: df["basinname"].fillna("None").astype(str))
+        .assign(
+            node_id=lambda df: numpy.where(
+                df["node_id"].isna(),
+                "SB_" + df["subbasin"],
+                df["node_id"] + "_SB_" + df["subbasin"],
+            )
+        )
+        .loc[lambda df: df.geometry.area > 1.0]
+        .reindex(
+            columns=[
+                "node_id",
+                "altid",
+                "relid",
+                "subbasin",
+                "basinname",
+                "geometry",
+            ]
+        )
+    )
+
+    return out
+
+
+def bench_overlay_rodeo(
+    n_subbasins: int = 400, n_delineations: int = 4_000, number: int = 1
+):
+    delineations, subbasins = make_overlay_inputs(n_subbasins, n_delineations)
+
+    for name, func in [
+        ("overlay_rodeo_citywide", overlay_rodeo_citywide),
+        ("overlay_rodeo (1 worker)", partial(spatial.overlay_rodeo, workers=1)),
+        ("overlay_rodeo (4 workers)", partial(spatial.overlay_rodeo, workers=4)),
+    ]:
+        t = (
+            timeit.timeit(
+                lambda: func(delineations=delineations, subbasins=subbasins),
+                number=number,
+            )
+            / number
+        )
+        print(f"{name} ({n_delineations} delineations): {t:.4f} seconds")
+
+
+if __name__ == "__main__":
+    bench_overlay_rodeo()
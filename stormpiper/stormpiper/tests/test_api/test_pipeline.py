@@ -0,0 +1,24 @@
+def test_get_pipeline_runs(admin_client):
+    response = admin_client.get(
+        "/api/rest/pipeline_run/",
+        params={"task": "delete_and_refresh_result_table"},
+    )
+    assert response.status_code == 200, response.content
+
+    runs = response.json()
+    solved = next(r for r in runs if not r["cache_hit"])
+
+    stages = {s["stage"] for s in solved["stages"]}
+    assert {"read_inputs", "solve_watershed", "write_results"} <= stages
+
+    epochs = {s["epoch"] for s in solved["stages"] if s["stage"] == "solve_watershed"}
+    assert len(epochs) > 1
+
+    response = admin_client.get(f"/api/rest/pipeline_run/{runs[0]['id']}")
+    assert response.status_code == 200, response.content
+    assert response.json()["id"] == runs[0]["id"]
+
+
+def test_get_pipeline_runs_requires_admin(client):
+    response = client.get("/api/rest/pipeline_run/")
+    assert response.status_code == 401, response.content
@@ -0,0 +1,52 @@
+from io import BytesIO
+
+import pandas
+import pytest
+
+
+@pytest.mark.parametrize(
+    "blob, exp",
+    [
+        ({"tmnt_facility_overrides": {"SWFA-100018": {"area_sqft": 2000}}}, 200),
+        ({"tmnt_facility_overrides": {"not-a-facility": {"area_sqft": 2000}}}, 404),
+        (
+            {
+                "tmnt_facility_overrides": {"SWFA-100018": {"area_sqft": 2000}},
+                "epochs": ["not-an-epoch"],
+            },
+            422,
+        ),
+    ],
+)
+def test_solve_scenario_api_response(client, blob, exp):
+    response = client.post("/api/rpc/solve_scenario", json=blob)
+    assert response.status_code == exp, response.content
+
+
+def test_solve_scenarios_api_response(client):
+    blob = {
+        "scenarios": [
+            {"SWFA-100018": {"area_sqft": 1000}},
+            {"SWFA-100018": {"area_sqft": 2000}},
+        ],
+        "epochs": ["1980s"],
+    }
+    response = client.post("/api/rpc/solve_scenarios", json=blob)
+    assert response.status_code == 200, response.content
+
+    results = pandas.read_parquet(BytesIO(response.content))
+    assert set(results.index.get_level_values("scenario")) == {0, 1}
+    assert float(response.headers["X-Scenarios-Per-Second"]) > 0
+
+
+@pytest.mark.parametrize(
+    "blob, exp",
+    [
+        ({"scenarios": []}, 422),
+        ({"scenarios": [{"not-a-facility": {"area_sqft": 2000}}]}, 404),
+        ({"scenarios": [{"SWFA-100018": {}}], "epochs": ["not-an-epoch"]}, 422),
+    ],
+)
+def test_solve_scenarios_api_errors(client, blob, exp):
+    response = client.post("/api/rpc/solve_scenarios", json=blob)
+    assert response.status_code == exp, response.content
@@ -1,5 +1,9 @@
 import pytest
 
+import stormpiper.bg_worker as bg
+from stormpiper.api.endpoints.tmnt_attr import get_modeling_fields
+from stormpiper.connections import arcgis
+
 from .. import utils as test_utils
 
 
@@ -59,3 +63,34 @@ def test_npv_api_response_altid(client, altid, blob, exp_npv):
         assert npv is None
     else:
         assert (abs(exp_npv - npv) / exp_npv) < 1e-6, (npv, exp_npv)
+
+
+@pytest.mark.parametrize("modifies_modeling_data", [True, False])
+def test_patch_tmnt_attr_refreshes_downstream_results(
+    client, monkeypatch, modifies_modeling_data
+):
+    calls = []
+    monkeypatch.setattr(
+        bg.refresh_result_table_for_nodes,
+        "apply_async",
+        lambda args=(), **kwargs: calls.append(args),
+    )
+
+    altid = "SWFA-100018"
+    route = f"/api/rest/tmnt_attr/{altid}"
+    attr = client.get(route).json()
+
+    if modifies_modeling_data:
+        # re-submit the facility's own modeling data
+        modeling_fields = get_modeling_fields()
+        blob = {k: v for k, v in attr.items() if k in modeling_fields and v is not None}
+    else:
+        blob = {"capital_cost": attr.get("capital_cost")}
+
+    response = client.patch(route, json=blob)
+    assert response.status_code < 400, response.content
+
+    if modifies_modeling_data:
+        assert calls == [([arcgis.facility_node_id(altid)],)]
+    else:
+        assert calls == []
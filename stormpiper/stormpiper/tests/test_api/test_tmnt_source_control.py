@@ -0,0 +1,37 @@
+import stormpiper.bg_worker as bg
+
+
+def test_tmnt_source_control_changes_refresh_subbasins(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        bg.refresh_src_ctrl_tables_for_subbasins,
+        "apply_async",
+        lambda args=(), **kwargs: calls.append(args),
+    )
+
+    route = "/api/rest/tmnt_source_control"
+    blob = {
+        "activity": "test",
+        "subbasin": "test",
+        "direction": "Upstream",
+        "order": 0,
+        "variable": "tss",
+        "percent_reduction": 50,
+    }
+
+    response = client.post(route, json=blob)
+    assert response.status_code < 400, response.content
+    id = response.json()["id"]
+
+    # nothing changed, so nothing is refreshed
+    response = client.patch(f"{route}/{id}", json={"percent_reduction": 50})
+    assert response.status_code < 400, response.content
+
+    # moving the control refreshes the old and the new subbasin
+    response = client.patch(f"{route}/{id}", json={"subbasin": "test2"})
+    assert response.status_code < 400, response.content
+
+    response = client.delete(f"{route}/{id}")
+    assert response.status_code < 400, response.content
+
+    assert calls == [(["test"],), (["test", "test2"],), (["test2"],)]
@@ -0,0 +1,48 @@
+import pandas
+
+from stormpiper.earth_engine import loading
+
+
+def _feature(i, n_coords=4):
+    return {
+        "type": "Feature",
+        "properties": {"node_id": f"ls_{i}"},
+        "geometry": {"type": "Polygon", "coordinates": [[[0.0, 0.0]] * n_coords]},
+    }
+
+
+def test_chunk_features():
+    features = [_feature(i) for i in range(10)]
+
+    chunks = loading.chunk_features(features, max_features=4, max_bytes=1_000_000)
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert [f for c in chunks for f in c] == features
+
+    big = _feature(10, n_coords=1000)
+    chunks = loading.chunk_features(
+        features[:2] + [big] + features[2:4], max_features=100, max_bytes=1000
+    )
+    assert [len(c) for c in chunks] == [2, 1, 2]
+
+
+def test_tidy_epochs():
+    df = pandas.DataFrame(
+        {
+            "node_id": ["a", "b"],
+            "1980s__runoff_mm_per_year_x_m2": [1.0, 2.0],
+            "1980s__TSS_mcg_per_L_x_mm_per_year_x_m2": [3.0, 4.0],
+            "2030s__runoff_mm_per_year_x_m2": [5.0, 6.0],
+            "2030s__TSS_mcg_per_L_x_mm_per_year_x_m2": [7.0, 8.0],
+        }
+    )
+
+    res = loading._tidy_epochs(df, join_id="node_id")
+
+    assert list(res.columns) == [
+        "node_id",
+        "epoch",
+        "runoff_mm_per_year_x_m2",
+        "TSS_mcg_per_L_x_mm_per_year_x_m2",
+    ]
+    assert res["epoch"].tolist() == ["1980s", "1980s", "2030s", "2030s"]
+    assert res["TSS_mcg_per_L_x_mm_per_year_x_m2"].tolist() == [3.0, 4.0, 7.0, 8.0]
@@ -0,0 +1,39 @@
+import shutil
+
+from stormpiper.core import context
+from stormpiper.core.config import settings
+
+
+def test_get_context_is_cached():
+    version = context.get_context_version()
+
+    assert context.get_context() is context.get_context()
+    assert context.get_context_version() == version
+
+
+def test_context_version_tracks_file_contents(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_CHECK_SECONDS", 0)
+    datadir = tmp_path / "project_data"
+    shutil.copytree(context.DATA_PATH, datadir)
+    version, _ = context._load_context(datadir)
+
+    config = datadir / context.STATE / context.REGION / "config.yml"
+    config.write_text(config.read_text())  # new mtime, same contents
+    assert context._load_context(datadir)[0] == version
+
+    config.write_text(config.read_text() + "\n# edited\n")
+    assert context._load_context(datadir)[0] != version
+
+
+def test_context_files_are_checked_at_most_every_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_CHECK_SECONDS", 3600)
+    datadir = tmp_path / "project_data"
+    shutil.copytree(context.DATA_PATH, datadir)
+    version, _ = context._load_context(datadir)
+
+    config = datadir / context.STATE / context.REGION / "config.yml"
+    config.write_text(config.read_text() + "\n# edited\n")
+    assert context._load_context(datadir)[0] == version
+
+    monkeypatch.setattr(settings, "CONTEXT_CHECK_SECONDS", 0)
+    assert context._load_context(datadir)[0] != version
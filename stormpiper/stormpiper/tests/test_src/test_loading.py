@@ -0,0 +1,186 @@
+import geopandas
+import numpy
+import pandas
+from shapely.geometry import box
+
+from stormpiper.database.connection import engine
+from stormpiper.src import loading
+from stormpiper.src.organics import VIRTUAL_POCS
+from stormpiper.src.utils import (
+    compact_tidy_dtypes,
+    hash_geometries,
+    unpack_results_blob,
+)
+from stormpiper.tests.benchmarks.bench_loading import (
+    load_to_downstream_src_ctrls_by_row,
+    make_result_blob,
+    make_wide_load,
+    unpack_results_blob_by_row,
+    wide_load_to_tidy_load_by_row,
+)
+
+
+def test_parse_load_column():
+    assert loading._parse_load_column("TotalSuspendedSolids_mcg") == ("TSS", "mcg")
+    assert loading._parse_load_column("runoff_L") == ("runoff", "L")
+    assert loading._parse_load_column("not_a_poc_mcg") == ("not_a_poc", "mcg")
+
+
+def test_wide_load_to_tidy_load_matches_by_row():
+    wide_load = make_wide_load(n_lgus=100)
+    wide_load.loc[::7, "TotalCopper_mcg"] = numpy.nan
+
+    exp = wide_load_to_tidy_load_by_row(wide_load)
+    res = loading.wide_load_to_tidy_load(wide_load)
+
+    pandas.testing.assert_frame_equal(exp, res)
+
+
+def test_apply_tidy_load_reduction_compact_dtypes():
+    load = loading.wide_load_to_tidy_load(make_wide_load(n_lgus=20)).reset_index(
+        drop=True
+    )
+    load_reduced = (
+        load.query('variable != "runoff"')
+        .sample(frac=0.5, random_state=42)
+        .assign(load_reduced=lambda df: df["value"] * 0.1)
+        .reset_index(drop=True)
+    )
+
+    exp = loading.apply_tidy_load_reduction(load=load, load_reduced=load_reduced)
+    res = loading.apply_tidy_load_reduction(
+        load=compact_tidy_dtypes(load), load_reduced=compact_tidy_dtypes(load_reduced)
+    )
+
+    assert isinstance(res["node_id"].dtype, pandas.CategoricalDtype)
+    pandas.testing.assert_frame_equal(
+        exp, res, check_categorical=False, check_dtype=False
+    )
+
+    exp_wide = loading._prep_00_loading_tidy_to_wide(exp.query('epoch == "1980s"'))
+    res_wide = loading._prep_00_loading_tidy_to_wide(res.query('epoch == "1980s"'))
+
+    pandas.testing.assert_frame_equal(
+        exp_wide, res_wide, check_categorical=False, check_dtype=False
+    )
+
+
+def test_unpack_results_blob_matches_by_row():
+    result_blob = make_result_blob(n_nodes=30)
+
+    exp = unpack_results_blob_by_row(result_blob)
+    res = unpack_results_blob(result_blob)
+
+    assert list(res.columns[:2]) == ["node_id", "epoch"]
+    pandas.testing.assert_frame_equal(
+        exp, res.reindex(columns=exp.columns), check_dtype=False
+    )
+
+
+def test_load_to_downstream_src_ctrls_matches_by_row():
+    result_blob = make_result_blob(n_nodes=30)
+
+    exp = load_to_downstream_src_ctrls_by_row(result_blob)
+    res = loading.load_to_downstream_src_ctrls(result_blob)
+
+    assert set(res["variable"]) >= {"runoff", "TSS", "DEHP"}
+    pandas.testing.assert_frame_equal(exp, res, check_dtype=False)
+
+
+def _zonal_stats_by_area(*, lgu_boundary, **kwargs):
+    area = lgu_boundary.geometry.area.to_numpy()
+    return pandas.DataFrame(
+        {
+            "node_id": numpy.tile(lgu_boundary["node_id"].to_numpy(), 2),
+            "epoch": numpy.repeat(["1980s", "2030s"], len(area)),
+            "runoff_L": numpy.tile(area, 2) * 100,
+            "TotalSuspendedSolids_mcg": numpy.tile(area, 2) * 200,
+            "TotalNitrogen_mcg": numpy.tile(area, 2) * 300,
+        }
+    )
+
+
+def test_compute_loading_cached(monkeypatch):
+    monkeypatch.setattr(loading, "compute_loading_zonal_stats", _zonal_stats_by_area)
+    kwargs = dict(runoff_path="runoff.tif", coc_path="coc.tif", backend="raster")
+    keys = ["node_id", "epoch", "variable"]
+    zones = geopandas.GeoDataFrame(
+        {"node_id": ["A", "B", "C"]},
+        geometry=[box(0, 0, 5, 10), box(5, 5, 10, 10), box(20, 20, 30, 30)],
+        crs=2927,
+    )
+    empty = pandas.DataFrame(
+        columns=["geom_hash", "epoch", "variable", "value", "units"]
+    )
+
+    exp = loading.compute_loading(lgu_boundary=zones, **kwargs)
+    res, cache = loading.compute_loading_cached(
+        lgu_boundary=zones, cache=empty, **kwargs
+    )
+
+    assert cache["geom_hash"].nunique() == 3
+    assert set(cache["runoff_path"]) == {"runoff.tif"}
+
+    # only the zonal stats pocs are cached, the virtual pocs are derived from them
+    assert not set(cache["variable"]) & set(VIRTUAL_POCS)
+    assert set(VIRTUAL_POCS) <= set(res["variable"])
+    pandas.testing.assert_frame_equal(
+        exp.sort_values(keys).reset_index(drop=True),
+        res.sort_values(keys).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+    # C moved onto B's geometry and D is new, so only D is computed.
+    moved = geopandas.GeoDataFrame(
+        {"node_id": ["A", "B", "C", "D"]},
+        geometry=[
+            box(0, 0, 5, 10),
+            box(5, 5, 10, 10),
+            box(5, 5, 10, 10),
+            box(0, 0, 2, 2),
+        ],
+        crs=2927,
+    )
+    computed = []
+    compute_loading = loading.compute_loading
+    monkeypatch.setattr(
+        loading,
+        "compute_loading",
+        lambda **kw: computed.append(kw["lgu_boundary"]) or compute_loading(**kw),
+    )
+
+    res, new_cache = loading.compute_loading_cached(
+        lgu_boundary=moved, cache=cache, **kwargs
+    )
+
+    assert len(computed) == 1 and computed[0]["node_id"].tolist() == ["D"]
+    assert new_cache["geom_hash"].nunique() == 1
+
+    by_node = res.set_index(keys)["value"].sort_index()
+    assert set(VIRTUAL_POCS) <= set(by_node.loc["D"].index.get_level_values(1))
+    pandas.testing.assert_series_equal(
+        by_node.loc["B"], by_node.loc["C"], check_names=False
+    )
+
+
+def test_prune_lgu_load_cache(db):
+    stale = pandas.DataFrame(
+        dict(
+            geom_hash=["stale"],
+            runoff_path=["runoff.tif"],
+            coc_path=["coc.tif"],
+            epoch=["1980s"],
+            variable=["TSS"],
+            value=[1.0],
+            units=["lbs"],
+        )
+    )
+    stale.to_sql("lgu_load_cache", con=engine, if_exists="append", index=False)
+
+    zones = geopandas.read_postgis("lgu_boundary", con=engine)
+    geom_hashes = hash_geometries(zones.geometry)
+
+    assert loading.prune_lgu_load_cache(geom_hashes=geom_hashes, engine=engine) == 1
+
+    hashes = pandas.read_sql("select geom_hash from lgu_load_cache", con=engine)
+    assert set(hashes["geom_hash"]) <= set(geom_hashes)
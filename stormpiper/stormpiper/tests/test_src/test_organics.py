@@ -0,0 +1,52 @@
+import pandas
+import pytest
+
+from stormpiper.src import organics
+from stormpiper.src.utils import compact_tidy_dtypes
+from stormpiper.tests.benchmarks.bench_organics import (
+    add_virtual_pocs_to_tidy_load_summary_by_poc,
+    add_virtual_pocs_to_wide_load_summary_by_row,
+    make_wide_results,
+)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_add_virtual_pocs_to_tidy_load_summary_matches_by_poc(compact):
+    load_tidy = pandas.DataFrame(
+        {
+            "node_id": ["a", "a", "a", "b", "b"],
+            "epoch": "1980s",
+            "variable": ["TSS", "TN", "PHE", "TSS", "TN"],
+            "value": [10.0, 2.0, 99.0, 20.0, 4.0],
+            "units": "lbs",
+        },
+        index=[5, 6, 7, 8, 9],
+    )
+    if compact:
+        load_tidy = compact_tidy_dtypes(load_tidy)
+
+    exp = add_virtual_pocs_to_tidy_load_summary_by_poc(load_tidy)
+    res = organics.add_virtual_pocs_to_tidy_load_summary(load_tidy)
+
+    # the stale PHE row is replaced and the virtual pocs follow in table order.
+    assert res["variable"].tolist() == ["TSS", "TN", "TSS", "TN"] + [
+        poc for poc in organics.VIRTUAL_POCS for _ in range(2)
+    ]
+    pandas.testing.assert_frame_equal(exp, res)
+
+
+def test_add_virtual_pocs_to_tidy_load_summary_without_tss():
+    load_tidy = pandas.DataFrame({"variable": ["TN"], "value": [1.0]})
+
+    assert organics.add_virtual_pocs_to_tidy_load_summary(load_tidy).empty
+
+
+def test_add_virtual_pocs_to_wide_load_summary_matches_by_row():
+    results = make_wide_results(n_nodes=50)
+
+    exp = add_virtual_pocs_to_wide_load_summary_by_row(results.copy())
+    res = organics.add_virtual_pocs_to_wide_load_summary(results.copy())
+
+    assert list(res.columns) == list(exp.columns)
+    assert "DEHP_conc_mg/l_discharged" in res
+    pandas.testing.assert_frame_equal(exp, res)
@@ -0,0 +1,104 @@
+import geopandas
+import numpy
+import pandas
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from stormpiper.src import loading, raster_loading
+
+FT_TO_M = 1200 / 3937  # EPSG:2927 is in US survey feet
+
+
+def _write_tif(path, bands, names):
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=10,
+        width=10,
+        count=len(bands),
+        dtype="float32",
+        crs="EPSG:2927",
+        transform=from_origin(0, 10, 1, 1),  # 1 ft pixels
+    ) as dst:
+        for i, (band, name) in enumerate(zip(bands, names), start=1):
+            dst.write(numpy.full((10, 10), band, dtype="float32"), i)
+            dst.set_band_description(i, name)
+
+
+@pytest.fixture
+def rasters(tmp_path):
+    runoff_path = tmp_path / "runoff.tif"
+    coc_path = tmp_path / "coc.tif"
+    _write_tif(runoff_path, [100, 200], ["runoff_1980s", "runoff_2030s"])
+    _write_tif(coc_path, [2, 3], ["TotalSuspendedSolids_mcg_per_L", "TotalNitrogen"])
+
+    return str(runoff_path), str(coc_path)
+
+
+@pytest.fixture
+def zones():
+    return geopandas.GeoDataFrame(
+        {"node_id": ["A", "B", "C"]},
+        geometry=[box(0, 0, 5, 10), box(5, 5, 10, 10), box(20, 20, 30, 30)],
+        crs=2927,
+    )
+
+
+@pytest.mark.parametrize("chunk_rows, workers", [(1024, 1), (3, 2)])
+def test_raster_zonal_stats(rasters, zones, chunk_rows, workers):
+    runoff_path, coc_path = rasters
+
+    df = raster_loading.zonal_stats(
+        runoff_path=runoff_path,
+        concentration_path=coc_path,
+        zones=zones,
+        join_id="node_id",
+        chunk_rows=chunk_rows,
+        workers=workers,
+    )
+
+    assert list(df.columns) == [
+        "node_id",
+        "epoch",
+        "runoff_L",
+        "TotalSuspendedSolids_mcg",
+        "TotalNitrogen_mcg",
+    ]
+    assert df["epoch"].tolist() == ["1980s"] * 3 + ["2030s"] * 3
+
+    area_m2 = numpy.array([50, 25, 0] * 2) * FT_TO_M**2
+    runoff_L = area_m2 * numpy.repeat([100, 200], 3)
+
+    numpy.testing.assert_allclose(df["runoff_L"], runoff_L)
+    numpy.testing.assert_allclose(df["TotalSuspendedSolids_mcg"], runoff_L * 2)
+    numpy.testing.assert_allclose(df["TotalNitrogen_mcg"], runoff_L * 3)
+
+
+def test_raster_zonal_stats_mismatched_grids(rasters, zones, tmp_path):
+    runoff_path, _ = rasters
+    coc_path = tmp_path / "coc_offset.tif"
+    with rasterio.open(runoff_path) as src:
+        profile = src.profile
+    profile.update(transform=from_origin(1, 10, 1, 1), count=1)
+    with rasterio.open(coc_path, "w", **profile) as dst:
+        dst.write(numpy.ones((1, 10, 10), dtype="float32"))
+        dst.set_band_description(1, "TotalNitrogen")
+
+    with pytest.raises(ValueError, match="share a crs"):
+        raster_loading.zonal_stats(
+            runoff_path=runoff_path, concentration_path=str(coc_path), zones=zones
+        )
+
+
+def test_compute_loading_zonal_stats_raster_backend(rasters, zones):
+    runoff_path, coc_path = rasters
+
+    df = loading.compute_loading_zonal_stats(
+        lgu_boundary=zones, runoff_path=runoff_path, coc_path=coc_path, backend="raster"
+    )
+    tidy = loading.wide_load_to_tidy_load(df)
+
+    assert {"runoff", "TSS", "TN"} <= set(tidy["variable"])
@@ -0,0 +1,53 @@
+import pandas
+import pytest
+
+from stormpiper.src import results
+from stormpiper.src.utils import compact_tidy_dtypes
+from stormpiper.tests.benchmarks.bench_results import (
+    calculate_src_ctrl_percent_reduction_by_order,
+    make_src_ctrl_inputs,
+)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_calculate_src_ctrl_percent_reduction_matches_by_order(compact):
+    load, src_ctrls = make_src_ctrl_inputs(n_lgus=50, n_subbasins=3)
+    # some loads have no source controls
+    src_ctrls = src_ctrls.query('~(subbasin == "SB_2" and variable == "TN")')
+    if compact:
+        load = compact_tidy_dtypes(load)
+
+    exp = calculate_src_ctrl_percent_reduction_by_order(load=load, src_ctrls=src_ctrls)
+    res = results.calculate_src_ctrl_percent_reduction(load=load, src_ctrls=src_ctrls)
+
+    pandas.testing.assert_frame_equal(exp, res, check_dtype=False)
+
+
+def test_calculate_src_ctrl_percent_reduction_chains_gapped_orders():
+    load = pandas.DataFrame(
+        {
+            "node_id": ["a", "b"],
+            "epoch": "1980s",
+            "variable": "TSS",
+            "value": 100.0,
+            "units": "lbs",
+            "subbasin": ["S1", "S2"],
+            "basinname": "basin",
+        }
+    )
+    src_ctrls = pandas.DataFrame(
+        {
+            "subbasin": ["S1", "S1", "S1", "S2", "S2"],
+            "variable": "TSS",
+            "order": [0, 1, 1_000_000, 0, 1_000_000],
+            "activity": "sweeping",
+            "direction": "upstream",
+            "percent_reduction": [50.0, 50.0, 50.0, 50.0, 50.0],
+        }
+    )
+
+    res = results.calculate_src_ctrl_percent_reduction(load=load, src_ctrls=src_ctrls)
+
+    b = res.query('node_id == "b"')
+    assert b["value_remaining"].tolist() == [50.0, 25.0]
+    assert b["load_reduced"].sum() == 75.0
@@ -0,0 +1,82 @@
+import pandas
+import pytest
+
+from stormpiper.core.exceptions import InvalidEpochs, InvalidOverrides
+from stormpiper.database.connection import engine
+from stormpiper.src import scenario
+
+
+def test_apply_facility_overrides():
+    tmnt_facilities = pandas.DataFrame(
+        dict(node_id=["a", "b"], area_sqft=[100.0, 200.0], depth_ft=[1.0, 1.0])
+    )
+
+    res = scenario.apply_facility_overrides(tmnt_facilities, {"b": {"area_sqft": 400}})
+
+    assert res["area_sqft"].tolist() == [100.0, 400.0]
+    assert tmnt_facilities["area_sqft"].tolist() == [100.0, 200.0]
+
+    with pytest.raises(InvalidOverrides):
+        scenario.apply_facility_overrides(tmnt_facilities, {"c": {"area_sqft": 1}})
+
+    with pytest.raises(InvalidOverrides):
+        scenario.apply_facility_overrides(tmnt_facilities, {"a": {"not_an_attr": 1}})
+
+
+def test_validate_epochs():
+    met = pandas.DataFrame(dict(epoch=["1980s", "2030s"]))
+
+    assert scenario.validate_epochs(["2030s"], met) == ["2030s"]
+    assert scenario.validate_epochs(None, met) is None
+
+    with pytest.raises(InvalidEpochs):
+        scenario.validate_epochs(["1980s", "not-an-epoch"], met)
+
+
+def test_solve_scenario_does_not_change_tables(db):
+    inputs = scenario.load_scenario_inputs(engine=engine)
+    assert scenario.load_scenario_inputs(engine=engine) is inputs
+
+    facility = inputs["tmnt_facilities"].dropna(subset=["area_sqft"]).iloc[0]
+    node_id = facility["node_id"]
+    with engine.begin() as conn:
+        before = pandas.read_sql("select * from result_blob", con=conn)
+
+    res = scenario.solve_scenario(
+        overrides={node_id: {"area_sqft": facility["area_sqft"] * 2}},
+        inputs=inputs,
+        epochs=["1980s"],
+    )
+
+    with engine.begin() as conn:
+        after = pandas.read_sql("select * from result_blob", con=conn)
+
+    assert node_id in set(res["node_id"])
+    assert set(res["epoch"]) == {"1980s"}
+    assert len(res) < len(before)
+    pandas.testing.assert_frame_equal(before, after)
+
+
+def test_solve_scenarios_parallel_matches_serial(db):
+    inputs = scenario.load_scenario_inputs(engine=engine)
+    facility = inputs["tmnt_facilities"].dropna(subset=["area_sqft"]).iloc[0]
+    scenarios = [
+        {facility["node_id"]: {"area_sqft": facility["area_sqft"] * f}}
+        for f in [0.5, 1, 2]
+    ]
+
+    serial, _ = scenario.solve_scenarios(
+        scenarios=scenarios, inputs=inputs, epochs=["1980s"], workers=1
+    )
+    parallel, _ = scenario.solve_scenarios(
+        scenarios=scenarios, inputs=inputs, epochs=["1980s"], workers=2
+    )
+
+    assert serial.index.names == ["scenario", "node_id", "epoch"]
+    assert set(serial.index.get_level_values("scenario")) == {0, 1, 2}
+    pandas.testing.assert_frame_equal(serial, parallel)
+
+
+def test_scenarios_per_second_guards_zero_elapsed():
+    assert scenario.scenarios_per_second(4, 2.0) == 2.0
+    assert scenario.scenarios_per_second(4, 0.0) == float("inf")
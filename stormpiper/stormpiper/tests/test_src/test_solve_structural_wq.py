@@ -0,0 +1,242 @@
+import json
+
+import networkx as nx
+import pandas
+import pytest
+
+from stormpiper.core.context import get_context
+from stormpiper.database.connection import engine
+from stormpiper.src import solve_structural_wq
+from stormpiper.src.utils import unpack_results_blob
+from stormpiper.tests.benchmarks.bench_solve_structural_wq import (
+    init_watershed_from_df,
+)
+
+
+@pytest.fixture(scope="module")
+def solve_inputs(db):
+    with engine.begin() as conn:
+        edge_list = solve_structural_wq.get_graph_edges_from_db(conn)
+        tmnt_facilities = solve_structural_wq.get_tmnt_facilities_from_db(conn)
+        met = pandas.read_sql("met", con=conn)
+        loading = solve_structural_wq.land_surface_load_to_structural_from_db(
+            epoch=None, connectable=conn
+        )
+
+    return dict(
+        edge_list=edge_list,
+        tmnt_facilities=tmnt_facilities,
+        met=met,
+        loading=loading,
+        epochs=list(met.epoch.unique()),
+    )
+
+
+def assert_results_blob_equal(exp, res):
+    """Compares every typed column and every blob value of two result_blob frames,
+    regardless of row order. Blob values are compared with the nulls dropped, since
+    a blob has a key for every result column of the nodes it was solved with.
+    """
+
+    def _sorted(df):
+        return df.sort_values(["node_id", "epoch"]).reset_index(drop=True)
+
+    exp, res = _sorted(exp), _sorted(res)
+    pandas.testing.assert_frame_equal(
+        exp.drop(columns="blob"),
+        res.drop(columns="blob"),
+        check_like=True,
+        check_dtype=False,
+    )
+
+    def _unpack(df):
+        blobs = df["blob"].map(lambda b: {k: v for k, v in b.items() if v is not None})
+        unpacked = unpack_results_blob(df.assign(blob=blobs))
+        return unpacked.reindex(columns=sorted(unpacked.columns))
+
+    pandas.testing.assert_frame_equal(_unpack(exp), _unpack(res), check_dtype=False)
+
+
+def test_solve_wq_epochs_parallel_matches_serial(solve_inputs):
+    serial = solve_structural_wq.solve_wq_epochs(**solve_inputs, workers=1)
+    parallel = solve_structural_wq.solve_wq_epochs(**solve_inputs, workers=2)
+
+    pandas.testing.assert_frame_equal(serial, parallel)
+
+
+def test_plan_incremental_solve(solve_inputs):
+    edge_list = solve_inputs["edge_list"]
+    node_id = solve_inputs["tmnt_facilities"]["node_id"].iloc[0]
+
+    dirty, cached = solve_structural_wq.plan_incremental_solve(
+        node_ids=[node_id], edge_list=edge_list
+    )
+
+    g = nx.from_pandas_edgelist(edge_list, create_using=nx.DiGraph)
+    assert dirty == solve_structural_wq.get_downstream_nodes(g, [node_id])
+    assert not cached & dirty
+    assert all(g.in_degree(n) > 0 for n in cached)
+
+    # the land surfaces that drain to the facility are solved from their loading
+    assert not cached & set(g.predecessors(node_id))
+
+
+def test_solve_wq_epochs_from_upstream_matches_full(solve_inputs):
+    full = solve_structural_wq.solve_wq_epochs(**solve_inputs)
+
+    # the basins and the outfall, from the results of every subbasin
+    g = nx.from_pandas_edgelist(solve_inputs["edge_list"], create_using=nx.DiGraph)
+    node_ids = set(g.predecessors("PUGET_SOUND")) | {"PUGET_SOUND"}
+
+    res = solve_structural_wq.solve_wq_epochs_from_upstream(
+        node_ids=node_ids, upstream_results=full, **solve_inputs
+    )
+
+    assert set(res["node_id"]) == node_ids
+    assert_results_blob_equal(full.loc[full["node_id"].isin(node_ids)], res)
+
+
+def test_solve_wq_epochs_incremental_matches_full(solve_inputs):
+    full = solve_structural_wq.solve_wq_epochs(**solve_inputs)
+
+    node_id = solve_inputs["tmnt_facilities"]["node_id"].iloc[0]
+    incremental = solve_structural_wq.solve_wq_epochs_incremental(
+        node_ids=[node_id], cached_results=full, **solve_inputs
+    )
+
+    g = nx.from_pandas_edgelist(solve_inputs["edge_list"], create_using=nx.DiGraph)
+    downstream = solve_structural_wq.get_downstream_nodes(g, [node_id])
+    assert "PUGET_SOUND" in downstream
+    assert set(incremental["node_id"]) == downstream
+
+    assert_results_blob_equal(full.loc[full["node_id"].isin(downstream)], incremental)
+
+
+def test_build_watershed_from_df_matches_init_watershed_from_df(solve_inputs):
+    kwargs = dict(
+        edge_list=solve_inputs["edge_list"],
+        loading=solve_inputs["loading"].query('epoch=="1980s"'),
+        tmnt_facilities=solve_inputs["tmnt_facilities"],
+    )
+
+    exp = init_watershed_from_df(**kwargs)
+    res = solve_structural_wq.build_watershed_from_df(**kwargs)
+
+    assert json.dumps(exp, default=str) == json.dumps(res, default=str)
+
+
+def test_prepared_watershed_matches_build_watershed_from_df(solve_inputs):
+    prepared = solve_structural_wq.PreparedWatershed(
+        edge_list=solve_inputs["edge_list"],
+        tmnt_facilities=solve_inputs["tmnt_facilities"],
+    )
+
+    for epoch, depth in solve_inputs["met"][
+        ["epoch", "design_storm_precip_depth_inches"]
+    ].itertuples(index=False):
+        loading = solve_inputs["loading"].query("epoch==@epoch")
+        exp = solve_structural_wq.build_watershed_from_df(
+            edge_list=solve_inputs["edge_list"],
+            loading=loading,
+            tmnt_facilities=solve_inputs["tmnt_facilities"]
+            .assign(design_storm_depth_inches=depth)
+            .assign(ref_data_key=epoch),
+        )
+        res = prepared.watershed(
+            loading=loading, ref_data_key=epoch, design_storm_depth_inches=depth
+        )
+
+        assert json.dumps(exp, default=str, sort_keys=True) == json.dumps(
+            res, default=str, sort_keys=True
+        )
+
+
+def test_results_to_result_blob():
+    results = pandas.DataFrame(
+        [
+            {"node_id": "a", "node_type": "land_surface", "TSS_load_lbs_inflow": 1.5},
+            {"node_id": "b", "facility_type": "bioretention", "node_errors": ["e"]},
+        ]
+    )
+
+    res = solve_structural_wq.results_to_result_blob(results)
+
+    assert res.columns.tolist()[:2] == ["node_id", "blob"]
+    assert list(res["blob"][0].keys()) == sorted(results.columns)
+    assert res["blob"][0]["facility_type"] is None
+    assert res["blob"][1]["node_errors"] == ["e"]
+    assert res["TSS_load_lbs_inflow"][0] == 1.5
+
+    no_blob = solve_structural_wq.results_to_result_blob(results, include_blob=False)
+    assert "blob" not in no_blob.columns
+
+
+def test_partition_edge_list_by_basin():
+    edge_list = pandas.DataFrame(
+        [
+            dict(source="a_SB_1", target="SB_1"),
+            dict(source="SB_1", target="B_1"),
+            dict(source="SB_2", target="B_2"),
+            dict(source="B_1", target="PUGET_SOUND"),
+            dict(source="B_2", target="PUGET_SOUND"),
+            dict(source="x", target="y"),
+        ]
+    )
+
+    partitions = solve_structural_wq.partition_edge_list_by_basin(edge_list)
+
+    assert [sorted(p["source"]) for p in partitions] == [
+        ["B_1", "SB_1", "a_SB_1"],
+        ["B_2", "SB_2"],
+        ["x"],
+    ]
+
+
+def test_solve_wq_epochs_by_basin_matches_full(solve_inputs):
+    full = solve_structural_wq.solve_wq_epochs(**solve_inputs)
+
+    spans = []
+    by_basin = solve_structural_wq.solve_wq_epochs_by_basin(
+        **solve_inputs, workers=2, spans=spans
+    )
+
+    assert len(full) == len(by_basin)
+    assert_results_blob_equal(full, by_basin)
+
+    stages = {s["stage"] for s in spans}
+    assert {"solve_basins", "solve_watershed", "solve_outfall"} <= stages
+    basins = {s["basin"] for s in spans if s["stage"] == "solve_watershed"}
+    assert len(basins) > 1
+
+
+def test_solve_wq_epochs_by_basin_without_blob(solve_inputs):
+    full = solve_structural_wq.solve_wq_epochs(**solve_inputs, include_blob=False)
+    by_basin = solve_structural_wq.solve_wq_epochs_by_basin(
+        **solve_inputs, workers=1, include_blob=False
+    )
+
+    assert "blob" not in by_basin.columns
+    pandas.testing.assert_frame_equal(
+        full.sort_values(["node_id", "epoch"]).reset_index(drop=True),
+        by_basin.sort_values(["node_id", "epoch"]).reset_index(drop=True),
+        check_like=True,
+        check_dtype=False,
+    )
+
+
+def test_hash_solve_inputs_ignores_row_and_column_order():
+    df = pandas.DataFrame(dict(node_id=["a", "b"], area_acres=[1.0, None]))
+
+    h = solve_structural_wq.hash_solve_inputs(context_version="v", loading=df)
+    shuffled = df.iloc[::-1][["area_acres", "node_id"]]
+
+    assert h == solve_structural_wq.hash_solve_inputs(
+        context_version="v", loading=shuffled
+    )
+    assert h != solve_structural_wq.hash_solve_inputs(context_version="w", loading=df)
+    assert h != solve_structural_wq.hash_solve_inputs(
+        context_version="v", loading=df.assign(area_acres=[1.0, 2.0])
+    )
+    assert h != solve_structural_wq.hash_solve_inputs(
+        context_version="v", by_basin=True, loading=df
+    )
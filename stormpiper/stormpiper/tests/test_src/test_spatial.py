@@ -0,0 +1,130 @@
+import multiprocessing
+
+import geopandas
+import pandas
+import pytest
+from geopandas.testing import assert_geodataframe_equal
+from shapely.geometry import box
+
+from stormpiper.src.tmnt import spatial
+from stormpiper.tests.benchmarks.bench_spatial import (
+    make_overlay_inputs,
+    overlay_rodeo_citywide,
+)
+from stormpiper.tests.data._base import datadir
+
+
+@pytest.mark.parametrize("workers, n_partitions", [(1, 1), (1, 5), (2, None)])
+def test_overlay_rodeo_matches_citywide(workers, n_partitions):
+    delineations, subbasins = make_overlay_inputs(n_subbasins=16, n_delineations=120)
+
+    exp = overlay_rodeo_citywide(delineations=delineations, subbasins=subbasins)
+    res = spatial.overlay_rodeo(
+        delineations=delineations,
+        subbasins=subbasins,
+        workers=workers,
+        n_partitions=n_partitions,
+    )
+
+    # some lgus are outside every subbasin and some subbasins have no delineations.
+    assert (res["subbasin"] == "None").any()
+    assert res["node_id"].str.startswith("SB_").any()
+    assert_geodataframe_equal(exp, res)
+
+
+def test_overlay_rodeo_matches_citywide_test_data():
+    delineations = geopandas.read_file(datadir / "tmnt_facility_delineation.geojson")
+    subbasins = geopandas.read_file(datadir / "subbasin.geojson").rename_geometry(
+        "geom"
+    )
+
+    exp = overlay_rodeo_citywide(
+        delineations=delineations, subbasins=subbasins.rename_geometry("geometry")
+    )
+    res = spatial.overlay_rodeo(
+        delineations=delineations, subbasins=subbasins, n_partitions=7
+    )
+
+    assert_geodataframe_equal(exp, res)
+
+
+def _overlay_in_daemon(queue, kwargs):
+    try:
+        queue.put(spatial.overlay_rodeo(**kwargs))
+    except Exception as e:
+        queue.put(e)
+
+
+def test_overlay_rodeo_workers_in_daemon_process():
+    # celery prefork workers are daemon processes, which can't start process pools.
+    delineations, subbasins = make_overlay_inputs(n_subbasins=4, n_delineations=20)
+    kwargs = dict(delineations=delineations, subbasins=subbasins, workers=2)
+
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    p = ctx.Process(target=_overlay_in_daemon, args=(queue, kwargs), daemon=True)
+    p.start()
+    res = queue.get(timeout=60)
+    p.join()
+
+    assert not isinstance(res, Exception), res
+    assert_geodataframe_equal(spatial.overlay_rodeo(**{**kwargs, "workers": 1}), res)
+
+
+def test_overlay_rodeo_changes_matches_full_overlay():
+    delineations, subbasins = make_overlay_inputs(n_subbasins=16, n_delineations=120)
+    lgu_boundary = spatial.overlay_rodeo(delineations=delineations, subbasins=subbasins)
+    previous_inputs = spatial.overlay_input_hashes(
+        delineations=delineations, subbasins=subbasins
+    )
+
+    # reshape, add and remove a delineation, and move a subbasin's edge.
+    delineations = delineations.copy()
+    delineations.loc[3, "geometry"] = delineations.loc[3, "geometry"].buffer(150)
+    delineations = pandas.concat(
+        [
+            delineations.drop(index=7),
+            geopandas.GeoDataFrame(
+                {"node_id": ["new"], "altid": ["new"], "relid": ["new"]},
+                geometry=[box(900, 900, 1300, 1100)],
+                crs=delineations.crs,
+            ),
+        ],
+        ignore_index=True,
+    )
+    subbasins = subbasins.copy()
+    subbasins.loc[5, "geometry"] = subbasins.loc[5, "geometry"].buffer(-50)
+
+    rows, stale_node_ids, touched = spatial.overlay_rodeo_changes(
+        delineations=delineations,
+        subbasins=subbasins,
+        lgu_boundary=lgu_boundary,
+        previous_inputs=previous_inputs,
+    )
+
+    assert "5" in touched and len(touched) < len(subbasins)
+    updated = pandas.concat(
+        [lgu_boundary.loc[~lgu_boundary["node_id"].isin(stale_node_ids)], rows]
+    )
+
+    exp = spatial.overlay_rodeo(delineations=delineations, subbasins=subbasins)
+    assert_geodataframe_equal(
+        exp.sort_values("node_id").reset_index(drop=True),
+        updated.sort_values("node_id").reset_index(drop=True),
+    )
+
+
+def test_overlay_rodeo_changes_without_changes():
+    delineations, subbasins = make_overlay_inputs(n_subbasins=4, n_delineations=20)
+    lgu_boundary = spatial.overlay_rodeo(delineations=delineations, subbasins=subbasins)
+
+    rows, stale_node_ids, touched = spatial.overlay_rodeo_changes(
+        delineations=delineations,
+        subbasins=subbasins,
+        lgu_boundary=lgu_boundary,
+        previous_inputs=spatial.overlay_input_hashes(
+            delineations=delineations, subbasins=subbasins
+        ),
+    )
+
+    assert rows.empty and stale_node_ids == [] and touched == []
@@ -0,0 +1,47 @@
+import numpy
+import pandas
+import pytest
+
+from stormpiper.core.units import conversion_factor_from_to, convert_units
+
+
+@pytest.fixture
+def tidy_df():
+    return pandas.DataFrame(
+        dict(
+            node_id=["a", "a", "b"],
+            variable=["runoff", "TSS", "TSS"],
+            value=[1.0, 2.0, 3.0],
+            units=["L", "mcg", "mcg"],
+        )
+    )
+
+
+def test_convert_units_matches_rowwise(tidy_df):
+    exp = [
+        conversion_factor_from_to(u, {"L": "cuft", "mcg": "lbs"}[u]) * v
+        for v, u in zip(tidy_df["value"], tidy_df["units"])
+    ]
+
+    res = convert_units(tidy_df)
+
+    numpy.testing.assert_array_equal(res["value"], exp)
+    assert res["units"].tolist() == ["cuft", "lbs", "lbs"]
+    assert res.columns.tolist() == tidy_df.columns.tolist()
+    assert tidy_df["units"].tolist() == ["L", "mcg", "mcg"]
+
+
+def test_convert_units_inplace_keeps_dtypes(tidy_df):
+    df = tidy_df.astype({"units": "category", "value": "float32"})
+
+    res = convert_units(df, inplace=True)
+
+    assert res is df
+    assert df["value"].dtype == "float32"
+    assert isinstance(df["units"].dtype, pandas.CategoricalDtype)
+    assert df["units"].tolist() == ["cuft", "lbs", "lbs"]
+
+
+def test_convert_units_raises_for_unknown_units(tidy_df):
+    with pytest.raises(ValueError):
+        convert_units(tidy_df.assign(units="kg"))
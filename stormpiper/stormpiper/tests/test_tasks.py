@@ -1,5 +1,34 @@
+import multiprocessing
+
+import pandas
+import pytest
+
+from stormpiper.core.config import settings
 from stormpiper.database.connection import engine
-from stormpiper.src import tasks
+from stormpiper.src import results, tasks
+from stormpiper.src.utils import read_table_for_subbasins
+
+
+def _call_in_daemon(queue, func, kwargs):
+    engine.dispose(close=False)  # don't share the parent's connections
+    try:
+        func(**kwargs)
+        queue.put(None)
+    except Exception as e:
+        queue.put(repr(e))
+
+
+def run_in_daemon_process(func, **kwargs):
+    """Runs `func` in a daemon process like a celery prefork worker, and returns the
+    repr of the exception it raised, if any.
+    """
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    p = ctx.Process(target=_call_in_daemon, args=(queue, func, kwargs), daemon=True)
+    p.start()
+    error = queue.get(timeout=600)
+    p.join()
+    return error
 
 
 def test_tasks(db):
@@ -7,3 +36,172 @@ def test_tasks(db):
     tasks.update_tmnt_attributes(engine=engine)
     tasks.update_tmnt_attributes(engine=engine, overwrite=True)
     tasks.delete_and_refresh_all_results_tables(engine=engine)
+
+
+def test_delete_and_refresh_result_table_is_memoized(db, monkeypatch):
+    def cache_hit(run_id):
+        return engine.execute(
+            "select cache_hit from pipeline_run where id = %s", (run_id,)
+        ).scalar()
+
+    assert not cache_hit(
+        tasks.delete_and_refresh_result_table(engine=engine, force=True)
+    )
+
+    # same inputs, so the solve and table rewrite are skipped
+    assert cache_hit(tasks.delete_and_refresh_result_table(engine=engine))
+
+    # incremental updates to result_blob invalidate the cached run
+    node_id = engine.execute("select node_id from tmnt_v limit 1").scalar()
+    tasks.refresh_result_table_for_nodes(node_ids=[node_id], engine=engine)
+    assert not cache_hit(tasks.delete_and_refresh_result_table(engine=engine))
+
+    # so does switching the solver
+    monkeypatch.setattr(settings, "SOLVE_WQ_BY_BASIN", True)
+    assert not cache_hit(tasks.delete_and_refresh_result_table(engine=engine))
+
+
+def test_delete_and_refresh_result_table_records_basin_stages(db, monkeypatch):
+    monkeypatch.setattr(settings, "SOLVE_WQ_BY_BASIN", True)
+    run_id = tasks.delete_and_refresh_result_table(engine=engine, force=True)
+
+    basins = engine.execute(
+        "select distinct basin from pipeline_run_stage "
+        "where run_id = %s and stage = 'solve_watershed'",
+        (run_id,),
+    ).fetchall()
+
+    assert len(basins) > 1
+
+
+@pytest.mark.parametrize(
+    "func, kwargs, worker_settings",
+    [
+        (tasks.delete_and_refresh_result_table, {"force": True}, {}),
+        (
+            tasks.delete_and_refresh_result_table,
+            {"force": True},
+            {"SOLVE_WQ_BY_BASIN": True},
+        ),
+        (tasks.delete_and_refresh_lgu_boundary_table, {}, {"OVERLAY_WORKERS": 2}),
+    ],
+)
+def test_tasks_with_workers_in_daemon_process(
+    db, monkeypatch, func, kwargs, worker_settings
+):
+    monkeypatch.setattr(settings, "SOLVE_WQ_WORKERS", 2)
+    for name, value in worker_settings.items():
+        monkeypatch.setattr(settings, name, value)
+
+    assert run_in_daemon_process(func, engine=engine, **kwargs) is None
+
+
+def test_source_controls_load_reduction_sql_matches_pandas(db):
+    cols = [c for c in results.SRC_CTRL_RESULT_COLS if c != "id"]
+    keys = ["node_id", "epoch", "variable", "order"]
+
+    for direction, (_, table_name) in results.SRC_CTRL_LOAD_TABLES.items():
+        func = getattr(results, f"source_controls_{direction}_load_reduction_db")
+        exp = func(engine=engine)
+
+        n = results.source_controls_load_reduction_sql(
+            direction=direction, engine=engine
+        )
+        res = pandas.read_sql(table_name, con=engine)
+
+        assert n == len(exp)
+        pandas.testing.assert_frame_equal(
+            exp[cols].sort_values(keys).reset_index(drop=True),
+            res[cols].sort_values(keys).reset_index(drop=True),
+            check_dtype=False,
+            check_categorical=False,
+        )
+
+
+@pytest.mark.parametrize("backend", ["pandas", "sql"])
+def test_refresh_src_ctrl_tables_for_subbasins_matches_full_refresh(
+    db, monkeypatch, backend
+):
+    monkeypatch.setattr(settings, "SRC_CTRL_BACKEND", backend)
+    subbasin = "WS_03"
+    tables = {
+        "tmnt_source_control_upstream_load_reduced": [
+            "node_id",
+            "epoch",
+            "variable",
+            "order",
+        ],
+        "lgu_load_to_structural": ["node_id", "epoch", "variable"],
+        "load_to_ds_src_ctrl": ["node_id", "epoch", "variable"],
+        "tmnt_source_control_downstream_load_reduced": [
+            "node_id",
+            "epoch",
+            "variable",
+            "order",
+        ],
+        "subbasin_result": ["node_id", "epoch"],
+    }
+
+    def read_tables():
+        return {
+            t: pandas.read_sql(t, con=engine)
+            .drop(columns="id")
+            .sort_values(keys)
+            .reset_index(drop=True)
+            for t, keys in tables.items()
+        }
+
+    update = (
+        "update tmnt_source_control set percent_reduction = %(pct)s "
+        "where subbasin = %(subbasin)s and direction = 'upstream'"
+    )
+    pct = engine.execute(
+        "select percent_reduction from tmnt_source_control "
+        "where subbasin = %(subbasin)s and direction = 'upstream' limit 1",
+        subbasin=subbasin,
+    ).scalar()
+
+    tasks.delete_and_refresh_all_results_tables(engine=engine)
+    try:
+        engine.execute(update, pct=10.0, subbasin=subbasin)
+        tasks.refresh_src_ctrl_tables_for_subbasins(subbasins=[subbasin], engine=engine)
+        scoped = read_tables()
+
+        tasks.delete_and_refresh_all_results_tables(engine=engine)
+        full = read_tables()
+    finally:
+        engine.execute(update, pct=pct, subbasin=subbasin)
+        tasks.delete_and_refresh_all_results_tables(engine=engine)
+
+    for table_name in tables:
+        pandas.testing.assert_frame_equal(
+            scoped[table_name], full[table_name], check_like=True
+        )
+
+
+def test_refresh_for_no_subbasins(db):
+    df = read_table_for_subbasins("lgu_boundary", subbasins=[], engine=engine)
+    assert df.empty and "subbasin" in df.columns
+
+    assert (
+        tasks.refresh_src_ctrl_tables_for_subbasins(subbasins=[], engine=engine) is None
+    )
+
+
+def test_delete_rows_of_removed_nodes(db):
+    tasks.delete_and_refresh_all_results_tables(engine=engine)
+    row = engine.execute(
+        "select epoch, variable, value, units from lgu_load_to_structural limit 1"
+    ).fetchone()
+
+    engine.execute(
+        "insert into lgu_load_to_structural (node_id, epoch, variable, value, units) "
+        "values ('not-a-node', %s, %s, %s, %s)",
+        *row,
+    )
+    tasks._delete_rows_of_removed_nodes(engine=engine)
+
+    n = engine.execute(
+        "select count(*) from lgu_load_to_structural where node_id = 'not-a-node'"
+    ).scalar()
+    assert n == 0